@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Реестр админ-чатов: явная регистрация командой /admin <код>, хранение в SQLite"""
+
+import asyncio
+import hmac
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ADMINS = 50
+
+
+class AdminRegistry:
+    """Множество админ-чатов в памяти (O(1) проверка) с копией на диске"""
+
+    def __init__(self, path, max_admins=DEFAULT_MAX_ADMINS):
+        self.path = path
+        self.max_admins = max_admins
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS admins (chat_id INTEGER PRIMARY KEY, enrolled_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._chat_ids = self._load()
+
+    def __contains__(self, chat_id):
+        return chat_id in self._chat_ids
+
+    def __len__(self):
+        return len(self._chat_ids)
+
+    def chat_ids(self):
+        return sorted(self._chat_ids)
+
+    def _write(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    async def enroll(self, chat_id):
+        """Добавление чата; False, если реестр заполнен"""
+        if chat_id in self._chat_ids:
+            return True
+        if len(self._chat_ids) >= self.max_admins:
+            return False
+        await asyncio.to_thread(
+            self._write, 'INSERT OR IGNORE INTO admins (chat_id, enrolled_at) VALUES (?, ?)', (chat_id, time.time())
+        )
+        self._chat_ids.add(chat_id)
+        return True
+
+    async def remove(self, chat_id):
+        if chat_id not in self._chat_ids:
+            return False
+        await asyncio.to_thread(self._write, 'DELETE FROM admins WHERE chat_id = ?', (chat_id,))
+        self._chat_ids.discard(chat_id)
+        return True
+
+    def _load(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT chat_id FROM admins')}
+
+    async def reload(self):
+        """Перечитать реестр с диска: чаты, добавленные другими репликами бота"""
+        self._chat_ids = await asyncio.to_thread(self._load)
+
+    async def run_reload(self, interval):
+        """Фоновое перечитывание реестра (несколько реплик с общим файлом)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error("❌ Ошибка перечитывания реестра админов: %s", e)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def check_enroll_code(received, expected):
+    """Сравнение кода регистрации за постоянное время; пустой ожидаемый код отключает /admin"""
+    if not expected:
+        return False
+    return hmac.compare_digest(received.encode('utf-8'), expected.encode('utf-8'))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Кластер реплик на одной машине: N процессов telegram_bot_current.py с общими SQLite-файлами
+получают обновления от фейкового Bot API через реплику-лидера и обрабатывают своих пользователей.
+
+Проверяет, что каждая заявка собрана ровно один раз, и показывает, как реплики поделили обновления.
+С --stop-leader лидер останавливается (SIGTERM) посреди прогона: опрос подхватывает другая
+реплика, а анкеты пользователей остановленной реплики продолжают соседи по кольцу.
+
+    python bench_cluster.py --replicas 3 --users 300
+    python bench_cluster.py --replicas 3 --users 300 --stop-leader
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession
+
+from bench_updates import FAKE_TOKEN, FakeBotApi, synthetic_updates
+
+BASE_PORT = 18090
+METRICS_BASE_PORT = 19090
+SECRET = 'bench-cluster-secret'
+
+
+def _scalar(path, sql):
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def _replica_env(index, nodes, base_url, shared_dir, lease_ttl):
+    env = dict(os.environ)
+    env.update({
+        'BOT_TOKEN': FAKE_TOKEN,
+        'ADMIN_CHAT_ID': '1',
+        'BOT_API_BASE_URL': base_url,
+        'BOT_MODE': 'polling',
+        'CLUSTER_NODES': ','.join(nodes),
+        'CLUSTER_NODE': nodes[index],
+        'CLUSTER_LISTEN': '127.0.0.1',
+        'CLUSTER_PORT': str(BASE_PORT + index),
+        'CLUSTER_SECRET': SECRET,
+        'CLUSTER_LOCK_PATH': os.path.join(shared_dir, 'cluster.sqlite3'),
+        'CLUSTER_LEASE_TTL': str(lease_ttl),
+        'STATE_BACKEND': 'sqlite',
+        'STATE_DB_PATH': os.path.join(shared_dir, 'state.sqlite3'),
+        'LEAD_OUTBOX_PATH': os.path.join(shared_dir, 'outbox.sqlite3'),
+        'LEAD_INDEX_PATH': os.path.join(shared_dir, 'leads_index.sqlite3'),
+        'LEAD_DB_PATH': os.path.join(shared_dir, 'leads.sqlite3'),
+        'ADMIN_DB_PATH': os.path.join(shared_dir, 'admins.sqlite3'),
+        'LOGS_DIR': os.path.join(shared_dir, f'logs-{index}'),
+        'METRICS_LISTEN': '127.0.0.1',
+        'METRICS_PORT': str(METRICS_BASE_PORT + index),
+        'NOTIFY_CHAT_RATE': '1000',
+        'NOTIFY_GLOBAL_RATE': '100000',  # Фейковый API не ограничивает рассылку
+        'RATE_LIMIT_GLOBAL_RATE': '0',
+        'LOG_LEVEL': 'WARNING',
+    })
+    return env
+
+
+async def _routes(session, index):
+    """Счетчики bot_cluster_updates_total реплики: {'local': ..., 'remote': ..., 'received': ...}"""
+    try:
+        async with session.get(f'http://127.0.0.1:{METRICS_BASE_PORT + index}/metrics') as response:
+            text = await response.text()
+    except Exception:
+        return None
+    routes = {}
+    for line in text.splitlines():
+        if line.startswith('bot_cluster_updates_total{'):
+            labels, value = line.rsplit(' ', 1)
+            routes[labels.split('"')[1]] = int(float(value))
+    return routes
+
+
+async def run(replicas, users, latency, stop_leader, lease_ttl, timeout):
+    shared_dir = tempfile.mkdtemp(prefix='bench_cluster_')
+    leads_db = os.path.join(shared_dir, 'leads.sqlite3')
+    outbox_db = os.path.join(shared_dir, 'outbox.sqlite3')
+    lock_db = os.path.join(shared_dir, 'cluster.sqlite3')
+
+    api = FakeBotApi(synthetic_updates(users), latency=latency)
+    base_url = await api.start()
+    nodes = [f'http://127.0.0.1:{BASE_PORT + index}' for index in range(replicas)]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telegram_bot_current.py')
+    processes = [
+        subprocess.Popen([sys.executable, script], env=_replica_env(index, nodes, base_url, shared_dir, lease_ttl))
+        for index in range(replicas)
+    ]
+    stopped = None
+    started = time.perf_counter()
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            leads = _scalar(leads_db, 'SELECT COUNT(*) FROM leads')
+            if stop_leader and stopped is None and leads >= users // 2:
+                leader = _scalar(lock_db, 'SELECT owner FROM leases')
+                if leader in nodes:
+                    stopped = nodes.index(leader)
+                    processes[stopped].send_signal(signal.SIGTERM)
+                    print(f"⏹  Лидер {leader} остановлен после {leads} заявок")
+            if leads >= users and not _scalar(outbox_db, "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"):
+                break
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+        async with ClientSession() as session:
+            routes = [await _routes(session, index) for index in range(replicas)]
+        leads = _scalar(leads_db, 'SELECT COUNT(*) FROM leads')
+        distinct = _scalar(leads_db, 'SELECT COUNT(DISTINCT user_id) FROM leads')
+        delivered = _scalar(outbox_db, "SELECT COUNT(*) FROM outbox WHERE status = 'delivered'")
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        await api.stop()
+
+    print(f"реплик: {replicas}  пользователей: {users}  время: {elapsed:6.2f} c  "
+          f"заявок: {leads} (пользователей {distinct})  доставлено админам: {delivered}")
+    for index, node in enumerate(nodes):
+        note = ' (остановлена)' if index == stopped else ''
+        print(f"  {node}{note}: {routes[index] if routes[index] is not None else 'метрики недоступны'}")
+    print(f"  вызовы API: {api.calls}")
+    return leads == users == distinct
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Несколько реплик бота с лидером и consistent hashing на одной машине')
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--users', type=int, default=300, help='пользователей, по 4 обновления на каждого')
+    parser.add_argument('--latency-ms', type=float, default=5, help='задержка ответа фейкового Bot API')
+    parser.add_argument('--stop-leader', action='store_true', help='остановить лидера посреди прогона')
+    parser.add_argument('--lease-ttl', type=float, default=3, help='срок аренды лидера (с)')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    logging.getLogger('aiohttp.server').setLevel(logging.CRITICAL)
+    ok = asyncio.run(run(args.replicas, args.users, args.latency_ms / 1000, args.stop_leader,
+                         args.lease_ttl, args.timeout))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Кампания с потоком заявок на модельных часах: сколько send_message уходит админам
+при отправке каждой заявки (OutboxWorker) и дайджестом (DigestWorker), и на сколько
+дайджест задерживает заявки. Outbox настоящий (SQLite во временном каталоге).
+
+    python bench_digest.py --leads 600 --rate 1 --window 60 --size 50 --priority 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+
+from fake_clock import FakeClock
+from lead_digest import DigestWorker
+from lead_outbox import LeadOutbox, OutboxWorker
+from message_templates import ADMIN_DIGEST, ADMIN_LEAD
+from notify_dispatcher import TELEGRAM_TEXT_LIMIT, NotificationDispatcher, text_length
+
+POLL_INTERVAL = 5.0
+
+
+class CountingBot:
+    def __init__(self):
+        self.calls = 0
+        self.longest = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        self.longest = max(self.longest, text_length(text))
+
+
+def lead_text(number):
+    return ADMIN_LEAD(
+        name=f'Клиент {number}', phone=f'+7 916 {number % 1000:03d}-45-67', user_id=100000 + number,
+        username=f'user{number}', full_name=f'Клиент {number}', chat_id=100000 + number,
+        time='18.10.2026 12:00:00'
+    )
+
+
+async def campaign(path, make_worker, leads, rate, priority, admins):
+    clock = FakeClock(now=0.0)
+    outbox = LeadOutbox(path, clock=clock)
+    bot = CountingBot()
+    # Лимиты скорости не мешают модельному времени: считаем только вызовы
+    dispatcher = NotificationDispatcher(bot, global_rate=1e9, chat_rate=1e9, group_rate=1e9)
+
+    async def deliver(payload):
+        results = await dispatcher.send(admins, payload['text'])
+        if not all(result.ok for result in results):
+            raise RuntimeError('ошибка отправки')
+
+    worker = make_worker(outbox, deliver)
+    random.seed(1)
+    next_poll = POLL_INTERVAL
+    for number in range(leads):
+        clock.now = number / rate
+        while next_poll <= clock.now:
+            # Воркер просыпается по таймауту poll_interval
+            saved, clock.now = clock.now, next_poll
+            await worker.drain_once()
+            clock.now, next_poll = saved, next_poll + POLL_INTERVAL
+        payload = {'text': lead_text(number)}
+        if random.random() < priority:
+            payload['priority'] = True
+        await outbox.enqueue(payload)
+        await worker.drain_once()  # notify() после записи заявки
+    while await outbox.pending_count():
+        clock.now = next_poll
+        next_poll += POLL_INTERVAL
+        await worker.drain_once()
+
+    delays = [row[0] for row in outbox._conn.execute('SELECT delivered_at - created_at FROM outbox')]
+    await outbox.close()
+    return bot, delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Вызовы Bot API и задержка заявок с дайджестом и без')
+    parser.add_argument('--leads', type=int, default=600)
+    parser.add_argument('--rate', type=float, default=1.0, help='заявок в секунду')
+    parser.add_argument('--window', type=float, default=60.0, help='LEAD_DIGEST_WINDOW, с')
+    parser.add_argument('--size', type=int, default=50, help='LEAD_DIGEST_SIZE')
+    parser.add_argument('--priority', type=float, default=0.05, help='доля срочных заявок')
+    parser.add_argument('--admins', type=int, default=2, help='число админ-чатов')
+    args = parser.parse_args()
+    admins = list(range(1, args.admins + 1))
+
+    variants = (
+        ('каждая заявка', lambda outbox, deliver: OutboxWorker(outbox, deliver, poll_interval=POLL_INTERVAL)),
+        (f'дайджест {args.window:g} c / {args.size}', lambda outbox, deliver: DigestWorker(
+            outbox, deliver, args.window, max_leads=args.size, header=ADMIN_DIGEST, poll_interval=POLL_INTERVAL
+        )),
+    )
+    print(f"{args.leads} заявок, {args.rate:g}/с, срочных {args.priority:.0%}, админ-чатов {args.admins}, "
+          f"длина заявки {text_length(lead_text(0))} символов")
+    with tempfile.TemporaryDirectory(prefix='bench_digest_') as tmp:
+        for number, (name, make_worker) in enumerate(variants):
+            bot, delays = asyncio.run(campaign(
+                os.path.join(tmp, f'outbox{number}.sqlite3'), make_worker, args.leads, args.rate, args.priority, admins
+            ))
+            delays.sort()
+            print(f"  {name:22} send_message {bot.calls:6}  макс. длина {bot.longest:5}/{TELEGRAM_TEXT_LIMIT}  "
+                  f"задержка p50 {statistics.median(delays):5.1f} c  p99 {delays[int(len(delays) * 0.99)]:5.1f} c")
+
+
+if __name__ == '__main__':
+    main()
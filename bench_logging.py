@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк логирования в обработчике.
+
+1. Задержка: прежний basicConfig с двумя FileHandler и stdout против QueueHandler/QueueListener.
+2. CPU на обновление (все потоки, включая запись): f-строки со стандартным QueueHandler, как
+   было в обработчиках, против ленивых аргументов с контекстом обновления (ContextQueueHandler)
+   в текстовом и JSON-формате, при LOG_LEVEL=INFO, сэмплировании и LOG_LEVEL=WARNING.
+
+    python bench_logging.py --updates 20000 --sample-rate 0.1
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from logging.handlers import QueueHandler
+
+from log_setup import LOG_FORMAT, UPDATES_LOGGER, UserLabel, bind_context, reset_context, setup_logging
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f'user{user_id}'
+        self.first_name = 'User'
+
+
+def _reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    logging.getLogger(UPDATES_LOGGER).filters.clear()
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def legacy_setup(logs_dir, stream):
+    """Конфигурация, как была в telegram_bot_current.py"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(f'{logs_dir}/bot.log', encoding='utf-8'),
+            logging.FileHandler(f'{logs_dir}/bot_errors.log', encoding='utf-8'),
+            logging.StreamHandler(stream)
+        ],
+        force=True
+    )
+
+
+def simulate_updates(count):
+    """Логирование как в message_handler: 3 INFO-строки на обновление"""
+    update_logger = logging.getLogger(UPDATES_LOGGER)
+    latencies = []
+    for i in range(count):
+        user_id = 1000 + i
+        started = time.perf_counter()
+        update_logger.info(f"📨 Сообщение от {user_id} (@user{user_id} (User)): '+7 916 123 45 67...'")
+        update_logger.info(f"📋 Новая заявка от {user_id}: Имя='Имя', Телефон='+7 (916) 123-45-67'")
+        update_logger.info(f"✅ Подтверждение отправлено пользователю {user_id}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def eager_updates(count):
+    """Как было в message_handler: user_info и f-строки собираются до проверки уровня"""
+    update_logger = logging.getLogger(UPDATES_LOGGER)
+    for i in range(count):
+        user = FakeUser(1000 + i)
+        user_id = user.id
+        message_text = f'Имя {user_id}'
+        user_info = f"@{user.username or 'no_username'} ({user.first_name})"
+        update_logger.info(f"📨 Сообщение от {user_id} ({user_info}): '{message_text[:100]}...'")
+        update_logger.info(f"✅ Имя получено от пользователя {user_id}: '{message_text}'")
+        update_logger.info(f"✅ Запрос поля 'phone' отправлен пользователю {user_id}")
+
+
+def lazy_updates(count):
+    """Как сейчас: контекст обновления (update_processor) и ленивые аргументы"""
+    update_logger = logging.getLogger(UPDATES_LOGGER)
+    for i in range(count):
+        user = FakeUser(1000 + i)
+        user_id = user.id
+        message_text = f'Имя {user_id}'
+        token = bind_context(update_id=i, user_id=user_id, handler='message')
+        update_logger.info("📨 Сообщение от %s (%s): '%.100s...'", user_id, UserLabel(user), message_text)
+        update_logger.info("✅ %s получено от пользователя %s: '%s'", 'Имя', user_id, message_text)
+        update_logger.info("✅ Запрос поля '%s' отправлен пользователю %s", 'phone', user_id)
+        reset_context(token)
+
+
+def cpu_per_update(simulate, count, logs_dir, devnull, legacy=False, **kwargs):
+    """
+    (CPU потока event loop, CPU процесса со всеми потоками) на обновление в мкс;
+    listener.stop() дожидается записи очереди
+    """
+    listener = setup_logging(logs_dir, stream=devnull, **kwargs)
+    if legacy:
+        # Прежняя настройка: стандартный QueueHandler и все поля LogRecord
+        logging._srcfile = os.path.normcase(logging.addLevelName.__code__.co_filename)
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = True
+        root = logging.getLogger()
+        root.handlers[:] = [QueueHandler(listener.queue)]
+        for handler in listener.handlers:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    started, loop_started = time.process_time(), time.thread_time()
+    simulate(count)
+    loop = time.thread_time() - loop_started
+    listener.stop()
+    total = time.process_time() - started
+    _reset_root()
+    return loop / count * 1e6, total / count * 1e6
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    mean = statistics.fmean(latencies) * 1e6
+    print(f"{name:28} среднее {mean:7.1f} мкс  p50 {p50:7.1f} мкс  p99 {p99:8.1f} мкс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк логирования в обработчиках')
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--sample-rate', type=float, default=0.1, help='LOG_SAMPLE_RATE для третьего замера')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as logs_dir, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        legacy_setup(logs_dir, devnull)
+        report('basicConfig (синхронно)', simulate_updates(args.updates))
+        _reset_root()
+
+        listener = setup_logging(logs_dir, level='INFO', stream=devnull)
+        report('QueueHandler', simulate_updates(args.updates))
+        listener.stop()
+        _reset_root()
+
+        listener = setup_logging(logs_dir, level='INFO', stream=devnull, sample_rate=args.sample_rate)
+        report(f'QueueHandler + sample {args.sample_rate}', simulate_updates(args.updates))
+        listener.stop()
+        _reset_root()
+
+        print()
+        print("CPU на обновление (3 строки), мкс: поток event loop / все потоки")
+        print(f"  {'':24} {'f-строки':>15} {'лениво text':>15} {'лениво json':>15}")
+        for name, options in (('INFO', {'level': 'INFO', 'sample_rate': 1.0}),
+                              (f'INFO + sample {args.sample_rate}', {'level': 'INFO', 'sample_rate': args.sample_rate}),
+                              ('WARNING', {'level': 'WARNING', 'sample_rate': 1.0})):
+            eager = cpu_per_update(eager_updates, args.updates, logs_dir, devnull, legacy=True, **options)
+            text = cpu_per_update(lazy_updates, args.updates, logs_dir, devnull, style='text', **options)
+            lines = cpu_per_update(lazy_updates, args.updates, logs_dir, devnull, style='json', **options)
+            cells = ' '.join(f'{loop:7.1f} /{total:6.1f}' for loop, total in (eager, text, lines))
+            print(f"  {name:24} {cells}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Экранирование пользовательского текста в ответах с parse_mode='Markdown'.
+
+1. Цена экранирования и очистки одного имени: text_utils против telegram.helpers.escape_markdown.
+2. Сквозной прогон polling на фейковом Bot API (bench_updates), который, как Telegram, отвечает
+   400 "Can't parse entities" на сообщение с незакрытой сущностью Markdown. Часть пользователей
+   вводит имя вида 'john_doe' или 'Мария [VIP': без экранирования подтверждение падает, бот
+   вторым запросом шлет tech_error, а анкета остается незакрытой: два sendMessage вместо одного.
+
+    python bench_markdown.py --users 500 --tricky 0.2
+    python bench_markdown.py --mode raw     # как было до экранирования
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import subprocess
+import sys
+import timeit
+
+from aiohttp import web
+from telegram.helpers import escape_markdown as ptb_escape_markdown
+
+import bench_updates
+from text_utils import escape_markdown, escape_markdown_v2, find_markdown_error, sanitize_name
+
+PLAIN_NAMES = ['Анна Петрова', 'Иван', 'Мария', 'Alex Smith', 'Ольга Н.', 'Дмитрий']
+TRICKY_NAMES = ['john_doe', 'Ольга*', 'Мария [VIP', 'Петр `dev', 'a_b_c', '**Звезда']
+
+
+class StrictBotApi(bench_updates.FakeBotApi):
+    """Фейковый Bot API, который проверяет разметку Markdown в sendMessage, как Telegram"""
+
+    def __init__(self, updates=()):
+        super().__init__(updates)
+        self.parse_errors = 0
+        self.user_messages = 0  # sendMessage пользователям, без доставки заявок админу
+
+    async def handle(self, request):
+        params = dict(await request.post())
+        if request.match_info['method'] != 'sendMessage':
+            return await super().handle(request)
+        if int(params.get('chat_id') or bench_updates.ADMIN_ID) != bench_updates.ADMIN_ID:
+            self.user_messages += 1
+        if params.get('parse_mode') == 'Markdown':
+            offset = find_markdown_error(params.get('text', ''))
+            if offset is not None:
+                self.calls['sendMessage'] = self.calls.get('sendMessage', 0) + 1
+                self.parse_errors += 1
+                return web.json_response({
+                    'ok': False, 'error_code': 400,
+                    'description': f"Bad Request: can't parse entities: can't find end of the entity "
+                                   f"starting at byte offset {offset}",
+                }, status=400)
+        return await super().handle(request)
+
+
+def named_updates(users, tricky, seed=1):
+    """Сценарии bench_updates, где доля tricky пользователей вводит имя со спецсимволами Markdown"""
+    rng = random.Random(seed)
+    updates = bench_updates.synthetic_updates(users)
+    for update in updates:
+        message = update.get('message')
+        if message and message['text'].startswith('Имя '):
+            message['text'] = rng.choice(TRICKY_NAMES if rng.random() < tricky else PLAIN_NAMES)
+    return updates
+
+
+async def run_polling(updates):
+    api = StrictBotApi(updates)
+    original, bench_updates.FakeBotApi = bench_updates.FakeBotApi, lambda updates: api
+    try:
+        elapsed, processed, _ = await bench_updates.bench_polling(updates)
+    finally:
+        bench_updates.FakeBotApi = original
+    return elapsed, processed, api.user_messages, api.parse_errors
+
+
+def per_call(statement, names, number=20000):
+    best = min(timeit.repeat(lambda: [statement(name) for name in names], number=number, repeat=5))
+    return best / number / len(names) * 1e6
+
+
+def microbench():
+    for title, names in (('обычные имена', PLAIN_NAMES), ('со спецсимволами', TRICKY_NAMES)):
+        print(f"{title}:")
+        print(f"  escape_markdown      text_utils {per_call(escape_markdown, names):5.2f} мкс  "
+              f"telegram.helpers {per_call(ptb_escape_markdown, names):5.2f} мкс")
+        print(f"  escape_markdown_v2   text_utils {per_call(escape_markdown_v2, names):5.2f} мкс  "
+              f"telegram.helpers {per_call(lambda text: ptb_escape_markdown(text, version=2), names):5.2f} мкс")
+        print(f"  sanitize_name        {per_call(sanitize_name, names):5.2f} мкс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Экранирование Markdown: цена и отказы sendMessage')
+    parser.add_argument('--mode', choices=('escaped', 'raw', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--tricky', type=float, default=0.2, help='доля имен со спецсимволами Markdown')
+    args = parser.parse_args()
+
+    if args.mode == 'both':
+        microbench()
+        # Каждый режим в отдельном процессе: хранилища бота закрываются при остановке
+        for mode in ('raw', 'escaped'):
+            subprocess.run([sys.executable, __file__] + sys.argv[1:] + ['--mode', mode],
+                           env=bench_updates.CLEAN_ENV, check=True)
+        return
+
+    logging.disable(logging.CRITICAL)
+    if args.mode == 'raw':
+        bench_updates.bot_module.escape_markdown = lambda text: text
+    updates = named_updates(args.users, args.tricky)
+    elapsed, processed, messages, errors = asyncio.run(run_polling(updates))
+    print(f"{args.mode:8} обновлений: {processed:5}  время: {elapsed:6.3f} c  sendMessage пользователям: "
+          f"{messages:5}  из них 400 can't parse entities: {errors:4}  незакрытых анкет: {errors}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Микробенчмарк нормализации телефонов: phone_utils против прежних функций
+clean_phone + is_valid_phone + format_phone из telegram_bot_current.py.
+
+    python bench_phone.py --number 200000
+"""
+
+import argparse
+import re
+import timeit
+
+from phone_utils import normalize_many, normalize_phone
+
+SAMPLES = [
+    "+7 916 123 45 67", "8 (916) 123-45-67", "79161234567", "9161234567",
+    "+380 67 123 45 67", "+1 555 123 4567", "+49 30 12345678", "+86 138 0013 8000",
+    "+7 916 386 3", "123456", "abc", "++123456789",
+]
+
+
+# Прежняя реализация (копия для сравнения)
+def legacy_clean_phone(phone_str):
+    return re.sub(r'[^\d+]', '', phone_str)
+
+
+def legacy_is_valid_phone(phone):
+    patterns = [
+        r'^\+?7\d{10}$',
+        r'^8\d{10}$',
+        r'^\d{10}$',
+        r'^\+\d{7,15}$'
+    ]
+    for pattern in patterns:
+        if re.match(pattern, phone):
+            return True
+    return False
+
+
+def legacy_format_phone(phone):
+    clean = re.sub(r'[^\d+]', '', phone)
+    if clean.startswith('8') and len(clean) == 11:
+        return '+7' + clean[1:]
+    elif clean.startswith('7') and len(clean) == 11:
+        return '+' + clean
+    elif clean.startswith('+7') and len(clean) == 12:
+        return clean
+    elif len(clean) == 10:
+        return '+7' + clean
+    elif clean.startswith('+'):
+        return clean
+    else:
+        return '+' + clean
+
+
+def legacy_pipeline(raw):
+    phone = legacy_clean_phone(raw)
+    if not legacy_is_valid_phone(phone):
+        return None
+    return legacy_format_phone(phone)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк нормализации телефонов')
+    parser.add_argument('--number', type=int, default=100_000, help='число номеров в каждом замере')
+    args = parser.parse_args()
+
+    phones = (SAMPLES * (args.number // len(SAMPLES) + 1))[:args.number]
+
+    results = {
+        'legacy (clean+valid+format)': min(timeit.repeat(lambda: [legacy_pipeline(p) for p in phones], number=1, repeat=5)),
+        'normalize_phone': min(timeit.repeat(lambda: [normalize_phone(p) for p in phones], number=1, repeat=5)),
+        'normalize_many': min(timeit.repeat(lambda: normalize_many(phones), number=1, repeat=5)),
+    }
+    baseline = results['legacy (clean+valid+format)']
+    for name, seconds in results.items():
+        print(f"{name:30} {seconds / len(phones) * 1e9:8.0f} нс/номер  x{baseline / seconds:5.2f}")
+
+
+if __name__ == '__main__':
+    main()
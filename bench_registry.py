@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Цена реестра обработчиков (handler_registry) на обновление и при сборке приложения.
+
+Обновления /start, кнопка и текст проходят через Application.process_update до обработчика,
+который ничего не делает (обработчики бота подменены пустыми, сеть не нужна), - виден только
+вклад оберток:
+
+- direct     - обработчики без оберток (нижняя граница);
+- before     - instrument_handler у каждого обработчика, как до реестра (все всегда включено);
+- registry   - handler_registry() бота по умолчанию: метрики и трассировка выключены;
+- registry+  - handler_registry() с METRICS_PORT и TRACE_SAMPLE_RATE: те же обертки, что before.
+
+Последняя колонка - вызов одной цепочки оберток без PTB: меньше шума, чем у полного прохода.
+
+Холодный старт процесса целиком - bench_startup.py.
+
+    python bench_registry.py --updates 30000
+"""
+
+import argparse
+import asyncio
+import time
+from functools import partial
+
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+from telegram.request import BaseRequest
+
+import telegram_bot_current as bot
+from bot_config import BotConfig
+from metrics import instrument_handler
+
+HANDLERS = ('start', 'help_command', 'admin_command', 'button_handler', 'message_handler')
+BASE_ENV = {'BOT_TOKEN': '1:x', 'RATE_LIMIT_USER_RATE': '0'}
+
+
+class GetMeRequest(BaseRequest):
+    """Транспорт без сети: на любой метод отвечает как getMe (нужен только initialize)"""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        return 200, b'{"ok":true,"result":{"id":42,"is_bot":true,"first_name":"Bench","username":"bench_bot"}}'
+
+
+async def noop(update, context):
+    pass
+
+
+def _make_updates(application, count):
+    user = {'id': 1000, 'is_bot': False, 'first_name': 'User'}
+    chat = {'id': 1000, 'type': 'private'}
+    updates = []
+    for number in range(count):
+        message = {'message_id': number, 'date': 0, 'chat': chat, 'from': user, 'text': 'Анна'}
+        kind = number % 3
+        if kind == 0:
+            message.update(text='/start', entities=[{'type': 'bot_command', 'offset': 0, 'length': 6}])
+            data = {'update_id': number, 'message': message}
+        elif kind == 1:
+            data = {'update_id': number, 'callback_query': {
+                'id': str(number), 'from': user, 'chat_instance': '1', 'data': 'new_request', 'message': message,
+            }}
+        else:
+            data = {'update_id': number, 'message': message}
+        updates.append(Update.de_json(data, application.bot))
+    return updates
+
+
+def direct(application, wrap=lambda name, callback: callback):
+    """Обработчики как в build_application до реестра; wrap - обертка каждого"""
+    application.add_handler(CommandHandler('start', wrap('start', noop)))
+    application.add_handler(CommandHandler('help', wrap('help', noop)))
+    application.add_handler(CommandHandler('admin', wrap('admin', noop)))
+    application.add_handler(CallbackQueryHandler(wrap('button', noop)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, wrap('message', noop)))
+
+
+def registry(application, env):
+    bot.handler_registry(BotConfig(dict(BASE_ENV, **env))).install(application)
+
+
+VARIANTS = {
+    'direct': direct,
+    'before': partial(direct, wrap=instrument_handler),
+    'registry': partial(registry, env={}),
+    'registry+': partial(registry, env={'METRICS_PORT': '9100', 'TRACE_SAMPLE_RATE': '0.01'}),
+}
+
+# Обработчик 'message' так, как его вызывает PTB в каждом варианте
+CHAINS = {
+    'direct': lambda: noop,
+    'before': lambda: instrument_handler('message', noop),
+    'registry': lambda: bot.handler_registry(BotConfig(BASE_ENV)).wrap('message', noop),
+    'registry+': lambda: bot.handler_registry(
+        BotConfig(dict(BASE_ENV, METRICS_PORT='9100', TRACE_SAMPLE_RATE='0.01'))).wrap('message', noop),
+}
+
+
+def build(variant):
+    application = (
+        Application.builder().token(BASE_ENV['BOT_TOKEN'])
+        .request(GetMeRequest()).get_updates_request(GetMeRequest()).build()
+    )
+    VARIANTS[variant](application)
+    return application
+
+
+async def chain_time(callback, count=100000, repeat=5):
+    """Вызов обработчика со всеми обертками, мкс"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(count):
+            await callback(None, None)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e6
+
+
+def build_time(variant, count=200):
+    """Сборка приложения с обработчиками, мкс (без initialize)"""
+    build(variant)
+    started = time.perf_counter()
+    for _ in range(count):
+        build(variant)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def process_times(updates_count, repeat):
+    """{вариант: лучшее время обновления, мкс}; варианты чередуются, чтобы шум делился поровну"""
+    applications = {variant: build(variant) for variant in VARIANTS}
+    best = dict.fromkeys(VARIANTS, float('inf'))
+    for application in applications.values():
+        await application.initialize()
+    try:
+        updates = _make_updates(applications['direct'], updates_count)
+        for _ in range(repeat):
+            for variant, application in applications.items():
+                started = time.perf_counter()
+                for update in updates:
+                    await application.process_update(update)
+                best[variant] = min(best[variant], (time.perf_counter() - started) / len(updates) * 1e6)
+    finally:
+        for application in applications.values():
+            await application.shutdown()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Цена реестра обработчиков на обновление и при сборке')
+    parser.add_argument('--updates', type=int, default=30000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name in HANDLERS:
+        setattr(bot, name, noop)
+
+    per_update = asyncio.run(process_times(args.updates, args.repeat))
+    for variant in VARIANTS:
+        chain = asyncio.run(chain_time(CHAINS[variant]()))
+        print(f"{variant:10} сборка приложения: {build_time(variant):5.0f} мкс  "
+              f"обновление: {per_update[variant]:6.2f} мкс  из них обертки: {chain:5.2f} мкс")
+
+
+if __name__ == '__main__':
+    main()
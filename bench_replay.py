@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Офлайн-бенчмарк обработчиков: прогон записанных или синтетических Update через
+настоящий Application из telegram_bot_current без обращения к Telegram.
+
+Bot API подменяется транспортом FakeBotRequest внутри процесса: sendMessage,
+editMessageText, answerCallbackQuery и остальные методы отвечают с заданной задержкой.
+Каждый пользователь проходит свои обновления по порядку, пользователи работают параллельно.
+
+    python bench_replay.py --users 1,100,10000,100000 --latency-ms 20
+    python bench_replay.py --updates-file recorded.jsonl
+"""
+
+import argparse
+import asyncio
+import atexit
+import itertools
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+FAKE_TOKEN = '123456:REPLAY'
+ADMIN_ID = 1
+
+# Окружение без подстановок бенчмарка: у процесса каждого масштаба свои хранилища, иначе
+# пользователи 1000+ следующего масштаба попадали бы в индекс повторов предыдущего
+CLEAN_ENV = dict(os.environ)
+
+os.environ.setdefault('BOT_TOKEN', FAKE_TOKEN)
+os.environ.setdefault('ADMIN_CHAT_ID', str(ADMIN_ID))
+REPLAY_DIR = tempfile.mkdtemp(prefix='replay_')
+atexit.register(shutil.rmtree, REPLAY_DIR, ignore_errors=True)
+os.environ.setdefault('LEAD_OUTBOX_PATH', os.path.join(REPLAY_DIR, 'outbox.sqlite3'))
+os.environ.setdefault('ADMIN_DB_PATH', os.path.join(REPLAY_DIR, 'admins.sqlite3'))
+os.environ.setdefault('LEAD_INDEX_PATH', os.path.join(REPLAY_DIR, 'leads_index.sqlite3'))
+os.environ.setdefault('LEAD_DB_PATH', os.path.join(REPLAY_DIR, 'leads.sqlite3'))
+os.environ.setdefault('NOTIFY_CHAT_RATE', '1000')
+os.environ.setdefault('RATE_LIMIT_GLOBAL_RATE', '0')  # Бенчмарк сам и есть наплыв пользователей
+os.environ.setdefault('LOGS_DIR', os.path.join(REPLAY_DIR, 'logs'))
+
+from telegram import Update  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+import telegram_bot_current as bot_module  # noqa: E402
+from bench_updates import user_flow  # noqa: E402
+
+_message_ids = itertools.count(1)
+
+
+class FakeBotRequest(BaseRequest):
+    """Транспорт Bot API в памяти: отвечает на любой метод после задержки latency секунд"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _result(self, api_method, params):
+        if api_method == 'getMe':
+            return {'id': 42, 'is_bot': True, 'first_name': 'Replay', 'username': 'replay_bot'}
+        if api_method == 'getUpdates':
+            return []
+        if api_method in ('sendMessage', 'editMessageText'):
+            return {
+                'message_id': next(_message_ids), 'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id') or ADMIN_ID), 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data else {}
+        body = json.dumps({'ok': True, 'result': self._result(api_method, params)})
+        return 200, body.encode('utf-8')
+
+
+def load_updates(path):
+    """Записанные обновления (JSON Update на строку), сгруппированные по пользователю"""
+    flows = {}
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            payload = data.get('message') or data.get('callback_query') or data.get('edited_message') or {}
+            user_id = (payload.get('from') or {}).get('id', 0)
+            flows.setdefault(user_id, []).append(data)
+    return list(flows.values())
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _rss_mb():
+    """Текущий RSS процесса; без /proc - пиковый RSS из getrusage"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def replay(flows, latency=0.0, concurrency=0):
+    """
+    Прогон потоков обновлений (список на пользователя) через обработчики бота.
+    flows может быть ленивым: синтетические обновления создаются внутри задачи пользователя.
+    """
+    request = FakeBotRequest(latency)
+    application = bot_module.build_application(request=request)
+    latencies = []
+    update_ids = itertools.count(1)
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def run_user(flow):
+        for data in flow() if callable(flow) else flow:
+            data['update_id'] = next(update_ids)
+            update = Update.de_json(data, application.bot)
+            started = time.perf_counter()
+            await application.update_processor.process_update(update, application.process_update(update))
+            latencies.append(time.perf_counter() - started)
+
+    async def run_limited(flow):
+        async with semaphore:
+            await run_user(flow)
+
+    async with application:
+        await application.post_init(application)
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        await asyncio.gather(*(run_limited(flow) if semaphore else run_user(flow) for flow in flows))
+        elapsed = time.perf_counter() - started
+        rss_after = _rss_mb()
+        await application.post_shutdown(application)
+
+    latencies.sort()
+    return {
+        'updates': len(latencies),
+        'elapsed': elapsed,
+        'rate': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': _percentile(latencies, 0.50),
+        'p99': _percentile(latencies, 0.99),
+        'rss_growth': rss_after - rss_before,
+        'calls': request.calls,
+    }
+
+
+def _synthetic_flows(users, first_user_id=1000):
+    return [lambda user_id=user_id: user_flow(user_id) for user_id in range(first_user_id, first_user_id + users)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-прогон обновлений через обработчики бота')
+    parser.add_argument('--users', default='1,100,1000,10000',
+                        help='число одновременных пользователей, через запятую для серии замеров')
+    parser.add_argument('--updates-file', help='JSONL с записанными Update вместо синтетических')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='задержка ответа фейкового Bot API')
+    parser.add_argument('--concurrency', type=int, default=0,
+                        help='ограничение числа пользователей в работе (0 = все сразу)')
+    parser.add_argument('--log', action='store_true', help='не отключать INFO-логи бота')
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    scales = [int(value) for value in args.users.split(',') if value.strip()]
+    if not args.updates_file and len(scales) > 1:
+        # Каждый масштаб в отдельном процессе: рост памяти не смешивается с прошлыми прогонами
+        for users in scales:
+            subprocess.run([sys.executable, __file__] + sys.argv[1:] + ['--users', str(users)], env=CLEAN_ENV,
+                           check=True)
+        return
+
+    flows = load_updates(args.updates_file) if args.updates_file else _synthetic_flows(scales[0])
+    result = asyncio.run(replay(flows, args.latency_ms / 1000, args.concurrency))
+    print(f"пользователей: {len(flows):7}  обновлений: {result['updates']:7}  "
+          f"скорость: {result['rate']:8.1f} upd/s  p50: {result['p50'] * 1000:7.2f} мс  "
+          f"p99: {result['p99'] * 1000:7.2f} мс  рост RSS: {result['rss_growth']:7.1f} МБ  "
+          f"вызовы API: {result['calls']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Холодный старт бота: из чего складывается импорт (python -X importtime) и сколько проходит
+от запуска процесса до готовности (READY_FILE) и первого getUpdates на фейковом Bot API,
+а также длительность остановки по SIGTERM.
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --script /path/to/old/telegram_bot_current.py   # сравнение со старой версией
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_updates import FAKE_TOKEN, FakeBotApi
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(module, cwd, env):
+    """{модуль: (собственное время, суммарное время, глубина)} в микросекундах по -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        profile[name.strip()] = (int(own), int(total), depth)
+    return profile
+
+
+class TimedBotApi(FakeBotApi):
+    """Фейковый Bot API, который запоминает момент первого getUpdates"""
+
+    def __init__(self):
+        super().__init__()
+        self.first_poll = None
+
+    async def handle(self, request):
+        if self.first_poll is None and request.match_info['method'] == 'getUpdates':
+            self.first_poll = time.perf_counter()
+        return await super().handle(request)
+
+
+async def cold_start(script, workdir, timeout=30):
+    """(до READY_FILE, до первого getUpdates, остановка по SIGTERM) в секундах одного запуска"""
+    api = TimedBotApi()
+    base_url = await api.start()
+    ready_file = os.path.join(workdir, 'ready')
+    env = dict(os.environ)
+    env.update({
+        'BOT_TOKEN': FAKE_TOKEN,
+        'ADMIN_CHAT_ID': '1',
+        'BOT_API_BASE_URL': base_url,
+        'BOT_MODE': 'polling',
+        'READY_FILE': ready_file,
+        'LOGS_DIR': os.path.join(workdir, 'logs'),
+        'LEAD_OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'LEAD_INDEX_PATH': os.path.join(workdir, 'leads_index.sqlite3'),
+        'LEAD_DB_PATH': os.path.join(workdir, 'leads.sqlite3'),
+        'ADMIN_DB_PATH': os.path.join(workdir, 'admins.sqlite3'),
+        'STATE_SNAPSHOT_PATH': os.path.join(workdir, 'snapshot.json'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    env.pop('NOTIFY_SOCKET', None)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script], cwd=os.path.dirname(script), env=env)
+    ready = None
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if ready is None and os.path.exists(ready_file):
+                ready = time.perf_counter()
+            # Версия без READY_FILE: хватает первого getUpdates
+            if api.first_poll is not None and (ready is not None or time.perf_counter() - api.first_poll > 1):
+                break
+            if process.poll() is not None:
+                raise RuntimeError(f'бот завершился с кодом {process.returncode}')
+            await asyncio.sleep(0.005)
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        while process.poll() is None and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        stopped = time.perf_counter()
+    finally:
+        if process.poll() is None:
+            process.kill()
+        await api.stop()
+    first_poll = api.first_poll - started if api.first_poll else None
+    return (ready - started if ready else None), first_poll, stopped - stopping
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return f'{statistics.median(values) * 1000:7.0f} мс' if values else '      —'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время импорта и холодного старта бота')
+    parser.add_argument('--script', default=os.path.join(HERE, 'telegram_bot_current.py'))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='сколько прямых зависимостей показать')
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    module = os.path.splitext(os.path.basename(script))[0]
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as workdir:
+        env = dict(os.environ, BOT_TOKEN=FAKE_TOKEN, LOGS_DIR=os.path.join(workdir, 'import_logs'))
+        profiles = [import_profile(module, os.path.dirname(script), env) for _ in range(args.runs)]
+        totals = [profile[module][1] / 1e6 for profile in profiles]
+        print(f"импорт {module}: медиана {_median(totals)} (из {args.runs})")
+        direct = sorted(
+            ((name, own_total[1]) for name, own_total in profiles[-1].items() if own_total[2] == 1),
+            key=lambda item: item[1], reverse=True
+        )
+        for name, total in direct[:args.top]:
+            print(f"  {name:28} {total / 1000:7.1f} мс")
+
+        results = []
+        for run in range(args.runs):
+            run_dir = os.path.join(workdir, f'run{run}')
+            os.makedirs(run_dir)
+            results.append(asyncio.run(cold_start(script, run_dir)))
+        ready, first_poll, stop = zip(*results)
+        print(f"запуск -> READY_FILE:      {_median(ready)}")
+        print(f"запуск -> первый getUpdates: {_median(first_poll)}")
+        print(f"SIGTERM -> выход:          {_median(stop)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк подготовки ответов: сборка клавиатуры и текстов в обработчике (как было)
+против готовых шаблонов из message_templates.py. Время шаблонов включает выбор языка
+пользователя (registry.for_user), которого у старых f-строк не было.
+
+    python bench_templates.py --number 100000
+"""
+
+import argparse
+import timeit
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, User
+
+from message_templates import TemplateRegistry
+
+
+def legacy_start_reply():
+    """Как было в start(): новая клавиатура и текст на каждый вызов"""
+    keyboard = [
+        [InlineKeyboardButton("🌟 Оставить заявку 🌟", callback_data='new_request')]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    welcome_text = """
+🎉 *ДОБРО ПОЖАЛОВАТЬ В МИР НЕДВИЖИМОСТИ!* 🎉
+
+🏡✨ Ваш личный помощник по анализу недвижимости ждет вас! ✨🏡
+
+🌈 Что мы предлагаем:
+🔥 Профессиональные консультации
+💎 Эксклюзивные предложения  
+🚀 Быстрый анализ рынка
+🎯 Персональный подход
+
+💫 Готовы начать путешествие в мир недвижимости? 💫
+Жмите яркую кнопку ниже! 👇✨
+    """
+    return welcome_text, reply_markup
+
+
+def legacy_help_reply(chat_id):
+    """Как было в help_command(): f-строка на каждый вызов"""
+    return f"""
+🔧 *ПОМОЩЬ ПО БОТУ FORMACONTACT* 🔧
+
+🚀 *Команды:*
+/start - Начать работу с ботом
+/help - Показать эту справку
+
+🆔 *Ваш Chat ID:* `{chat_id}`
+
+📋 *Как пользоваться:*
+1. Нажмите /start
+2. Нажмите кнопку "Оставить заявку"
+3. Введите ваше имя
+4. Введите номер телефона
+5. Готово! Ждите звонка!
+
+📞 *Поддерживаемые форматы телефонов:*
+🇷🇺 Россия: +7, 8, 7
+🌍 Международные: +код страны
+
+💬 *По вопросам пишите администратору*
+    """
+
+
+def legacy_confirmation(name, phone):
+    """Как было в message_handler(): конкатенация f-строк подтверждения"""
+    return (
+        "🎉 *ПОТРЯСАЮЩЕ! ЗАЯВКА ПРИНЯТА!* 🎉\n\n"
+        "✨ *Ваши данные:* ✨\n"
+        f"🌟 **Имя:** {name}\n"
+        f"📱 **Телефон:** {phone}\n\n"
+        "🚀 *Что дальше?*\n"
+        "💫 Наш супер-специалист уже мчится к телефону!\n"
+        "🔥 Скоро получите звонок с эксклюзивным предложением!\n"
+        "💎 Приготовьтесь к удивительным возможностям!\n\n"
+        "🌈 Хотите оставить еще одну заявку? Жмите /start! 🌈\n"
+        "✨ Мы всегда рады помочь! ✨"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк шаблонов сообщений')
+    parser.add_argument('--number', type=int, default=100_000)
+    args = parser.parse_args()
+
+    registry = TemplateRegistry(locales=('ru', 'en'), default='ru')
+    user = User(id=1, first_name='Анна', is_bot=False, language_code='en')
+
+    def templated_start_reply():
+        t = registry.for_user(user)
+        return t.welcome, t.start_markup
+
+    def templated_help_reply(chat_id):
+        return registry.for_user(user).help(chat_id=chat_id)
+
+    def templated_confirmation(name, phone):
+        return registry.for_user(user).confirmation(name=name, phone=phone)
+
+    cases = [
+        ('/start: сборка в обработчике', lambda: legacy_start_reply()),
+        ('/start: шаблоны', lambda: templated_start_reply()),
+        ('/help: f-строка', lambda: legacy_help_reply(123456789)),
+        ('/help: шаблоны', lambda: templated_help_reply(123456789)),
+        ('подтверждение: f-строки', lambda: legacy_confirmation('Анна', '+7 (916) 123-45-67')),
+        ('подтверждение: шаблоны', lambda: templated_confirmation('Анна', '+7 (916) 123-45-67')),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(f"{name:32} {seconds / args.number * 1e9:8.0f} нс/ответ")
+
+
+if __name__ == '__main__':
+    main()
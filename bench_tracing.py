@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Накладные расходы трассировки на путь обновления: PerUserUpdateProcessor -> instrument_handler ->
+form.validate -> два вызова Bot API через InstrumentedRequest (транспорт без сети), при
+TRACE_SAMPLE_RATE 0, 0.01 и 1. Плюс цена одного span() вне трассы.
+
+    python bench_tracing.py --updates 20000
+    python bench_tracing.py --keep traces.jsonl && python trace_flame.py traces.jsonl
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import timeit
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from metrics import InstrumentedRequest, instrument_handler
+from phone_utils import normalize_phone
+from tracing import FileSpanExporter, Tracer, set_tracer, span
+from update_processor import PerUserUpdateProcessor
+
+
+class InstantRequest(BaseRequest):
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        return 200, b'{"ok":true,"result":true}'
+
+
+def make_updates(count):
+    return [Update.de_json({
+        'update_id': number,
+        'message': {
+            'message_id': number, 'date': int(time.time()), 'text': '+7 916 123-45-67',
+            'chat': {'id': 1000 + number % 500, 'type': 'private'},
+            'from': {'id': 1000 + number % 500, 'is_bot': False, 'first_name': 'User'},
+        },
+    }, None) for number in range(count)]
+
+
+async def run_updates(updates):
+    request = InstrumentedRequest(InstantRequest())
+
+    async def handle(update, context):
+        with span('form.validate', field='phone'):
+            normalize_phone(update.message.text)
+        await request.do_request('https://api.telegram.org/bot1:x/sendMessage', 'POST')
+        await request.do_request('https://api.telegram.org/bot1:x/sendMessage', 'POST')
+
+    handler = instrument_handler('message', handle)
+    processor = PerUserUpdateProcessor(64)
+    started = time.perf_counter()
+    for chunk in range(0, len(updates), 500):
+        await asyncio.gather(*(
+            processor.process_update(update, handler(update, None)) for update in updates[chunk:chunk + 500]
+        ))
+    return time.perf_counter() - started
+
+
+def measure(updates, rate, path):
+    exporter = FileSpanExporter(path) if rate else None
+    previous = set_tracer(Tracer(rate, exporter))
+    try:
+        return asyncio.run(run_updates(updates)) / len(updates) * 1e6
+    finally:
+        set_tracer(previous)
+        if exporter:
+            exporter.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Накладные расходы трассировки на обновление')
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--keep', help='сохранить трассы прогона с долей 1 в этот файл')
+    args = parser.parse_args()
+
+    noop = min(timeit.repeat('with span("x"): pass', globals={'span': span}, number=200000, repeat=5))
+    print(f"span() вне трассы: {noop / 200000 * 1e9:.0f} нс")
+
+    updates = make_updates(args.updates)
+    with tempfile.TemporaryDirectory(prefix='bench_tracing_') as tmp:
+        for rate in (0.0, 0.01, 1.0):
+            path = os.path.join(tmp, f'traces_{rate}.jsonl')
+            best = min(measure(updates, rate, path) for _ in range(args.repeat))
+            size = os.path.getsize(path) / args.repeat / 2 ** 20 if rate else 0
+            print(f"TRACE_SAMPLE_RATE={rate:<5g} {best:7.1f} мкс/обновление  файл {size:6.1f} МБ за прогон")
+        if args.keep:
+            shutil.copy(os.path.join(tmp, 'traces_1.0.jsonl'), args.keep)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк транспорта Bot API на локальном фейковом сервере с задержкой ответа
+и платой за установку нового соединения.
+
+Сравнивает новое соединение на каждый вызов, HTTPXRequest() по умолчанию (одно соединение)
+и пул из http_transport; отдельно - отправку при идущем долгом getUpdates через общий
+и через раздельные пулы.
+
+    python bench_transport.py --calls 1000 --concurrency 16 --latency-ms 20 --handshake-ms 150
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from bench_updates import FAKE_TOKEN, FakeBotApi
+from http_transport import create_request
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def _send_many(bot, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def send(index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await bot.send_message(chat_id=1, text=f'заявка {index}')
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(index) for index in range(calls)))
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+async def _long_poll(bot, stop):
+    while not stop.is_set():
+        await bot.get_updates(timeout=1)
+
+
+async def run_case(base_url, request, updates_request, calls, concurrency, polling):
+    bot = Bot(FAKE_TOKEN, base_url=base_url, request=request, get_updates_request=updates_request)
+    async with bot:
+        stop = asyncio.Event()
+        poller = asyncio.create_task(_long_poll(bot, stop)) if polling else None
+        if poller:
+            await asyncio.sleep(0.1)  # getUpdates успевает занять соединение
+        elapsed, latencies, errors = await _send_many(bot, calls, concurrency)
+        if poller:
+            stop.set()
+            await poller
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пропускная способность транспорта Bot API')
+    parser.add_argument('--calls', type=int, default=1000, help='число sendMessage в каждом замере')
+    parser.add_argument('--concurrency', type=int, default=16, help='одновременных отправок')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='задержка ответа фейкового Bot API')
+    parser.add_argument('--handshake-ms', type=float, default=150.0,
+                        help='доплата за новое соединение (TLS-рукопожатие до api.telegram.org)')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    logging.getLogger('aiohttp.server').setLevel(logging.CRITICAL)
+
+    async def bench():
+        api = FakeBotApi(latency=args.latency_ms / 1000, handshake=args.handshake_ms / 1000)
+        base_url = await api.start()
+        shared = HTTPXRequest(connection_pool_size=2)
+        cases = [
+            ('новое соединение на вызов', create_request('send', base_url, keepalive=0), None, False),
+            ('HTTPXRequest() по умолчанию', HTTPXRequest(), None, False),
+            ('пул http_transport', create_request('send', base_url), None, False),
+            ('getUpdates в общем пуле (2)', shared, shared, True),
+            ('getUpdates в своем пуле', create_request('send', base_url), create_request('updates', base_url), True),
+        ]
+        try:
+            for name, request, updates_request, polling in cases:
+                elapsed, latencies, errors = await run_case(
+                    base_url, request, updates_request, args.calls, args.concurrency, polling
+                )
+                rate = len(latencies) / elapsed
+                p99 = _percentile(latencies, 0.99) * 1000 if latencies else float('nan')
+                print(f"{name:30} {rate:8.1f} вызовов/с  p99: {p99:8.1f} мс  ошибок: {errors}")
+        finally:
+            await api.stop()
+
+    asyncio.run(bench())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Локальный нагрузочный тест: сравнение пропускной способности polling и webhook.
+
+Поднимает фейковый Bot API сервер (aiohttp), направляет на него бота через base_url
+и прогоняет синтетические Update (start → кнопка → имя → телефон) для N пользователей.
+
+    python bench_updates.py --mode webhook --users 500
+    python bench_updates.py --mode polling --users 500
+"""
+
+import argparse
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import weakref
+
+from aiohttp import ClientSession, web
+
+FAKE_TOKEN = '123456:BENCH'
+ADMIN_ID = 1
+
+# Окружение без подстановок бенчмарка: процесс каждого режима создает свой каталог, иначе
+# второй режим получил бы заполненный первым индекс повторов и не слал бы заявки админу
+CLEAN_ENV = dict(os.environ)
+
+os.environ.setdefault('BOT_TOKEN', FAKE_TOKEN)
+os.environ.setdefault('ADMIN_CHAT_ID', str(ADMIN_ID))
+BENCH_DIR = tempfile.mkdtemp(prefix='bench_')
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+os.environ.setdefault('LEAD_OUTBOX_PATH', os.path.join(BENCH_DIR, 'outbox.sqlite3'))
+os.environ.setdefault('ADMIN_DB_PATH', os.path.join(BENCH_DIR, 'admins.sqlite3'))
+os.environ.setdefault('LEAD_INDEX_PATH', os.path.join(BENCH_DIR, 'leads_index.sqlite3'))
+os.environ.setdefault('LEAD_DB_PATH', os.path.join(BENCH_DIR, 'leads.sqlite3'))
+os.environ.setdefault('STATE_SNAPSHOT_PATH', os.path.join(BENCH_DIR, 'state_snapshot.json'))
+os.environ.setdefault('NOTIFY_CHAT_RATE', '1000')  # Один админ-чат получает все заявки бенчмарка
+os.environ.setdefault('RATE_LIMIT_GLOBAL_RATE', '0')  # Бенчмарк сам и есть наплыв пользователей
+os.environ.setdefault('LOGS_DIR', os.path.join(BENCH_DIR, 'logs'))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import telegram_bot_current as bot_module  # noqa: E402
+from webhook_server import SECRET_HEADER, serve_webhook  # noqa: E402
+
+_message_ids = itertools.count(1)
+
+
+def _user(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}'}
+
+
+def _message(user_id, text, entities=None):
+    message = {
+        'message_id': next(_message_ids),
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': _user(user_id),
+        'text': text,
+    }
+    if entities:
+        message['entities'] = entities
+    return message
+
+
+def user_flow(user_id):
+    """Сценарий заявки одного пользователя: /start, кнопка, имя, телефон (update_id = 0)"""
+    return [
+        {'update_id': 0, 'message': _message(user_id, '/start', [{'type': 'bot_command', 'offset': 0, 'length': 6}])},
+        {'update_id': 0, 'callback_query': {
+            'id': str(user_id), 'from': _user(user_id), 'chat_instance': str(user_id),
+            'data': 'new_request', 'message': _message(user_id, 'welcome'),
+        }},
+        {'update_id': 0, 'message': _message(user_id, f'Имя {user_id}')},
+        {'update_id': 0, 'message': _message(user_id, f'+7 916 {user_id % 10 ** 7:07d}')},
+    ]
+
+
+def synthetic_updates(users, first_user_id=1000):
+    """Полный сценарий заявки для каждого пользователя, шаги разных пользователей чередуются"""
+    update_ids = itertools.count(1)
+    steps = [user_flow(user_id) for user_id in range(first_user_id, first_user_id + users)]
+    updates = []
+    for batch in zip(*steps):
+        for update in batch:
+            update['update_id'] = next(update_ids)
+            updates.append(update)
+    return updates
+
+
+class FakeBotApi:
+    """
+    Минимальный Bot API: getMe, getUpdates, sendMessage, editMessageText и т.п.
+    latency - задержка каждого ответа; handshake - доплата за первый запрос в новом соединении
+    (как TLS-рукопожатие с api.telegram.org); getUpdates без обновлений ждет timeout секунд.
+    """
+
+    def __init__(self, updates=(), latency=0.0, handshake=0.0):
+        self.pending = list(updates)
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = weakref.WeakSet()
+        self.calls = {}
+
+    def _result(self, method, params):
+        if method == 'getMe':
+            return {'id': 42, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        if method == 'getUpdates':
+            offset = int(params.get('offset') or 0)
+            limit = int(params.get('limit') or 100)
+            self.pending = [u for u in self.pending if u['update_id'] >= offset]
+            return self.pending[:limit]
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id') or ADMIN_ID)
+            return {
+                'message_id': next(_message_ids), 'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', ''),
+            }
+        return True
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = dict(await request.post())
+        if self.handshake and request.transport not in self.connections:
+            self.connections.add(request.transport)
+            await asyncio.sleep(self.handshake)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'getUpdates' and not self.pending and params.get('timeout'):
+            await asyncio.sleep(float(params['timeout']))
+        return web.json_response({'ok': True, 'result': self._result(method, params)})
+
+    async def start(self, host='127.0.0.1', port=0):
+        web_app = web.Application()
+        web_app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(web_app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return f'http://{host}:{self.port}/bot'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def _counting_application(base_url, expected):
+    """Приложение с реальными обработчиками и счетчиком завершенных обновлений"""
+    application = bot_module.build_application(base_url=base_url)
+    done = asyncio.Event()
+    state = {'processed': 0}
+
+    async def count(update, context):
+        state['processed'] += 1
+        if state['processed'] >= expected:
+            done.set()
+
+    # Группа 1 выполняется после основного обработчика из группы 0
+    application.add_handler(TypeHandler(Update, count), group=1)
+    return application, done, state
+
+
+async def _wait_outbox_drained(timeout=30):
+    """Ожидание доставки всех заявок фоновым воркером (не входит в замер)"""
+    deadline = time.perf_counter() + timeout
+    while await bot_module.lead_outbox.pending_count() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def bench_polling(updates):
+    api = FakeBotApi(updates)
+    base_url = await api.start()
+    application, done, state = _counting_application(base_url, len(updates))
+    try:
+        async with application:
+            await application.post_init(application)
+            await application.start()
+            started = time.perf_counter()
+            await application.updater.start_polling(poll_interval=0.0, timeout=0)
+            await done.wait()
+            elapsed = time.perf_counter() - started
+            await _wait_outbox_drained()
+            await application.updater.stop()
+            await application.stop()
+            await application.post_shutdown(application)
+    finally:
+        await api.stop()
+    return elapsed, state['processed'], api.calls
+
+
+async def bench_webhook(updates, concurrency, port):
+    api = FakeBotApi()
+    base_url = await api.start()
+    application, done, state = _counting_application(base_url, len(updates))
+    secret = 'bench-secret'
+    path = '/telegram/webhook'
+    stop_event, ready_event = asyncio.Event(), asyncio.Event()
+    server = asyncio.create_task(serve_webhook(
+        application, '127.0.0.1', port, path,
+        secret_token=secret, stop_event=stop_event, ready_event=ready_event
+    ))
+    await ready_event.wait()
+
+    url = f'http://127.0.0.1:{port}{path}'
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async def sender(session):
+        while not queue.empty():
+            update = queue.get_nowait()
+            async with session.post(url, json=update, headers={SECRET_HEADER: secret}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f'webhook ответил {response.status}')
+
+    try:
+        async with ClientSession() as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+            await done.wait()
+            elapsed = time.perf_counter() - started
+            await _wait_outbox_drained()
+    finally:
+        stop_event.set()
+        await server
+        await api.stop()
+    return elapsed, state['processed'], api.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест polling/webhook на фейковом Bot API')
+    parser.add_argument('--mode', choices=('polling', 'webhook', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=250, help='число пользователей (по 4 обновления на каждого)')
+    parser.add_argument('--concurrency', type=int, default=32, help='параллельных POST в webhook-режиме')
+    parser.add_argument('--port', type=int, default=8099, help='порт webhook-сервера')
+    parser.add_argument('--log', action='store_true', help='не отключать INFO-логи бота')
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+        # Обрыв соединений фейкового API при остановке polling не интересен
+        logging.getLogger('aiohttp.server').setLevel(logging.CRITICAL)
+
+    if args.mode == 'both':
+        # Каждый режим в отдельном процессе: хранилища бота закрываются при остановке
+        for mode in ('polling', 'webhook'):
+            subprocess.run([sys.executable, __file__] + sys.argv[1:] + ['--mode', mode], env=CLEAN_ENV, check=True)
+        return
+
+    updates = synthetic_updates(args.users)
+    if args.mode == 'polling':
+        elapsed, processed, calls = asyncio.run(bench_polling(updates))
+    else:
+        elapsed, processed, calls = asyncio.run(bench_webhook(updates, args.concurrency, args.port))
+    print(f"{args.mode:8} обновлений: {processed:6}  время: {elapsed:7.3f} c  "
+          f"скорость: {processed / elapsed:8.1f} upd/s  вызовы API: {calls}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Конфигурация бота из переменных окружения. Только чтение и проверка: .env, логи и файлы
+хранилищ создает telegram_bot_current.configure() при запуске, а не импорт модулей.
+"""
+
+import functools
+import logging
+import os
+
+from http_transport import (CONNECT_TIMEOUT, HTTP_VERSIONS, KEEPALIVE, KEEPALIVE_EXPIRY, POOL_TIMEOUT, READ_TIMEOUT,
+                            SEND_POOL_SIZE, UPDATES_POOL_SIZE, WRITE_TIMEOUT, is_https)
+from log_setup import LOG_BACKUP_COUNT, LOG_MAX_BYTES, LOG_ROTATIONS, LOG_STYLES
+from notify_dispatcher import parse_chat_ids
+from state_store import DEFAULT_DB_PATH, DEFAULT_MAX_USERS, DEFAULT_TTL, STATE_BACKENDS
+
+BOT_MODES = ('polling', 'webhook')
+# Относительно рабочего каталога: /app/logs в Docker, /opt/telegram_bot/logs у setup_ubuntu.sh
+DEFAULT_LOGS_DIR = 'logs'
+
+
+def _nodes(value):
+    return [node.strip().rstrip('/') for node in value.split(',') if node.strip()]
+
+
+def _priority_rules(value):
+    """'budget=gt10, budget=gt50' -> {'budget': {'gt10', 'gt50'}}"""
+    rules = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        field, sep, choice = item.partition('=')
+        if not sep or not field.strip():
+            raise ValueError(f"LEAD_PRIORITY: ожидается поле=значение, получено {item.strip()!r}")
+        rules.setdefault(field.strip(), set()).add(choice.strip())
+    return rules
+
+
+class BotConfig:
+    """Настройки процесса бота; env - словарь переменных окружения (по умолчанию os.environ)"""
+
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        get = env.get
+        self._errors = []  # Ошибки разбора чисел, validate() сообщает их вместе
+        integer = functools.partial(self._number, get, int)
+        number = functools.partial(self._number, get, float)
+
+        self.bot_token = get('BOT_TOKEN')
+        # Дополнительные чаты/группы для заявок через запятую (рассылаются параллельно)
+        self.admin_recipients = parse_chat_ids(get('ADMIN_CHAT_ID'), get('ADMIN_CHAT_IDS'))
+        self.notify_concurrency = integer('NOTIFY_CONCURRENCY', 8)
+        self.notify_timeout = number('NOTIFY_TIMEOUT', 10.0)
+        self.notify_global_rate = number('NOTIFY_GLOBAL_RATE', 30.0)
+        self.notify_chat_rate = number('NOTIFY_CHAT_RATE', 1.0)
+
+        # Сколько пользователей обрабатывается одновременно (обновления одного пользователя - по порядку)
+        self.update_concurrency = integer('UPDATE_CONCURRENCY', 64)
+
+        # Защита от флуда: сообщений в секунду и запас на пользователя, общий лимит (0 - выключено)
+        self.rate_limit_user_rate = number('RATE_LIMIT_USER_RATE', 1.0)
+        self.rate_limit_user_burst = number('RATE_LIMIT_USER_BURST', 5.0)
+        self.rate_limit_global_rate = number('RATE_LIMIT_GLOBAL_RATE', 100.0)
+        self.rate_limit_global_burst = number('RATE_LIMIT_GLOBAL_BURST', 200.0)
+        # Сколько секунд можно придержать сообщение вместо отбрасывания
+        self.rate_limit_max_delay = number('RATE_LIMIT_MAX_DELAY', 0.5)
+        self.rate_limit_max_users = integer('RATE_LIMIT_MAX_USERS', 100000)
+
+        # Локальный Bot API сервер или фейк для нагрузочных тестов
+        self.bot_api_base_url = get('BOT_API_BASE_URL')
+
+        # Языки интерфейса: пользователю отвечаем на его языке, если он есть в BOT_LOCALES
+        self.bot_locales = [locale.strip() for locale in get('BOT_LOCALES', 'ru').split(',') if locale.strip()]
+        self.bot_default_locale = get('BOT_DEFAULT_LOCALE', 'ru')
+
+        # Метрики Prometheus: эндпоинт /metrics включается, если задан METRICS_PORT
+        self.metrics_listen = get('METRICS_LISTEN', '127.0.0.1')
+        self.metrics_port = integer('METRICS_PORT', 0)
+
+        # Режим получения обновлений: polling (по умолчанию) или webhook
+        self.bot_mode = get('BOT_MODE', 'polling').lower()
+        self.webhook_listen = get('WEBHOOK_LISTEN', '0.0.0.0')
+        self.webhook_port = integer('WEBHOOK_PORT', 8443)
+        self.webhook_path = get('WEBHOOK_PATH', '/telegram/webhook')
+        self.webhook_url = get('WEBHOOK_URL')  # Публичный URL, который регистрируется в Telegram
+        self.webhook_secret = get('WEBHOOK_SECRET')
+
+        # Срок корректной остановки (с): доработка обработчиков и доставка заявок из outbox
+        self.shutdown_timeout = number('SHUTDOWN_TIMEOUT', 20.0)
+
+        # Кластер реплик (см. cluster.py): адреса всех реплик через запятую и адрес этой реплики
+        self.cluster_nodes = _nodes(get('CLUSTER_NODES', ''))
+        self.cluster_node = get('CLUSTER_NODE', '').rstrip('/')
+        self.cluster_listen = get('CLUSTER_LISTEN', '0.0.0.0')
+        self.cluster_port = integer('CLUSTER_PORT', 8090)
+        self.cluster_secret = get('CLUSTER_SECRET')
+        self.cluster_lock_path = get('CLUSTER_LOCK_PATH', 'cluster.sqlite3')
+        self.cluster_lease_ttl = number('CLUSTER_LEASE_TTL', 15.0)
+        # Общие лимиты бота (Telegram считает их на токен) делятся между репликами
+        self.cluster_size = len(self.cluster_nodes) or 1
+
+        # Пулы соединений HTTPX к Bot API (см. http_transport.create_request)
+        self.http_pool_size = integer('HTTP_POOL_SIZE', SEND_POOL_SIZE)
+        self.http_updates_pool_size = integer('HTTP_UPDATES_POOL_SIZE', UPDATES_POOL_SIZE)
+        self.http_keepalive = integer('HTTP_KEEPALIVE', KEEPALIVE)
+        self.http_keepalive_expiry = number('HTTP_KEEPALIVE_EXPIRY', KEEPALIVE_EXPIRY)
+        self.http_version = get('HTTP_VERSION', 'auto').lower()
+        self.http_connect_timeout = number('HTTP_CONNECT_TIMEOUT', CONNECT_TIMEOUT)
+        self.http_read_timeout = number('HTTP_READ_TIMEOUT', READ_TIMEOUT)
+        self.http_write_timeout = number('HTTP_WRITE_TIMEOUT', WRITE_TIMEOUT)
+        self.http_pool_timeout = number('HTTP_POOL_TIMEOUT', POOL_TIMEOUT)
+
+        # Логи (см. log_setup.setup_logging): уровень, ротация по размеру или времени, сэмплирование, формат
+        self.logs_dir = get('LOGS_DIR', DEFAULT_LOGS_DIR)
+        self.log_level = get('LOG_LEVEL', 'INFO').upper()
+        self.log_rotation = get('LOG_ROTATION', 'size').lower()
+        self.log_max_bytes = integer('LOG_MAX_BYTES', LOG_MAX_BYTES)
+        self.log_backup_count = integer('LOG_BACKUP_COUNT', LOG_BACKUP_COUNT)
+        self.log_rotation_when = get('LOG_ROTATION_WHEN', 'midnight')
+        self.log_sample_rate = number('LOG_SAMPLE_RATE', 1.0)
+        self.log_format = get('LOG_FORMAT', 'text').lower()
+        # Трассировка (tracing.py): доля обновлений со спанами (0 - выключена) и файл OTLP/JSON
+        self.trace_sample_rate = number('TRACE_SAMPLE_RATE', 0.0)
+        self.trace_file = get('TRACE_FILE') or os.path.join(self.logs_dir, 'traces.jsonl')
+
+        # Хранилище анкет (memory или sqlite, см. state_store.create_state_store) и снимок memory-анкет
+        self.state_backend = get('STATE_BACKEND', 'memory').lower()
+        self.state_db_path = get('STATE_DB_PATH', DEFAULT_DB_PATH)
+        self.state_ttl = integer('STATE_TTL', DEFAULT_TTL)
+        self.state_max_users = integer('STATE_MAX_USERS', DEFAULT_MAX_USERS)
+        self.state_snapshot_path = get('STATE_SNAPSHOT_PATH', 'bot_state_snapshot.json')
+        self.state_eviction_interval = integer('STATE_EVICTION_INTERVAL', 600)
+
+        # Outbox заявок: заявка сохраняется на диск до подтверждения пользователю
+        self.lead_outbox_path = get('LEAD_OUTBOX_PATH', 'leads_outbox.sqlite3')
+        # Окно отсева повторных заявок по телефону и user_id (0 - отсев выключен)
+        self.lead_dedup_window = integer('LEAD_DEDUP_WINDOW', 24 * 60 * 60)
+        self.lead_index_path = get('LEAD_INDEX_PATH', 'leads_index.sqlite3')
+        # База всех заявок (включая повторы) для выгрузки через export_leads.py
+        self.lead_db_path = get('LEAD_DB_PATH', 'leads.sqlite3')
+        # Дайджест для админов: заявки копятся до LEAD_DIGEST_SIZE штук или LEAD_DIGEST_WINDOW секунд
+        # (0 - каждая заявка отдельным сообщением); срочные по LEAD_PRIORITY уходят сразу
+        self.lead_digest_window = number('LEAD_DIGEST_WINDOW', 0.0)
+        self.lead_digest_size = integer('LEAD_DIGEST_SIZE', 50)
+        self.lead_priority = _priority_rules(get('LEAD_PRIORITY', ''))
+
+        # Админ-чаты, зарегистрированные командой /admin <код> (в дополнение к ADMIN_CHAT_ID)
+        self.admin_db_path = get('ADMIN_DB_PATH', 'admins.sqlite3')
+        self.admin_enroll_code = get('ADMIN_ENROLL_CODE')
+        self.admin_max_chats = integer('ADMIN_MAX_CHATS', 50)
+
+    def _number(self, get, kind, name, default):
+        """Число из переменной name (пустая - default); ошибка разбора откладывается до validate()"""
+        value = get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return kind(value)
+        except ValueError:
+            self._errors.append(f"{name}: ожидается {'целое число' if kind is int else 'число'}, получено {value!r}")
+            return default
+
+    def validate(self):
+        """Проверка обязательных и согласованных настроек, ошибка - ValueError"""
+        if self._errors:
+            raise ValueError('; '.join(self._errors))
+        if not self.bot_token:
+            raise ValueError("BOT_TOKEN не найден в переменных окружения")
+        if self.bot_mode not in BOT_MODES:
+            raise ValueError(f"Неизвестный BOT_MODE: {self.bot_mode} (ожидается polling или webhook)")
+        if self.bot_mode == 'webhook' and not self.webhook_secret:
+            raise ValueError("WEBHOOK_SECRET обязателен в режиме webhook")
+        if self.cluster_nodes and self.cluster_node not in self.cluster_nodes:
+            raise ValueError(f"CLUSTER_NODE {self.cluster_node!r} не найден в CLUSTER_NODES")
+        if not 0 <= self.trace_sample_rate <= 1:
+            raise ValueError("TRACE_SAMPLE_RATE должен быть от 0 до 1")
+        if self.lead_digest_window < 0 or self.lead_digest_size < 1:
+            raise ValueError("LEAD_DIGEST_WINDOW должен быть >= 0, LEAD_DIGEST_SIZE - не меньше 1")
+        if self.state_backend not in STATE_BACKENDS:
+            raise ValueError(f"Неизвестный STATE_BACKEND: {self.state_backend} (ожидается memory или sqlite)")
+        if self.state_ttl <= 0 or self.state_max_users < 1:
+            raise ValueError("STATE_TTL и STATE_MAX_USERS должны быть больше 0")
+        if self.http_version not in HTTP_VERSIONS:
+            raise ValueError(f"Неизвестный HTTP_VERSION: {self.http_version} (ожидается {', '.join(HTTP_VERSIONS)})")
+        if self.http_version in ('2', '2.0') and not is_https(self.bot_api_base_url):
+            raise ValueError(f"HTTP_VERSION={self.http_version} работает только по https, BOT_API_BASE_URL: "
+                             f"{self.bot_api_base_url} (используйте auto или 1.1)")
+        if self.http_pool_size < 1 or self.http_updates_pool_size < 1 or self.http_keepalive < 0:
+            raise ValueError("HTTP_POOL_SIZE и HTTP_UPDATES_POOL_SIZE должны быть больше 0, HTTP_KEEPALIVE - не меньше 0")
+        if not isinstance(logging.getLevelName(self.log_level), int):
+            raise ValueError(f"Неизвестный LOG_LEVEL: {self.log_level}")
+        if self.log_rotation not in LOG_ROTATIONS:
+            raise ValueError(f"Неизвестный LOG_ROTATION: {self.log_rotation} (ожидается size или time)")
+        if self.log_format not in LOG_STYLES:
+            raise ValueError(f"Неизвестный LOG_FORMAT: {self.log_format} (ожидается text или json)")
+        if not 0 <= self.log_sample_rate <= 1:
+            raise ValueError("LOG_SAMPLE_RATE должен быть от 0 до 1")
+        if self.cluster_nodes and not self.cluster_secret:
+            raise ValueError("CLUSTER_SECRET обязателен при заданном CLUSTER_NODES")
+        if self.cluster_nodes and self.state_backend != 'sqlite':
+            raise ValueError("В кластере анкеты должны быть в общем хранилище: STATE_BACKEND=sqlite")
+        return self
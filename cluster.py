@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Несколько реплик бота с общим хранилищем на одной машине (или общем томе).
+
+Обновления от Telegram получает одна реплика-лидер: аренда в общем SQLite-файле достается
+одной реплике, она опрашивает getUpdates (в webhook-режиме - регистрирует webhook, а принимать
+его может любая реплика). Каждое обновление по consistent hashing ключа пользователя уходит
+одной реплике-обработчику: шаги анкеты одного пользователя идут по порядку в одном процессе,
+а состояние анкеты лежит в общем SQLite (STATE_BACKEND=sqlite), поэтому при падении реплики
+ее пользователей продолжает следующая по кольцу.
+
+Реплики обмениваются пачками обновлений по HTTP: POST CLUSTER_PATH со списком Update в JSON.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import sqlite3
+import threading
+import time
+
+from aiohttp import ClientSession, ClientTimeout, web
+from telegram import Update
+from telegram.error import Conflict, TelegramError
+
+from lifecycle import DEFAULT_SHUTDOWN_TIMEOUT, run_until_signal, start_application, stop_application
+from metrics import CLUSTER_UPDATES
+from update_processor import update_user_key
+from webhook_server import SECRET_HEADER, update_handler
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_PATH = '/cluster/updates'
+# Виртуальных точек на реплику: чем больше, тем ровнее делятся пользователи
+DEFAULT_VNODES = 64
+# Лидер продлевает аренду каждые ttl / 3 секунд; упавшего лидера сменяют через ttl
+DEFAULT_LEASE_TTL = 15.0
+DEFAULT_POLL_TIMEOUT = 10
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_RETRY_DELAY = 1.0
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Кольцо consistent hashing: ключ принадлежит первой точке по часовой стрелке. При добавлении
+    или отключении реплики переезжают только ее пользователи, остальные остаются на месте.
+    """
+
+    def __init__(self, nodes, vnodes=DEFAULT_VNODES):
+        if not nodes:
+            raise ValueError("Кольцо без реплик")
+        self.nodes = tuple(nodes)
+        points = sorted((_hash(f'{node}#{index}'), node) for node in self.nodes for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key, down=()):
+        """Реплика для ключа; реплики из down пропускаются (None - все недоступны)"""
+        index = bisect.bisect(self._hashes, _hash(key))
+        owners = self._owners
+        for offset in range(len(owners)):
+            node = owners[(index + offset) % len(owners)]
+            if node not in down:
+                return node
+        return None
+
+
+class LeaderLease:
+    """
+    Аренда лидерства в SQLite: запись с владельцем и сроком. Захват и продление - один UPSERT,
+    который срабатывает, только если запись наша или срок истек, поэтому лидер всегда один.
+    """
+
+    def __init__(self, path, owner, ttl=DEFAULT_LEASE_TTL, name='updates', clock=time.time):
+        self.path = path
+        self.owner = owner
+        self.ttl = ttl
+        self.name = name
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=ttl)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def try_acquire(self):
+        """Захват или продление аренды; False, если ее держит другая живая реплика"""
+        now = self.clock()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.owner = excluded.owner OR leases.expires_at <= ?',
+                (self.name, self.owner, now + self.ttl, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def holder(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT owner FROM leases WHERE name = ? AND expires_at > ?', (self.name, self.clock())
+            ).fetchone()
+        return row[0] if row else None
+
+    def release(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (self.name, self.owner))
+            self._conn.commit()
+
+    async def acquire(self):
+        return await asyncio.to_thread(self.try_acquire)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ClusterRouter:
+    """
+    Отправка обновления реплике-владельцу: своей - сразу в очередь приложения, чужой - через
+    очередь с одним отправителем на реплику, который шлет пачки по порядку. Недоступная реплика
+    исключается из кольца, ее очередь и новые обновления достаются следующей по кольцу.
+    """
+
+    def __init__(self, ring, node, local, secret, batch_size=DEFAULT_BATCH_SIZE, retry_delay=DEFAULT_RETRY_DELAY):
+        self.ring = ring
+        self.node = node
+        self.local = local  # async local(update) - очередь обновлений своего приложения
+        self.secret = secret
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.down = set()
+        self._queues = {peer: asyncio.Queue() for peer in ring.nodes if peer != node}
+        self._senders = []
+        self._session = None
+        self._in_flight = 0
+        self._flushed = asyncio.Event()
+        self._flushed.set()
+
+    async def start(self):
+        self._session = ClientSession(timeout=ClientTimeout(total=10))
+        self._senders = [asyncio.create_task(self._send(peer, queue)) for peer, queue in self._queues.items()]
+
+    async def close(self):
+        for sender in self._senders:
+            sender.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    async def route(self, update):
+        await self._dispatch(update_user_key(update), update)
+
+    async def _dispatch(self, key, update):
+        node = self.ring.node_for(key, self.down) if key is not None else self.node
+        if node == self.node:
+            CLUSTER_UPDATES.inc('local')
+            await self.local(update)
+            return
+        self._in_flight += 1
+        self._flushed.clear()
+        self._queues[node].put_nowait((key, update))
+
+    def _done(self, count):
+        self._in_flight -= count
+        if not self._in_flight:
+            self._flushed.set()
+
+    async def flush(self):
+        """Ожидание, пока все разосланные обновления приняты репликами"""
+        await self._flushed.wait()
+
+    async def _post(self, peer, payload):
+        async with self._session.post(peer + CLUSTER_PATH, json=payload, headers={SECRET_HEADER: self.secret}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+
+    async def _send(self, peer, queue):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._post(peer, [update.to_dict() for _, update in batch])
+            except Exception as e:
+                logger.error("❌ Реплика %s недоступна, ее пользователи переходят к соседям: %s", peer, e)
+                self.down.add(peer)
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                for key, update in batch:
+                    CLUSTER_UPDATES.inc('rerouted')
+                    await self._dispatch(key, update)
+                self._done(len(batch))
+                await self._wait_recovered(peer)
+                continue
+            CLUSTER_UPDATES.inc('remote', amount=len(batch))
+            self._done(len(batch))
+
+    async def _wait_recovered(self, peer):
+        while True:
+            await asyncio.sleep(self.retry_delay)
+            try:
+                await self._post(peer, [])
+            except Exception:
+                continue
+            self.down.discard(peer)
+            logger.info("✅ Реплика %s снова принимает обновления", peer)
+            return
+
+
+def create_cluster_app(application, secret, router=None, webhook_path=None, webhook_secret=None):
+    """
+    aiohttp-приложение реплики: прием пачек от других реплик, а при webhook_path -
+    и webhook Telegram, обновления которого сразу раскладываются по репликам.
+    """
+
+    async def handle_batch(request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            logger.warning("⛔ Пачка обновлений с неверным секретом кластера от %s", request.remote)
+            return web.Response(status=403)
+        try:
+            updates = [Update.de_json(data, application.bot) for data in await request.json()]
+        except Exception as e:
+            logger.warning("⚠️ Некорректная пачка обновлений: %s", e)
+            return web.Response(status=400)
+        for update in updates:
+            await application.update_queue.put(update)
+        if updates:
+            CLUSTER_UPDATES.inc('received', amount=len(updates))
+        return web.Response()
+
+    web_app = web.Application()
+    web_app.router.add_post(CLUSTER_PATH, handle_batch)
+    if webhook_path:
+        web_app.router.add_post(webhook_path, update_handler(application, webhook_secret, router.route))
+    return web_app
+
+
+async def poll_updates(bot, router, timeout=DEFAULT_POLL_TIMEOUT, allowed_updates=None):
+    """
+    Цикл getUpdates лидера. Следующий offset подтверждает пачку в Telegram только после того,
+    как все ее обновления приняты репликами: при смене лидера пачка придет повторно, а не потеряется.
+    """
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates)
+        except Conflict as e:
+            logger.warning("⚠️ getUpdates занят другим процессом: %s", e)
+            await asyncio.sleep(timeout)
+            continue
+        except TelegramError as e:
+            logger.error("❌ Ошибка getUpdates: %s", e)
+            await asyncio.sleep(DEFAULT_RETRY_DELAY)
+            continue
+        for update in updates:
+            await router.route(update)
+        await router.flush()
+        if updates:
+            offset = updates[-1].update_id + 1
+
+
+async def hold_leadership(lease, on_elected, interval=None):
+    """
+    Периодический захват аренды. on_elected() вызывается при получении лидерства и может вернуть
+    задачу (опрос getUpdates), которая отменяется, если аренда потеряна или реплика остановлена.
+    """
+    interval = interval or lease.ttl / 3
+    leader = False
+    task = None
+    try:
+        while True:
+            try:
+                acquired = await lease.acquire()
+            except Exception as e:
+                logger.error("❌ Ошибка продления аренды лидера: %s", e)
+                acquired = False
+            if acquired and not leader:
+                leader = True
+                logger.info("👑 Реплика %s стала лидером", lease.owner)
+                task = await on_elected()
+            elif not acquired and leader:
+                leader = False
+                logger.warning("⚠️ Реплика %s потеряла лидерство", lease.owner)
+                if task:
+                    task.cancel()
+                    task = None
+            await asyncio.sleep(interval)
+    finally:
+        if task:
+            task.cancel()
+        if leader:
+            await asyncio.to_thread(lease.release)
+
+
+async def serve_cluster(application, nodes, node, secret, lock_path, listen, port, mode='polling',
+                        lease_ttl=DEFAULT_LEASE_TTL, poll_timeout=DEFAULT_POLL_TIMEOUT,
+                        webhook_path=None, webhook_secret=None, webhook_url=None, allowed_updates=None,
+                        shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT, stop_event=None, ready_event=None):
+    """Жизненный цикл реплики кластера (аналог run_polling / serve_webhook)"""
+    stop_event = stop_event or asyncio.Event()
+    ring = HashRing(nodes)
+    router = ClusterRouter(ring, node, application.update_queue.put, secret)
+    lease = LeaderLease(lock_path, node, ttl=lease_ttl)
+    runner = web.AppRunner(create_cluster_app(
+        application, secret, router,
+        webhook_path=webhook_path if mode == 'webhook' else None,
+        webhook_secret=webhook_secret
+    ))
+
+    async def on_elected():
+        if mode == 'webhook':
+            if webhook_url:
+                await application.bot.set_webhook(url=webhook_url, secret_token=webhook_secret,
+                                                  allowed_updates=allowed_updates)
+                logger.info("🔗 Webhook зарегистрирован: %s", webhook_url)
+            return None
+        await application.bot.delete_webhook()
+        return asyncio.create_task(poll_updates(application.bot, router, poll_timeout, allowed_updates))
+
+    await start_application(application)
+    leadership = None
+    try:
+        # Порт занят: приложение уже запущено, а у маршрутизатора открыта сессия - все закрывается
+        await router.start()
+        await runner.setup()
+        await web.TCPSite(runner, listen, port).start()
+        logger.info("🧩 Реплика %s (%s в кластере) слушает %s:%s", node, len(ring.nodes), listen, port)
+        leadership = asyncio.create_task(hold_leadership(lease, on_elected))
+        if ready_event:
+            ready_event.set()
+
+        await stop_event.wait()
+    finally:
+        if leadership is not None:
+            leadership.cancel()
+            await asyncio.gather(leadership, return_exceptions=True)
+        await runner.cleanup()
+        await router.close()
+        await lease.close()
+        await stop_application(application, shutdown_timeout)
+        logger.info("🛑 Реплика %s остановлена", node)
+
+
+def run_cluster(application, **kwargs):
+    """Блокирующий запуск реплики до SIGINT/SIGTERM"""
+    run_until_signal(serve_cluster, application, **kwargs)
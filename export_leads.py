@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Выгрузка заявок из LEAD_DB_PATH в CSV или JSONL потоком, при любом числе строк.
+
+    python export_leads.py --format csv --since 2024-06-01 --until 2024-07-01 -o june.csv
+    python export_leads.py --format jsonl --since 2024-06-01T09:00 > leads.jsonl
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from lead_store import WRITERS, LeadStore
+
+
+def parse_time(value):
+    """Дата или дата-время ISO 8601; без часового пояса - локальное время сервера"""
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Потоковая выгрузка заявок в CSV/JSONL')
+    parser.add_argument('--db', default=os.getenv('LEAD_DB_PATH', 'leads.sqlite3'), help='база заявок')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--since', type=parse_time, help='начало периода включительно (2024-06-01)')
+    parser.add_argument('--until', type=parse_time, help='конец периода не включительно')
+    parser.add_argument('-o', '--output', help='файл выгрузки (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ База заявок не найдена: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    store = LeadStore(args.db)
+    leads = store.iter_leads(since=args.since, until=args.until)
+    write = WRITERS[args.format]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as stream:
+            count = write(leads, stream)
+    else:
+        count = write(leads, sys.stdout)
+    print(f"✅ Выгружено заявок: {count}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Замена Application для тестов запуска и остановки: бот для de_json, очередь обновлений
+и запись шагов жизненного цикла в calls.
+"""
+
+import asyncio
+
+from telegram import Bot
+
+
+class LifecycleApplication:
+    post_init = post_stop = post_shutdown = update_processor = None
+
+    def __init__(self):
+        self.bot = Bot('123456:TEST')
+        self.update_queue = asyncio.Queue()
+        self.bot_data = {}
+        self.calls = []
+        self.running = False
+
+    async def initialize(self):
+        self.calls.append('initialize')
+
+    async def start(self):
+        self.calls.append('start')
+        self.running = True
+
+    async def stop(self):
+        self.calls.append('stop')
+        self.running = False
+
+    async def shutdown(self):
+        self.calls.append('shutdown')
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Модельные часы для тестов и бенчмарков: передаются как clock= в хранилища, лимитер и воркеры,
+время двигается присваиванием clock.now.
+"""
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
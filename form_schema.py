@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Декларативная анкета: список полей (вопрос, валидатор, варианты-кнопки) компилируется при старте
+в таблицу переходов. Обработчик по имени шага из состояния за один dict.get находит поле,
+проверяет ответ и получает следующий шаг, без цепочки if/elif по строкам.
+
+Вопросы и ошибки - имена полей из message_templates.TEMPLATE_FIELDS, поэтому переводятся
+вместе с остальными текстами. Новое поле анкеты - одна строка в LEAD_FORM и два текста.
+"""
+
+from collections import namedtuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from message_templates import TEMPLATE_FIELDS
+from phone_utils import normalize_phone
+from text_utils import sanitize_name
+
+# Префикс callback_data кнопок анкеты: 'form:<номер шага>:<номер варианта>'
+FORM_CALLBACK_PREFIX = 'form'
+MIN_NAME_LENGTH = 2
+
+Choice = namedtuple('Choice', ('value', 'label'))
+
+# Скомпилированный шаг: next - следующий Step или None, markup - кнопки вариантов
+Step = namedtuple('Step', ('name', 'field', 'next', 'markup'))
+
+
+def validate_name(text):
+    """Имя после sanitize_name (без управляющих символов, до MAX_NAME_LENGTH), не короче MIN_NAME_LENGTH"""
+    name = sanitize_name(text)
+    return name if len(name) >= MIN_NAME_LENGTH else None
+
+
+def validate_phone(text):
+    """Телефон в E.164 (те же правила, что is_valid_phone); показывать через format_phone"""
+    phone = normalize_phone(text)
+    return phone.e164 if phone is not None else None
+
+
+class Field:
+    """
+    Поле анкеты. validate(text) возвращает значение для состояния или None, если ответ неверный;
+    у поля с choices ответ можно дать кнопкой или текстом подписи варианта.
+    label - подпись в логах и заявке для админов, funnel - этап LEAD_FUNNEL после ответа.
+    """
+
+    __slots__ = ('key', 'prompt', 'error', 'validate', 'choices', 'label', 'funnel', '_labels')
+
+    def __init__(self, key, prompt, error, validate=None, choices=(), label=None, funnel=None):
+        self.key = key
+        self.prompt = prompt
+        self.error = error
+        self.choices = tuple(Choice(*choice) for choice in choices)
+        self.label = label or key
+        self.funnel = funnel
+        self._labels = {choice.value: choice.label for choice in self.choices}
+        if validate is None:
+            if not self.choices:
+                raise ValueError(f"Поле {key}: нужен validate или choices")
+            by_label = {choice.label.casefold(): choice.value for choice in self.choices}
+            validate = lambda text: by_label.get(text.strip().casefold())
+        self.validate = validate
+
+    def display(self, value):
+        """Значение для людей: подпись варианта вместо его кода"""
+        return self._labels.get(value, value)
+
+    def __repr__(self):
+        return f'Field({self.key!r})'
+
+
+class FormSchema:
+    """Таблица переходов анкеты: имя шага -> Step, callback_data кнопки -> (Step, значение)"""
+
+    def __init__(self, fields, callback_prefix=FORM_CALLBACK_PREFIX):
+        if not fields:
+            raise ValueError("Анкета без полей")
+        keys = [field.key for field in fields]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Повторяющиеся поля анкеты: {keys}")
+        unknown = [name for field in fields for name in (field.prompt, field.error) if name not in TEMPLATE_FIELDS]
+        if unknown:
+            raise ValueError(f"Нет таких текстов в message_templates: {unknown}")
+
+        self.fields = tuple(fields)
+        self.steps = {}
+        self.callbacks = {}
+        following = None
+        # С конца, чтобы у каждого шага уже был готовый следующий
+        for index in range(len(fields) - 1, -1, -1):
+            field = fields[index]
+            data = [f'{callback_prefix}:{index}:{number}' for number in range(len(field.choices))]
+            markup = InlineKeyboardMarkup([
+                [InlineKeyboardButton(choice.label, callback_data=button)]
+                for choice, button in zip(field.choices, data)
+            ]) if field.choices else None
+            following = Step(f'waiting_{field.key}', field, following, markup)
+            self.steps[following.name] = following
+            for choice, button in zip(field.choices, data):
+                self.callbacks[button] = (following, choice.value)
+        self.first = following
+
+    def step(self, state):
+        """Текущий шаг пользователя или None, если анкета не начата"""
+        return self.steps.get(state.get('step'))
+
+    def start_state(self):
+        return {'step': self.first.name}
+
+    def choice(self, data):
+        """(Step, значение) для callback_data кнопки анкеты или None"""
+        return self.callbacks.get(data)
+
+    def advance(self, state, step, value):
+        """Сохраняет ответ в состоянии и возвращает следующий шаг (None - анкета заполнена)"""
+        state[step.field.key] = value
+        following = step.next
+        if following is not None:
+            state['step'] = following.name
+        else:
+            state.pop('step', None)
+        return following
+
+    def extra_answers(self, state, skip=()):
+        """Ответы дополнительных полей для заявки: [(подпись, значение), ...]"""
+        return [
+            (field.label, field.display(state[field.key]))
+            for field in self.fields if field.key not in skip and field.key in state
+        ]
+
+
+# Анкета заявки. Шаги waiting_name/waiting_phone совпадают с прежними, сохраненные состояния подходят.
+# Например, бюджет кнопками:
+#   Field('budget', 'ask_budget', 'budget_invalid', label='Бюджет',
+#         choices=(('lt10', 'до 10 млн'), ('gt10', 'от 10 млн')))
+LEAD_FORM = FormSchema([
+    Field('name', 'ask_name', 'name_too_short', validate_name, label='Имя', funnel='name'),
+    Field('phone', 'ask_phone', 'phone_invalid', validate_phone, label='Телефон'),
+])
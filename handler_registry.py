@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Реестр обработчиков бота: общие обработчики анкеты и функции, которые встраиваются вокруг них.
+
+- handler(name, callback, make) - обработчик PTB; make(callback) собирает CommandHandler,
+  MessageHandler и т.п. (например, functools.partial(CommandHandler, 'start')).
+- middleware(name, wrap, enabled) - обертка wrap(имя обработчика, callback) -> callback вокруг
+  каждого обработчика: имя в логах, метрики, трассировка. Первая зарегистрированная - внешняя.
+- plugin(name, install, enabled) - install(application) добавляет свое в приложение: например,
+  лимит флуда - TypeHandler в группе RATE_LIMIT_GROUP, которая срабатывает раньше анкеты.
+
+Цепочки оберток собираются один раз в install(): на обновление они стоят ровно столько, сколько
+включенные обертки, а выключенная функция (enabled=False) в приложение не попадает вовсе.
+Новая функция подключается регистрацией, без правки обработчиков (см. plugins в build_application).
+"""
+
+from collections import namedtuple
+
+Registration = namedtuple('Registration', ('name', 'target', 'enabled'))
+HandlerEntry = namedtuple('HandlerEntry', ('name', 'callback', 'make', 'group'))
+
+
+class HandlerRegistry:
+    """Порядок регистрации сохраняется: обработчики добавляются в приложение в том же порядке"""
+
+    def __init__(self):
+        self._handlers = []
+        self._middleware = []
+        self._plugins = []
+
+    @staticmethod
+    def _check_name(kind, entries, name):
+        if any(entry.name == name for entry in entries):
+            raise ValueError(f"{kind} '{name}' уже зарегистрирован")
+
+    def handler(self, name, callback, make, group=0):
+        self._check_name('Обработчик', self._handlers, name)
+        self._handlers.append(HandlerEntry(name, callback, make, group))
+
+    def middleware(self, name, wrap, enabled=True):
+        self._check_name('Middleware', self._middleware, name)
+        self._middleware.append(Registration(name, wrap, enabled))
+
+    def plugin(self, name, install, enabled=True):
+        self._check_name('Плагин', self._plugins, name)
+        self._plugins.append(Registration(name, install, enabled))
+
+    def wrap(self, name, callback):
+        """callback обработчика name во всех включенных обертках"""
+        for middleware in reversed(self._middleware):
+            if middleware.enabled:
+                callback = middleware.target(name, callback)
+        return callback
+
+    def features(self):
+        """(включенные, выключенные) имена middleware и плагинов - для лога запуска"""
+        entries = self._middleware + self._plugins
+        return ([entry.name for entry in entries if entry.enabled],
+                [entry.name for entry in entries if not entry.enabled])
+
+    def install(self, application):
+        """Плагины, затем обработчики в обертках; возвращает application"""
+        for plugin in self._plugins:
+            if plugin.enabled:
+                plugin.target(application)
+        for entry in self._handlers:
+            application.add_handler(entry.make(self.wrap(entry.name, entry.callback)), entry.group)
+        return application
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Транспорт Bot API: пулы соединений HTTPX с keep-alive и таймаутами (HTTP_* в bot_config).
+
+Отправка сообщений и getUpdates ходят через разные пулы, чтобы долгий опрос
+не занимал соединения, нужные для ответов пользователям. SSL-контекст (загрузка корневых
+сертификатов, ~50 мс на пул) создается один раз и общий для обоих пулов.
+"""
+
+import functools
+import importlib.util
+import logging
+import os
+import ssl
+
+import httpx
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+SEND_POOL_SIZE = 64
+UPDATES_POOL_SIZE = 2
+# httpcore на каждый запрос перебирает все соединения пула, поэтому держим открытыми не все
+KEEPALIVE = 16
+KEEPALIVE_EXPIRY = 60.0
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 10.0
+WRITE_TIMEOUT = 10.0
+POOL_TIMEOUT = 3.0
+HTTP_VERSIONS = ('auto', '1.1', '1', '2', '2.0')
+
+
+@functools.lru_cache(maxsize=None)
+def ssl_context():
+    """Общий SSL-контекст пулов, сертификаты как по умолчанию в httpx: SSL_CERT_FILE/SSL_CERT_DIR или certifi"""
+    if os.getenv('SSL_CERT_FILE'):
+        return ssl.create_default_context(cafile=os.environ['SSL_CERT_FILE'])
+    if os.getenv('SSL_CERT_DIR'):
+        return ssl.create_default_context(capath=os.environ['SSL_CERT_DIR'])
+    import certifi
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def http2_available():
+    return importlib.util.find_spec('h2') is not None
+
+
+def is_https(base_url=None):
+    """Bot API по умолчанию (base_url не задан) - https://api.telegram.org"""
+    return (base_url or 'https://').lower().startswith('https://')
+
+
+def resolve_http_version(setting, base_url=None):
+    """
+    HTTP/2 только поверх TLS и при установленном h2 (python-telegram-bot[http2]):
+    без TLS httpx не может договориться о версии и оборвет соединение с HTTP/1.1 сервером.
+    """
+    setting = (setting or 'auto').lower()
+    if setting in ('1.1', '1'):
+        return '1.1'
+    https = is_https(base_url)
+    if setting in ('2', '2.0'):
+        if not https:
+            logger.warning("⚠️ HTTP/2 запрошен для %s без TLS - используется HTTP/1.1", base_url)
+            return '1.1'
+        if not http2_available():
+            logger.warning("⚠️ HTTP/2 запрошен, но пакет h2 не установлен - используется HTTP/1.1")
+            return '1.1'
+        return '2'
+    return '2' if https and http2_available() else '1.1'
+
+
+def create_request(kind='send', base_url=None, pool_size=None, keepalive=KEEPALIVE, keepalive_expiry=KEEPALIVE_EXPIRY,
+                   http_version='auto', connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                   write_timeout=WRITE_TIMEOUT, pool_timeout=POOL_TIMEOUT):
+    """
+    HTTPXRequest для отправки (kind='send') или для getUpdates (kind='updates').
+    pool_size по умолчанию - SEND_POOL_SIZE или UPDATES_POOL_SIZE.
+    """
+    pool_size = pool_size or (UPDATES_POOL_SIZE if kind == 'updates' else SEND_POOL_SIZE)
+    version = resolve_http_version(http_version, base_url)
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=min(keepalive, pool_size),
+        keepalive_expiry=keepalive_expiry
+    )
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        write_timeout=write_timeout,
+        pool_timeout=pool_timeout,
+        http_version=version,
+        httpx_kwargs={'limits': limits, 'verify': ssl_context()}
+    )
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Дайджест заявок для админов: в пик кампании заявки копятся в outbox и уходят одним
+сообщением на каждые ~4096 символов вместо отдельного send_message на каждую.
+Срочные заявки (поле анкеты из LEAD_PRIORITY) отправляются сразу, минуя дайджест.
+
+Заявки до отправки остаются в outbox, поэтому ожидание дайджеста переживает перезапуск.
+"""
+
+import functools
+
+from lead_outbox import OutboxWorker
+from notify_dispatcher import TELEGRAM_TEXT_LIMIT, text_length
+
+DIGEST_SEPARATOR = '\n\n➖➖➖➖➖\n\n'
+
+
+def is_priority(answers, rules):
+    """Срочная ли заявка: rules - {поле: {значения}}, answers - ответы анкеты"""
+    return any(answers.get(field) in values for field, values in rules.items())
+
+
+def pack_digest(texts, limit=TELEGRAM_TEXT_LIMIT, header=None, separator=DIGEST_SEPARATOR):
+    """
+    Склейка текстов заявок по порядку в сообщения не длиннее limit: [(номера текстов, текст), ...].
+    Заявка не делится между сообщениями; заявка длиннее limit уходит отдельным сообщением
+    (его режет на части NotificationDispatcher). header - шаблон preformat() с {count} в начале сообщения.
+    """
+    separator_length = text_length(separator)
+    messages = []
+    group, body, size = [], [], 0
+
+    def header_length(count):
+        return text_length(header(count=count)) if header else 0
+
+    def flush():
+        text = separator.join(body)
+        messages.append((group, header(count=len(group)) + text if header else text))
+
+    for index, text in enumerate(texts):
+        length = text_length(text)
+        if group and header_length(len(group) + 1) + size + separator_length + length <= limit:
+            group.append(index)
+            body.append(text)
+            size += separator_length + length
+            continue
+        if group:
+            flush()
+        group, body, size = [index], [text], length
+    if group:
+        flush()
+    return messages
+
+
+class DigestWorker(OutboxWorker):
+    """
+    OutboxWorker с дайджестом: обычные заявки ждут в outbox, пока их не наберется max_leads
+    или самой старой не исполнится window секунд, и уходят пачкой pack_digest. Заявки с
+    payload['priority'] отправляются сразу по одной. Пачка из одной заявки уходит как есть.
+    """
+
+    def __init__(self, outbox, deliver, window, max_leads=50, header=None, limit=TELEGRAM_TEXT_LIMIT, **kwargs):
+        kwargs['batch_size'] = max(kwargs.get('batch_size', 50), max_leads)
+        super().__init__(outbox, deliver, **kwargs)
+        self.window = window
+        self.max_leads = max_leads
+        self.header = header
+        self.limit = limit
+        self._flush = False
+        self._deadline = None  # Когда закроется окно самой старой ожидающей заявки
+
+    def digest_due(self, leads):
+        if not leads:
+            return False
+        oldest = min(lead['created_at'] for lead in leads)
+        return self._flush or len(leads) >= self.max_leads or self.outbox.clock() - oldest >= self.window
+
+    def batches(self, leads):
+        urgent = [lead for lead in leads if lead['payload'].get('priority')]
+        regular = [lead for lead in leads if not lead['payload'].get('priority')]
+        planned = super().batches(urgent)
+        self._deadline = None
+        if not self.digest_due(regular):
+            if regular:
+                self._deadline = min(lead['created_at'] for lead in regular) + self.window
+            return planned
+        texts = [lead['payload']['text'] for lead in regular]
+        for indexes, text in pack_digest(texts, self.limit, self.header):
+            group = [regular[index] for index in indexes]
+            payload = group[0]['payload'] if len(group) == 1 else {'text': text, 'leads': len(group)}
+            planned.append((group, functools.partial(self.deliver, payload)))
+        return planned
+
+    def wait_timeout(self):
+        """До закрытия окна самой старой ожидающей заявки, но не дольше poll_interval"""
+        if self._deadline is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, self._deadline - self.outbox.clock()))
+
+    async def drain(self, timeout):
+        """При остановке накопленный дайджест отправляется, не дожидаясь окна"""
+        self._flush = True
+        try:
+            return await super().drain(timeout)
+        finally:
+            self._flush = False
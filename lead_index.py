@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Индекс заявок для отсева повторов: по нормализованному телефону (E.164) и по user_id
+в пределах окна (по умолчанию сутки).
+
+Проверка - поиск в двух dict в памяти, поэтому O(1) при любом числе заявок. В памяти
+и в SQLite только заявки из текущего окна: база восстанавливает окно при перезапуске,
+а полная история заявок хранится в lead_store.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 24 * 60 * 60
+
+# Первая заявка окна и число повторов, слитых с ней
+LeadRecord = namedtuple('LeadRecord', ['phone', 'user_id', 'first_seen', 'repeats'])
+
+# Результат проверки: matched_by - 'phone' или 'user', record - заявка до этого повтора
+LeadMatch = namedtuple('LeadMatch', ['matched_by', 'record'])
+
+
+class LeadIndex:
+    """Окно последних заявок в памяти (OrderedDict по времени) с копией в SQLite"""
+
+    def __init__(self, path, window=DEFAULT_WINDOW, clock=time.time):
+        self.path = path
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leads_seen ('
+            'phone TEXT NOT NULL, user_id INTEGER NOT NULL, first_seen REAL NOT NULL, '
+            'repeats INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS leads_seen_first_seen ON leads_seen (first_seen)')
+        self._conn.commit()
+        # Порядок вставки совпадает с first_seen: вытеснение снимает записи с начала
+        self._by_phone = OrderedDict()
+        self._by_user = OrderedDict()
+        rows = self._conn.execute(
+            'SELECT phone, user_id, first_seen, repeats FROM leads_seen WHERE first_seen > ? ORDER BY first_seen',
+            (self.clock() - self.window,)
+        )
+        for row in rows:
+            self._remember(LeadRecord(*row))
+
+    def __len__(self):
+        return len(self._by_phone)
+
+    def _remember(self, record):
+        for index, key in ((self._by_phone, record.phone), (self._by_user, record.user_id)):
+            index.pop(key, None)
+            index[key] = record
+
+    def _fresh(self, index, key, now):
+        record = index.get(key)
+        if record is None or record.first_seen <= now - self.window:
+            return None
+        return record
+
+    def lookup(self, user_id, phone):
+        """Совпадение в окне: сначала по телефону, затем по пользователю; None - новая заявка"""
+        now = self.clock()
+        record = self._fresh(self._by_phone, phone, now)
+        if record is not None:
+            return LeadMatch('phone', record)
+        record = self._fresh(self._by_user, user_id, now)
+        if record is not None:
+            return LeadMatch('user', record)
+        return None
+
+    def _execute(self, sql, params):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    async def register(self, user_id, phone):
+        """
+        Учет заявки. Повтор того же телефона сливается с первой заявкой окна (repeats + 1)
+        и возвращается LeadMatch; новая заявка (в том числе с новым телефоном того же
+        пользователя) начинает свое окно, для нее возвращается совпадение по user или None.
+        """
+        match = self.lookup(user_id, phone)
+        if match is not None and match.matched_by == 'phone':
+            record = match.record
+            merged = record._replace(repeats=record.repeats + 1)
+            for index, key in ((self._by_phone, record.phone), (self._by_user, record.user_id)):
+                if index.get(key) is record:
+                    index[key] = merged
+            await asyncio.to_thread(
+                self._execute,
+                'UPDATE leads_seen SET repeats = repeats + 1 WHERE phone = ? AND first_seen = ?',
+                (record.phone, record.first_seen)
+            )
+            return match
+
+        record = LeadRecord(phone, user_id, self.clock(), 0)
+        self._remember(record)
+        await asyncio.to_thread(
+            self._execute,
+            'INSERT INTO leads_seen (phone, user_id, first_seen, repeats) VALUES (?, ?, ?, ?)',
+            record
+        )
+        return match
+
+    @staticmethod
+    def _evict_index(index, border):
+        evicted = 0
+        while index:
+            key, record = next(iter(index.items()))
+            if record.first_seen > border:
+                break
+            del index[key]
+            evicted += 1
+        return evicted
+
+    async def evict_expired(self, keep=None):
+        """
+        Удаление заявок старше окна из памяти; из SQLite - старше keep секунд
+        (по умолчанию тоже окно). Возвращает число вытесненных из памяти.
+        """
+        now = self.clock()
+        evicted = self._evict_index(self._by_phone, now - self.window)
+        self._evict_index(self._by_user, now - self.window)
+        keep = self.window if keep is None else keep
+        await asyncio.to_thread(self._execute, 'DELETE FROM leads_seen WHERE first_seen <= ?', (now - keep,))
+        return evicted
+
+    async def run_eviction(self, interval):
+        """Фоновая периодическая очистка окна"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.evict_expired()
+                if evicted:
+                    logger.info("🧹 Из окна повторов удалено заявок: %s", evicted)
+            except Exception as e:
+                logger.error("❌ Ошибка очистки индекса заявок: %s", e)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
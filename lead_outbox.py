@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Надежная очередь заявок (outbox) в SQLite и фоновая доставка администратору"""
+
+import asyncio
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+from tracing import continue_trace
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_DELIVERED = 'delivered'
+STATUS_DEAD = 'dead'
+
+
+def _lead(row):
+    return {'id': row[0], 'payload': json.loads(row[1]), 'attempts': row[2], 'created_at': row[3]}
+
+
+class LeadOutbox:
+    """Append-only журнал заявок: запись фиксируется на диске до подтверждения пользователю"""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'payload TEXT NOT NULL, '
+            'status TEXT NOT NULL DEFAULT \'pending\', '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'created_at REAL NOT NULL, '
+            'next_attempt_at REAL NOT NULL, '
+            'delivered_at REAL, '
+            'last_error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)')
+        self._conn.commit()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _write_many(self, sql, rows):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+
+    def _due(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, payload, attempts, created_at FROM outbox '
+                'WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?',
+                (STATUS_PENDING, self.clock(), limit)
+            ).fetchall()
+        return [_lead(row) for row in rows]
+
+    def _claim(self, limit, lease):
+        # Отбор и сдвиг срока в одной транзакции: реплики с общим outbox не берут одну заявку дважды
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self.clock()
+                rows = self._conn.execute(
+                    'SELECT id, payload, attempts, created_at FROM outbox '
+                    'WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?',
+                    (STATUS_PENDING, now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE outbox SET next_attempt_at = ? WHERE id = ?', [(now + lease, row[0]) for row in rows]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return [_lead(row) for row in rows]
+
+    async def enqueue(self, payload):
+        """Сохранение заявки, возвращает id записи"""
+        now = self.clock()
+        cursor = await asyncio.to_thread(
+            self._write,
+            'INSERT INTO outbox (payload, created_at, next_attempt_at) VALUES (?, ?, ?)',
+            (json.dumps(payload, ensure_ascii=False), now, now)
+        )
+        return cursor.lastrowid
+
+    async def due(self, limit=50):
+        """Заявки, которые пора доставить"""
+        return await asyncio.to_thread(self._due, limit)
+
+    async def claim(self, limit=50, lease=60.0):
+        """
+        Заявки, которые пора доставить, с захватом на lease секунд: до отметки о доставке или
+        переноса их не увидит другой воркер, а если процесс упадет - заявка вернется после lease.
+        """
+        return await asyncio.to_thread(self._claim, limit, lease)
+
+    async def release(self, lead_ids):
+        """Вернуть захваченные, но не отправленные заявки в очередь без ожидания lease"""
+        if not lead_ids:
+            return
+        await asyncio.to_thread(
+            self._write,
+            f"UPDATE outbox SET next_attempt_at = ? WHERE status = ? AND id IN ({', '.join('?' * len(lead_ids))})",
+            (self.clock(), STATUS_PENDING, *lead_ids)
+        )
+
+    async def mark_delivered(self, *lead_ids):
+        """Отметка о доставке одной или нескольких заявок (дайджест) одной транзакцией"""
+        now = self.clock()
+        await asyncio.to_thread(
+            self._write_many,
+            'UPDATE outbox SET status = ?, delivered_at = ?, attempts = attempts + 1 WHERE id = ?',
+            [(STATUS_DELIVERED, now, lead_id) for lead_id in lead_ids]
+        )
+
+    async def reschedule(self, lead_id, delay, error, count_attempt=True):
+        await asyncio.to_thread(
+            self._write,
+            'UPDATE outbox SET next_attempt_at = ?, last_error = ?, attempts = attempts + ? WHERE id = ?',
+            (self.clock() + delay, error, 1 if count_attempt else 0, lead_id)
+        )
+
+    async def mark_dead(self, lead_id, error):
+        await asyncio.to_thread(
+            self._write,
+            'UPDATE outbox SET status = ?, last_error = ?, attempts = attempts + 1 WHERE id = ?',
+            (STATUS_DEAD, error, lead_id)
+        )
+
+    async def pending_count(self):
+        def count():
+            with self._lock:
+                return self._conn.execute(
+                    'SELECT COUNT(*) FROM outbox WHERE status = ?', (STATUS_PENDING,)
+                ).fetchone()[0]
+        return await asyncio.to_thread(count)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _retry_after_seconds(error):
+    """RetryAfter.retry_after бывает int или timedelta в зависимости от версии PTB"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+class OutboxWorker:
+    """Фоновая доставка заявок из outbox с экспоненциальной задержкой и учетом RetryAfter"""
+
+    def __init__(self, outbox, deliver, poll_interval=5.0, base_delay=2.0, max_delay=300.0,
+                 max_attempts=50, batch_size=50, claim_lease=60.0):
+        self.outbox = outbox
+        self.deliver = deliver  # async deliver(payload), исключение = повторить позже
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.claim_lease = claim_lease
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        """Разбудить воркер сразу после записи новой заявки"""
+        self._wakeup.set()
+
+    def backoff(self, attempts):
+        return min(self.max_delay, self.base_delay * (2 ** attempts))
+
+    def wait_timeout(self):
+        """Сколько ждать следующего прохода, если новых заявок не появится"""
+        return self.poll_interval
+
+    def batches(self, leads):
+        """
+        План отправки захваченных заявок: [(заявки, async send()), ...] по порядку; заявки,
+        не попавшие в план, возвращаются в очередь. Здесь - каждая заявка своим сообщением.
+        """
+        return [([lead], functools.partial(self.deliver, lead['payload'])) for lead in leads]
+
+    async def drain_once(self):
+        """Одна попытка доставить пачку готовых заявок, возвращает размер пачки"""
+        leads = await self.outbox.claim(self.batch_size, self.claim_lease)
+        batches = self.batches(leads)
+        planned = {lead['id'] for batch, _ in batches for lead in batch}
+        waiting = [lead['id'] for lead in leads if lead['id'] not in planned]
+        sent = 0
+        try:
+            for batch, send in batches:
+                sent += 1
+                if not await self._deliver(batch, send):
+                    break
+        except asyncio.CancelledError:
+            # Остановка посреди пачки: неотправленные заявки сразу достаются другим воркерам
+            await self.outbox.release(waiting + [lead['id'] for batch, _ in batches[sent - 1:] for lead in batch])
+            raise
+        await self.outbox.release(waiting + [lead['id'] for batch, _ in batches[sent:] for lead in batch])
+        return len(leads)
+
+    async def _deliver(self, leads, send):
+        """Доставка заявок одним вызовом send(); False - флуд-лимит, остаток пачки ждет следующего прохода"""
+        label = ', '.join(f"#{lead['id']}" for lead in leads)
+        try:
+            # Продолжение трасс обновлений, в которых заявки были созданы (если они записывались)
+            with continue_trace('lead.deliver', [lead['payload'].get('trace') for lead in leads],
+                                leads=len(leads), attempt=leads[0]['attempts'] + 1):
+                await send()
+        except RetryAfter as e:
+            # Флуд-лимит Telegram: ждем указанное время, попытка не считается
+            delay = _retry_after_seconds(e)
+            logger.warning("⏳ RetryAfter %s c при доставке заявки %s", delay, label)
+            for lead in leads:
+                await self.outbox.reschedule(lead['id'], delay, str(e), count_attempt=False)
+            await asyncio.sleep(delay)
+            return False
+        except Exception as e:
+            for lead in leads:
+                await self._retry_later(lead, e)
+        else:
+            await self.outbox.mark_delivered(*(lead['id'] for lead in leads))
+            logger.info("✅ Заявка %s доставлена", label)
+        return True
+
+    async def _retry_later(self, lead, error):
+        lead_id = lead['id']
+        attempts = lead['attempts'] + 1
+        if attempts >= self.max_attempts:
+            logger.error("💀 Заявка #%s не доставлена после %s попыток: %s", lead_id, attempts, error)
+            await self.outbox.mark_dead(lead_id, str(error))
+        else:
+            delay = self.backoff(attempts)
+            logger.error("❌ Ошибка доставки заявки #%s (попытка %s), повтор через %s c: %s",
+                         lead_id, attempts, delay, error)
+            await self.outbox.reschedule(lead_id, delay, str(error))
+
+    async def drain(self, timeout):
+        """
+        Доставка всех готовых заявок до срока (при остановке бота), возвращает число
+        недоставленных. Заявки с ошибкой переносятся на потом и дождутся следующего запуска.
+        """
+        async def drain_all():
+            while await self.drain_once():
+                pass
+
+        try:
+            await asyncio.wait_for(drain_all(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ Доставка заявок при остановке не уложилась в %g с", timeout)
+        return await self.outbox.pending_count()
+
+    async def run(self):
+        """Бесконечный цикл доставки (отменяется при остановке бота)"""
+        logger.info("📮 Воркер доставки заявок запущен")
+        while True:
+            self._wakeup.clear()
+            try:
+                if await self.drain_once() >= self.batch_size:
+                    continue  # В очереди есть еще готовые заявки
+            except Exception as e:
+                logger.error("❌ Ошибка воркера доставки заявок: %s", e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.wait_timeout())
+            except asyncio.TimeoutError:
+                pass
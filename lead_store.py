@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Хранилище заявок в SQLite и потоковая выгрузка в CSV/JSONL.
+
+Выгрузка читает курсор порциями через генератор, поэтому память не растет с числом строк;
+фильтр по датам идет по индексу created_at.
+"""
+
+import asyncio
+import csv
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+LEAD_FIELDS = ('id', 'created_at', 'user_id', 'chat_id', 'name', 'phone', 'username', 'full_name', 'duplicate')
+
+Lead = namedtuple('Lead', LEAD_FIELDS)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class LeadStore:
+    """Заявки в SQLite с индексами по created_at, phone и user_id"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leads ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, '
+            'user_id INTEGER NOT NULL, chat_id INTEGER, name TEXT NOT NULL, phone TEXT NOT NULL, '
+            'username TEXT, full_name TEXT, duplicate INTEGER NOT NULL DEFAULT 0)'
+        )
+        for column in ('created_at', 'phone', 'user_id'):
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS leads_{column} ON leads ({column})')
+        self._conn.commit()
+
+    def _insert(self, values):
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO leads (created_at, user_id, chat_id, name, phone, username, full_name, duplicate) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                values
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    async def add(self, created_at, user_id, chat_id, name, phone, username=None, full_name=None, duplicate=False):
+        """Сохранение заявки, возвращает ее id; created_at - unix-время"""
+        return await asyncio.to_thread(
+            self._insert, (created_at, user_id, chat_id, name, phone, username, full_name, int(duplicate))
+        )
+
+    @staticmethod
+    def _range_query(since=None, until=None):
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('created_at < ?')
+            params.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f"SELECT {', '.join(LEAD_FIELDS)} FROM leads{where} ORDER BY created_at", params
+
+    def query_plan(self, since=None, until=None):
+        """План запроса выгрузки (для проверки, что фильтр идет по индексу)"""
+        sql, params = self._range_query(since, until)
+        with self._lock:
+            return [row[-1] for row in self._conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+    def iter_leads(self, since=None, until=None, batch_size=EXPORT_BATCH_SIZE):
+        """Генератор заявок с since <= created_at < until в порядке времени, порциями по batch_size"""
+        sql, params = self._range_query(since, until)
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield Lead(*row)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _export_row(lead):
+    row = lead._asdict()
+    row['created_at'] = datetime.fromtimestamp(lead.created_at, timezone.utc).isoformat()
+    row['duplicate'] = bool(lead.duplicate)
+    return row
+
+
+def write_csv(leads, stream):
+    """Построчная запись заявок в CSV, возвращает число строк"""
+    writer = csv.DictWriter(stream, fieldnames=LEAD_FIELDS)
+    writer.writeheader()
+    count = 0
+    for lead in leads:
+        writer.writerow(_export_row(lead))
+        count += 1
+    return count
+
+
+def write_jsonl(leads, stream):
+    """Запись заявок в JSON Lines (объект на строку), возвращает число строк"""
+    count = 0
+    for lead in leads:
+        stream.write(json.dumps(_export_row(lead), ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Запуск и корректная остановка бота по SIGTERM/SIGINT (systemctl restart, docker stop)
+для polling, webhook и кластера реплик.
+
+Остановка: прием обновлений прекращается, полученные обновления и обработчики в работе
+дорабатывают до срока shutdown_timeout (не успевшие отменяются), затем post_stop приложения
+(доставка заявок из outbox, снимок анкет) и закрытие ресурсов в post_shutdown.
+
+Готовность (бот принимает обновления) сообщается systemd по NOTIFY_SOCKET (Type=notify)
+и файлом READY_FILE для healthcheck контейнера; при остановке файл удаляется.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+logger = logging.getLogger(__name__)
+
+# systemd по умолчанию ждет 90 с, docker stop - 10 с (см. stop_grace_period в docker-compose.yml)
+DEFAULT_SHUTDOWN_TIMEOUT = 20.0
+
+
+def sd_notify(state):
+    """Сообщение systemd (READY=1, STOPPING=1, ...); без NOTIFY_SOCKET ничего не делает"""
+    address = os.getenv('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # абстрактный сокет Linux
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode('utf-8'))
+    except OSError as e:
+        logger.warning("⚠️ Не удалось отправить %s в systemd: %s", state, e)
+        return False
+    return True
+
+
+def notify_ready(ready_file=None):
+    """Бот принимает обновления: READY=1 для systemd и файл готовности (READY_FILE)"""
+    ready_file = ready_file or os.getenv('READY_FILE')
+    if ready_file:
+        with open(ready_file, 'w', encoding='utf-8') as file:
+            file.write(str(os.getpid()))
+    sd_notify(f'READY=1\nMAINPID={os.getpid()}')
+
+
+def notify_stopping(ready_file=None):
+    ready_file = ready_file or os.getenv('READY_FILE')
+    if ready_file:
+        try:
+            os.remove(ready_file)
+        except FileNotFoundError:
+            pass
+    sd_notify('STOPPING=1')
+
+
+def time_left(application, default):
+    """Сколько секунд осталось до срока остановки (default, если остановка не начата)"""
+    deadline = application.bot_data.get('shutdown_deadline')
+    if deadline is None:
+        return default
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+
+async def start_application(application):
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+
+
+async def stop_application(application, timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+    """
+    Application.stop() дорабатывает очередь и все обработчики, но без срока. Если срок вышел,
+    обработчики отменяются: шаг анкеты уже сохранен в хранилище, пользователь повторит ответ.
+    Как в run_polling, stop() и post_stop только для запущенного приложения (запуск мог упасть
+    на полпути), shutdown() и post_shutdown - всегда.
+    """
+    if application.running:
+        application.bot_data['shutdown_deadline'] = asyncio.get_running_loop().time() + timeout
+        stopping = asyncio.create_task(application.stop())
+        await asyncio.wait({stopping}, timeout=timeout)
+        cancel_in_flight = getattr(application.update_processor, 'cancel_in_flight', None)
+        if not stopping.done() and cancel_in_flight:
+            cancelled = 0
+            # Выборка из очереди еще может запускать обработчики, поэтому отмена повторяется
+            while not stopping.done():
+                cancelled += cancel_in_flight()
+                await asyncio.wait({stopping}, timeout=0.1)
+            logger.warning("⏱️ Обработчики не завершились за %g с, отменено: %s", timeout, cancelled)
+        await stopping
+
+        if application.post_stop:
+            await application.post_stop(application)
+    await application.shutdown()
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+
+async def serve_polling(application, allowed_updates=None, shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT,
+                        stop_event=None, ready_event=None):
+    """Жизненный цикл в polling-режиме (run_polling с ограниченной по времени остановкой)"""
+    stop_event = stop_event or asyncio.Event()
+    try:
+        # Если запуск упал на полпути (например, getUpdates недоступен), уже запущенное тоже останавливается
+        await start_application(application)
+        await application.updater.start_polling(allowed_updates=allowed_updates)
+        logger.info("📡 Polling запущен")
+        if ready_event:
+            ready_event.set()
+
+        await stop_event.wait()
+    finally:
+        logger.info("🛑 Остановка: новые обновления не принимаются, текущие дорабатываются")
+        if application.updater.running:
+            await application.updater.stop()
+        await stop_application(application, shutdown_timeout)
+        logger.info("🛑 Бот остановлен")
+
+
+def run_until_signal(serve, *args, **kwargs):
+    """
+    Блокирующий запуск serve(*args, stop_event=..., ready_event=..., **kwargs) до SIGINT/SIGTERM
+    с сообщениями о готовности и остановке (notify_ready / notify_stopping).
+    """
+
+    async def runner():
+        stop_event, ready_event = asyncio.Event(), asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def stop():
+            notify_stopping()
+            stop_event.set()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop)
+            except NotImplementedError:
+                # Windows: остается KeyboardInterrupt
+                pass
+
+        async def report_ready():
+            await ready_event.wait()
+            notify_ready()
+            logger.info("✅ Бот готов к приему обновлений")
+
+        reporter = asyncio.create_task(report_ready())
+        try:
+            await serve(*args, stop_event=stop_event, ready_event=ready_event, **kwargs)
+        finally:
+            reporter.cancel()
+            notify_stopping()
+
+    try:
+        asyncio.run(runner())
+    except KeyboardInterrupt:
+        pass
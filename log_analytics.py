@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Аналитика логов бота за один проход: воронка заявок, ошибки по обработчикам и заявки по часам.
+Строки в формате log_setup.LOG_FORMAT: '2024-06-01 12:00:00,123 - logger - LEVEL - текст' или
+JSON-строки LOG_FORMAT=json: '{"ts":"2024-06-01 12:00:00,123","level":"INFO","logger":...,"msg":...}'
+(форматы могут чередоваться в одном файле после смены настройки).
+
+Файл читается блоками по целым строкам, а маркеры ищутся bytes.count()/find() на стороне C, поэтому
+Python-код касается только нужных строк, а память не зависит от размера логов. Ротированные
+файлы (bot.log, bot.log.1, bot.log.2024-06-01, ...) можно разбирать в нескольких процессах.
+При LOG_SAMPLE_RATE < 1 строки логгера updates сэмплируются, и воронка становится оценкой.
+
+    python log_analytics.py /home/enclude/FormaContact/logs
+    python log_analytics.py logs/bot.log logs/bot.log.1 --jobs 4 --json
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+
+def _marker(text):
+    return text.encode('utf-8')
+
+
+# Этапы воронки: строки, которые бот пишет на каждом шаге анкеты
+FUNNEL = (
+    ('start', (_marker('🚀 Команда /start от пользователя'),)),
+    ('form', (_marker("🔘 Нажата кнопка 'new_request'"), _marker('✅ Автоматический запуск формы'))),
+    ('name', (_marker('✅ Имя получено от пользователя'),)),
+    ('phone', (_marker('📋 Новая заявка от'),)),
+    ('duplicate', (_marker('🔁 Повтор заявки от'),)),
+    ('delivered', (_marker('✅ Заявка отправлена в чаты'),)),
+)
+LEAD_MARKER = _marker('📋 Новая заявка от')
+# Дайджест - одна строка на N заявок: к 'delivered' добавляется N
+DIGEST_DELIVERED = re.compile(_marker('✅ Заявок отправлено дайджестом: ') + rb'(\d+)')
+
+# Вызовы обработчиков (знаменатель для доли ошибок)
+HANDLER_CALLS = (
+    ('start', _marker('🚀 Команда /start от пользователя')),
+    ('button', _marker('🔘 Нажата кнопка')),
+    ('message', _marker('📨 Сообщение от')),
+    ('help', _marker('ℹ️ Команда /help от пользователя')),
+    ('delivery', LEAD_MARKER),
+)
+
+# Начало текста ERROR-строки -> обработчик, в котором она записана
+ERROR_SOURCES = tuple((_marker(prefix), handler) for prefix, handler in (
+    ('❌ Ошибка автоматического запуска формы', 'start'),
+    ('❌ Ошибка отправки приветствия', 'start'),
+    ('❌ Ошибка отправки запроса имени', 'button'),
+    ('❌ Ошибка отправки предложения старта', 'message'),
+    ('❌ Ошибка отправки сообщения об ошибке', 'message'),
+    ('❌ Ошибка отправки запроса телефона', 'message'),
+    ('❌ Ошибка отправки запроса поля', 'message'),
+    ('❌ Ошибка сохранения заявки', 'message'),
+    ('❌ Ошибка прямой отправки заявки', 'message'),
+    ('❌ Ошибка отправки подтверждения', 'message'),
+    ('❌ Критическая ошибка отправки сообщения об ошибке', 'message'),
+    ('❌ Ошибка отправки заявки в чат', 'delivery'),
+    ('❌ Ошибка отправки справки', 'help'),
+    ('❌ Реестр админов заполнен', 'admin'),
+    ('❌ Ошибка ответа на /admin', 'admin'),
+    ('Exception while handling an update', 'unhandled'),
+))
+ERROR_LEVELS = (b' - ERROR - ', b' - CRITICAL - ')
+# Логгер errors дублирует необработанные исключения с трейсбеком - такие строки не считаем
+DUPLICATE_ERROR_LOGGER = b' - errors'
+
+# То же в JSON-строках (порядок ключей задает log_setup.JsonFormatter)
+JSON_TS = b'{"ts":"'
+JSON_ERROR_LEVELS = (b'"level":"ERROR",', b'"level":"CRITICAL",')
+JSON_DUPLICATE_ERROR_LOGGER = b'"logger":"errors"'
+JSON_MSG = b'"msg":"'
+
+# 'YYYY-MM-DD HH' в начале строки
+HOUR_PREFIX = 13
+# Размер блока чтения; блок обрезается по последнему переводу строки
+CHUNK_SIZE = 16 * 2 ** 20
+
+
+def _line_start(data, pos):
+    return data.rfind(b'\n', 0, pos) + 1
+
+
+def _error_source(data, start):
+    message = data[start:start + 200]
+    for prefix, handler in ERROR_SOURCES:
+        if message.startswith(prefix):
+            return handler
+    return 'other'
+
+
+def analyze_bytes(data):
+    """Разбор блока целых строк лога, результат - словарь счетчиков"""
+    result = {
+        'lines': data.count(b'\n'),
+        'funnel': {stage: sum(data.count(marker) for marker in markers) for stage, markers in FUNNEL},
+        'calls': {handler: data.count(marker) for handler, marker in HANDLER_CALLS},
+        'errors': Counter(),
+        'leads_by_hour': Counter(),
+    }
+    result['funnel']['delivered'] += sum(map(int, DIGEST_DELIVERED.findall(data)))
+
+    pos = data.find(LEAD_MARKER)
+    while pos != -1:
+        start = _line_start(data, pos)
+        if data.startswith(JSON_TS, start):
+            start += len(JSON_TS)
+        result['leads_by_hour'][data[start:start + HOUR_PREFIX].decode('ascii', 'replace')] += 1
+        pos = data.find(LEAD_MARKER, pos + len(LEAD_MARKER))
+
+    for level in ERROR_LEVELS:
+        pos = data.find(level)
+        while pos != -1:
+            if data[pos - len(DUPLICATE_ERROR_LOGGER):pos] != DUPLICATE_ERROR_LOGGER:
+                result['errors'][_error_source(data, pos + len(level))] += 1
+            pos = data.find(level, pos + len(level))
+
+    for level in JSON_ERROR_LEVELS:
+        pos = data.find(level)
+        while pos != -1:
+            end = pos + len(level)
+            if not data.startswith(JSON_DUPLICATE_ERROR_LOGGER, end):
+                message = data.find(JSON_MSG, end)
+                result['errors'][_error_source(data, message + len(JSON_MSG)) if message != -1 else 'other'] += 1
+            pos = data.find(level, end)
+    return result
+
+
+def _chunks(file, size):
+    tail = b''
+    while True:
+        block = file.read(size)
+        if not block:
+            break
+        end = block.rfind(b'\n') + 1
+        if not end:
+            tail += block
+            continue
+        yield tail + block[:end]
+        tail = block[end:]
+    if tail:
+        yield tail
+
+
+def analyze_file(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as file:
+        result = merge(analyze_bytes(chunk) for chunk in _chunks(file, chunk_size))
+    result['files'] = 1
+    result['bytes'] = os.path.getsize(path)
+    return result
+
+
+def merge(results):
+    total = {'files': 0, 'bytes': 0, 'lines': 0, 'funnel': Counter(), 'calls': Counter(),
+             'errors': Counter(), 'leads_by_hour': Counter()}
+    for result in results:
+        total['files'] += result.get('files', 0)
+        total['bytes'] += result.get('bytes', 0)
+        total['lines'] += result['lines']
+        for key in ('funnel', 'calls', 'errors', 'leads_by_hour'):
+            total[key].update(result[key])
+    return total
+
+
+def log_files(paths):
+    """Файлы логов: явные пути или все bot.log* в каталогах (bot_errors.log дублирует bot.log)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, 'bot.log*'))))
+        else:
+            files.append(path)
+    return files
+
+
+def analyze_paths(paths, jobs=1):
+    files = log_files(paths)
+    if jobs > 1 and len(files) > 1:
+        with Pool(min(jobs, len(files))) as pool:
+            return merge(pool.imap_unordered(analyze_file, files))
+    return merge(map(analyze_file, files))
+
+
+def report(total):
+    funnel, calls, errors = total['funnel'], total['calls'], total['errors']
+    lines = [f"📂 Файлов: {total['files']}, {total['bytes'] / 2 ** 20:.1f} МБ, строк: {total['lines']}", '',
+             '📈 Воронка:']
+    starts = funnel['start'] or 1
+    for stage, _ in FUNNEL:
+        lines.append(f"  {stage:10} {funnel[stage]:9}  {funnel[stage] / starts:7.1%} от /start")
+    lines += ['', '❌ Ошибки по обработчикам:']
+    for handler in sorted(set(errors) | {name for name, _ in HANDLER_CALLS}):
+        rate = f"{errors[handler] / calls[handler]:.2%}" if calls.get(handler) else '—'
+        lines.append(f"  {handler:10} {errors[handler]:9}  доля: {rate}")
+    lines += ['', '🕐 Заявки по часам:']
+    for hour, count in sorted(total['leads_by_hour'].items()):
+        lines.append(f"  {hour}:00  {count}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Воронка, ошибки и заявки по часам из логов бота')
+    parser.add_argument('paths', nargs='*', default=[os.getenv('LOGS_DIR', 'logs')],
+                        help='каталоги логов или отдельные файлы')
+    parser.add_argument('--jobs', type=int, default=1, help='процессов для ротированных файлов (0 - по числу CPU)')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    args = parser.parse_args()
+
+    jobs = args.jobs or os.cpu_count()
+    if not log_files(args.paths):
+        print(f"❌ Логи не найдены: {' '.join(args.paths)}", file=sys.stderr)
+        sys.exit(1)
+    total = analyze_paths(args.paths, jobs)
+    print(json.dumps(total, ensure_ascii=False, indent=2) if args.json else report(total))
+
+
+if __name__ == '__main__':
+    main()
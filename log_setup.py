@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Неблокирующее логирование: запись в файлы выполняет отдельный поток QueueListener.
+
+Сообщения пишутся с ленивыми аргументами (logger.info("... %s", user_id)): отброшенная по уровню
+или сэмплированию запись не форматируется вовсе, а принятая собирается уже в потоке записи.
+Поля обновления (update_id, user_id, handler) задаются bind_context() в contextvars задачи и
+попадают в каждую запись: в текстовом формате - хвостом [update_id=... user_id=...], при
+LOG_FORMAT=json - ключами компактной JSON-строки.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_STYLES = ('text', 'json')
+LOG_ROTATIONS = ('size', 'time')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Логгер для INFO-строк, которые пишутся на каждое обновление (подлежат сэмплированию)
+UPDATES_LOGGER = 'updates'
+
+# Поля текущего обновления для всех записей задачи (у каждой задачи asyncio своя копия)
+_log_context = contextvars.ContextVar('log_context', default=None)
+
+
+def bind_context(**fields):
+    """Добавляет поля к контексту логов текущей задачи, возвращает токен для reset_context"""
+    current = _log_context.get()
+    return _log_context.set({**current, **fields} if current else fields)
+
+
+def reset_context(token):
+    _log_context.reset(token)
+
+
+def log_context():
+    return _log_context.get() or {}
+
+
+def bind_handler(name, handler):
+    """Обертка обработчика: имя обработчика (handler=...) в каждой записи лога на время его работы"""
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        token = bind_context(handler=name)
+        try:
+            return await handler(update, context)
+        finally:
+            _log_context.reset(token)
+
+    return wrapper
+
+
+class UserLabel:
+    """'@username (Имя)' для логов: строка собирается, только если запись действительно пишется"""
+
+    __slots__ = ('username', 'first_name')
+
+    def __init__(self, user):
+        self.username = user.username
+        self.first_name = user.first_name
+
+    def __str__(self):
+        return f"@{self.username or 'no_username'} ({self.first_name})"
+
+
+# Аргументы, которые не меняются после вызова логгера, поэтому форматирование можно отложить
+DEFERRABLE_ARGS = (str, int, float, bool, type(None), UserLabel)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler, который передает запись потоку записи без форматирования, добавив контекст
+    обновления. Изменяемые аргументы (dict, объекты Update, ...) форматируются сразу, как в
+    стандартном QueueHandler, чтобы в лог попало их состояние на момент вызова.
+    """
+
+    def prepare(self, record):
+        record.context = _log_context.get()
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(type(arg) in DEFERRABLE_ARGS for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class ContextFormatter(logging.Formatter):
+    """LOG_FORMAT с контекстом обновления в конце строки"""
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        context = getattr(record, 'context', None)
+        if context:
+            line += ' [' + ' '.join(f'{key}={value}' for key, value in context.items()) + ']'
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна компактная JSON-строка на запись: ts, level, logger, msg, поля контекста, exc.
+    ts в том же виде, что asctime текстового формата (log_analytics разбирает оба).
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        context = getattr(record, 'context', None)
+        if context:
+            entry.update(context)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def create_formatter(style='text'):
+    if style == 'json':
+        return JsonFormatter()
+    if style == 'text':
+        return ContextFormatter(LOG_FORMAT)
+    raise ValueError(f"Неизвестный LOG_FORMAT: {style} (ожидается text или json)")
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate INFO-записей; предупреждения и ошибки проходят всегда"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+def _skip_unused_record_fields():
+    """
+    Ни текстовый, ни JSON-формат не выводят файл/строку вызова, поток и процесс: не собираем
+    их в каждом LogRecord (оптимизация из logging HOWTO, без findCaller на каждую запись)
+    """
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+
+def _stop_listener(listener):
+    """Остановка listener при выходе, если его еще не остановили вручную"""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def _file_handler(path, rotation, max_bytes, backup_count, when):
+    if rotation == 'time':
+        return TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding='utf-8')
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+def setup_logging(logs_dir, level='INFO', rotation='size', max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  when='midnight', sample_rate=1.0, stream=sys.stdout, style='text'):
+    """
+    Настройка корневого логгера: ContextQueueHandler в event loop, форматирование и запись
+    в bot.log, bot_errors.log (только ошибки) и stdout в потоке QueueListener.
+    style - text или json (LOG_FORMAT). Значения LOG_* из окружения передает configure() из BotConfig.
+    Возвращает запущенный listener.
+    """
+    formatter = create_formatter(style)
+    _skip_unused_record_fields()
+
+    os.makedirs(logs_dir, exist_ok=True)
+
+    main_handler = _file_handler(os.path.join(logs_dir, 'bot.log'), rotation, max_bytes, backup_count, when)
+    error_handler = _file_handler(os.path.join(logs_dir, 'bot_errors.log'), rotation, max_bytes, backup_count, when)
+    error_handler.setLevel(logging.ERROR)
+    handlers = [main_handler, error_handler]
+    if stream is not None:
+        handlers.append(logging.StreamHandler(stream))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(ContextQueueHandler(log_queue))
+    root.setLevel(level)
+
+    if sample_rate < 1.0:
+        logging.getLogger(UPDATES_LOGGER).addFilter(SamplingFilter(sample_rate))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
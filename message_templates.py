@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Реестр текстов и клавиатур бота. Собирается один раз при старте: обработчики берут
+готовые строки и InlineKeyboardMarkup, а тексты с полями пользователя - функции preformat(),
+например t.confirmation(name=..., phone=...).
+"""
+
+from collections import namedtuple
+from string import Formatter
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def preformat(text):
+    """
+    Текст со слотами {name} -> функция(**слоты) -> str, скомпилированная один раз как f-строка:
+    на сообщение нет разбора шаблона, как у str.format, и склейки по частям. Тексты - константы
+    этого модуля, а не ввод пользователя. Текст без слотов остается обычной строкой.
+    """
+    fields = {}
+    for _, field, spec, conversion in Formatter().parse(text):
+        if field is None:
+            continue
+        if not field.isidentifier() or spec or conversion:
+            raise ValueError(f"Слот шаблона должен быть именем без формата: {{{field}}}")
+        fields[field] = None
+    if not fields:
+        return text
+    return eval(f"lambda *, {', '.join(fields)}: f{text!r}")
+
+
+TEMPLATE_FIELDS = (
+    'welcome', 'form_deeplink', 'ask_name', 'name_too_short', 'ask_phone', 'phone_invalid',
+    'start_first', 'confirmation', 'tech_error', 'unhandled_error', 'help',
+    'admin_bad_code', 'admin_enrolled', 'admin_full', 'button_new_request',
+)
+
+# Готовый набор одного языка; start_markup - клавиатура приветствия
+Templates = namedtuple('Templates', ('locale', 'start_markup') + TEMPLATE_FIELDS)
+
+RU = {
+    'welcome': (
+        "🎉 *ДОБРО ПОЖАЛОВАТЬ В МИР НЕДВИЖИМОСТИ!* 🎉\n\n"
+        "🏡✨ Ваш личный помощник по анализу недвижимости ждет вас! ✨🏡\n\n"
+        "🌈 Что мы предлагаем:\n"
+        "🔥 Профессиональные консультации\n"
+        "💎 Эксклюзивные предложения\n"
+        "🚀 Быстрый анализ рынка\n"
+        "🎯 Персональный подход\n\n"
+        "💫 Готовы начать путешествие в мир недвижимости? 💫\n"
+        "Жмите яркую кнопку ниже! 👇✨"
+    ),
+    'form_deeplink': (
+        "🌟 *ДОБРО ПОЖАЛОВАТЬ! ДАВАЙТЕ ОФОРМИМ ЗАЯВКУ!* 🌟\n\n"
+        "✨ Для начала введите ваше имя:\n"
+        "💫 Мы хотим знать, как к вам обращаться! 💫"
+    ),
+    'ask_name': (
+        "🌟 *КАК ВАС ЗОВУТ?* 🌟\n\n"
+        "✨ Введите ваше прекрасное имя:\n"
+        "💫 Мы хотим знать, как к вам обращаться! 💫"
+    ),
+    'name_too_short': (
+        "🎭 Упс! Имя должно быть длиннее! 🎭\n"
+        "✨ Введите имя минимум из 2 символов ✨\n"
+        "💫 Мы верим в вас! 💫"
+    ),
+    'ask_phone': (
+        "🎯 *ОТЛИЧНО! ТЕПЕРЬ ТЕЛЕФОН!* 🎯\n\n"
+        "📱 Укажите номер телефона для связи:\n\n"
+        "🇷🇺 *Российские номера:*\n"
+        "🌟 +7 916 123 45 67\n"
+        "🌟 8 (916) 123-45-67\n"
+        "🌟 79161234567\n"
+        "🌟 9161234567\n\n"
+        "🌍 *Международные номера:*\n"
+        "🔥 +380 67 123 45 67 (Украина)\n"
+        "🔥 +1 555 123 4567 (США/Канада)\n"
+        "🔥 +49 30 12345678 (Германия)\n"
+        "🔥 +33 1 42 86 83 26 (Франция)\n"
+        "🔥 +86 138 0013 8000 (Китай)\n"
+        "🔥 +44 20 7946 0958 (Великобритания)"
+    ),
+    'phone_invalid': (
+        "🚨 УПС! ЧТО-ТО ПОШЛО НЕ ТАК! 🚨\n\n"
+        "💡 *Требования к номеру:*\n"
+        "🎯 От 7 до 15 цифр\n"
+        "🎯 Только цифры и символ +\n"
+        "🎯 Российские или международные номера\n\n"
+        "🌟 *Попробуйте эти форматы:*\n"
+        "🇷🇺 *Россия:*\n"
+        "💫 +7 916 123 45 67\n"
+        "💫 8 (916) 123-45-67\n"
+        "💫 79161234567\n\n"
+        "🌍 *Мир:*\n"
+        "🔥 +380 67 123 45 67 (Украина)\n"
+        "🔥 +1 555 123 4567 (США)\n"
+        "🔥 +49 30 12345678 (Германия)\n"
+        "🔥 +86 138 0013 8000 (Китай)\n\n"
+        "💪 Попробуйте еще раз! У вас получится! 💪"
+    ),
+    'start_first': "🌈 Давайте начнем с команды /start! 🌈\n✨ Приключение ждет! ✨",
+    'confirmation': (
+        "🎉 *ПОТРЯСАЮЩЕ! ЗАЯВКА ПРИНЯТА!* 🎉\n\n"
+        "✨ *Ваши данные:* ✨\n"
+        "🌟 **Имя:** {name}\n"
+        "📱 **Телефон:** {phone}\n\n"
+        "🚀 *Что дальше?*\n"
+        "💫 Наш супер-специалист уже мчится к телефону!\n"
+        "🔥 Скоро получите звонок с эксклюзивным предложением!\n"
+        "💎 Приготовьтесь к удивительным возможностям!\n\n"
+        "🌈 Хотите оставить еще одну заявку? Жмите /start! 🌈\n"
+        "✨ Мы всегда рады помочь! ✨"
+    ),
+    'tech_error': (
+        "🆘 Упс! Произошла техническая заминка! 🆘\n"
+        "🔧 Наши программисты уже чинят это!\n"
+        "💫 Попробуйте через минутку или напишите администратору! 💫\n"
+        "🌟 Мы обязательно вам поможем! 🌟"
+    ),
+    'unhandled_error': "🆘 Произошла ошибка! Администраторы уже уведомлены. 🆘",
+    'help': (
+        "🔧 *ПОМОЩЬ ПО БОТУ FORMACONTACT* 🔧\n\n"
+        "🚀 *Команды:*\n"
+        "/start - Начать работу с ботом\n"
+        "/help - Показать эту справку\n\n"
+        "🆔 *Ваш Chat ID:* `{chat_id}`\n\n"
+        "📋 *Как пользоваться:*\n"
+        "1. Нажмите /start\n"
+        "2. Нажмите кнопку \"Оставить заявку\"\n"
+        "3. Введите ваше имя\n"
+        "4. Введите номер телефона\n"
+        "5. Готово! Ждите звонка!\n\n"
+        "📞 *Поддерживаемые форматы телефонов:*\n"
+        "🇷🇺 Россия: +7, 8, 7\n"
+        "🌍 Международные: +код страны\n\n"
+        "💬 *По вопросам пишите администратору*"
+    ),
+    'admin_bad_code': "⛔ Неверный код администратора.",
+    'admin_enrolled': "👑 Готово! Этот чат будет получать новые заявки.",
+    'admin_full': "❌ Достигнут лимит админ-чатов.",
+    'button_new_request': "🌟 Оставить заявку 🌟",
+}
+
+EN = {
+    'welcome': (
+        "🎉 *WELCOME TO THE WORLD OF REAL ESTATE!* 🎉\n\n"
+        "🏡✨ Your personal real estate analysis assistant is waiting for you! ✨🏡\n\n"
+        "🌈 What we offer:\n"
+        "🔥 Professional consultations\n"
+        "💎 Exclusive offers\n"
+        "🚀 Fast market analysis\n"
+        "🎯 A personal approach\n\n"
+        "💫 Ready to start your real estate journey? 💫\n"
+        "Tap the bright button below! 👇✨"
+    ),
+    'form_deeplink': (
+        "🌟 *WELCOME! LET'S FILL IN YOUR REQUEST!* 🌟\n\n"
+        "✨ First, please enter your name:\n"
+        "💫 We want to know how to address you! 💫"
+    ),
+    'ask_name': (
+        "🌟 *WHAT IS YOUR NAME?* 🌟\n\n"
+        "✨ Please enter your name:\n"
+        "💫 We want to know how to address you! 💫"
+    ),
+    'name_too_short': (
+        "🎭 Oops! The name should be longer! 🎭\n"
+        "✨ Please enter at least 2 characters ✨\n"
+        "💫 We believe in you! 💫"
+    ),
+    'ask_phone': (
+        "🎯 *GREAT! NOW YOUR PHONE!* 🎯\n\n"
+        "📱 Please enter a contact phone number:\n\n"
+        "🇷🇺 *Russian numbers:*\n"
+        "🌟 +7 916 123 45 67\n"
+        "🌟 8 (916) 123-45-67\n"
+        "🌟 79161234567\n"
+        "🌟 9161234567\n\n"
+        "🌍 *International numbers:*\n"
+        "🔥 +380 67 123 45 67 (Ukraine)\n"
+        "🔥 +1 555 123 4567 (USA/Canada)\n"
+        "🔥 +49 30 12345678 (Germany)\n"
+        "🔥 +33 1 42 86 83 26 (France)\n"
+        "🔥 +86 138 0013 8000 (China)\n"
+        "🔥 +44 20 7946 0958 (United Kingdom)"
+    ),
+    'phone_invalid': (
+        "🚨 OOPS! SOMETHING WENT WRONG! 🚨\n\n"
+        "💡 *Number requirements:*\n"
+        "🎯 7 to 15 digits\n"
+        "🎯 Digits and the + sign only\n"
+        "🎯 Russian or international numbers\n\n"
+        "🌟 *Try these formats:*\n"
+        "🇷🇺 *Russia:*\n"
+        "💫 +7 916 123 45 67\n"
+        "💫 8 (916) 123-45-67\n"
+        "💫 79161234567\n\n"
+        "🌍 *World:*\n"
+        "🔥 +380 67 123 45 67 (Ukraine)\n"
+        "🔥 +1 555 123 4567 (USA)\n"
+        "🔥 +49 30 12345678 (Germany)\n"
+        "🔥 +86 138 0013 8000 (China)\n\n"
+        "💪 Please try again! You can do it! 💪"
+    ),
+    'start_first': "🌈 Let's begin with the /start command! 🌈\n✨ Adventure awaits! ✨",
+    'confirmation': (
+        "🎉 *AMAZING! YOUR REQUEST IS ACCEPTED!* 🎉\n\n"
+        "✨ *Your details:* ✨\n"
+        "🌟 **Name:** {name}\n"
+        "📱 **Phone:** {phone}\n\n"
+        "🚀 *What's next?*\n"
+        "💫 Our specialist is already on the way to the phone!\n"
+        "🔥 You will get a call with an exclusive offer soon!\n"
+        "💎 Get ready for amazing opportunities!\n\n"
+        "🌈 Want to leave another request? Tap /start! 🌈\n"
+        "✨ We are always happy to help! ✨"
+    ),
+    'tech_error': (
+        "🆘 Oops! A technical hiccup happened! 🆘\n"
+        "🔧 Our developers are already fixing it!\n"
+        "💫 Please try again in a minute or contact the administrator! 💫\n"
+        "🌟 We will definitely help you! 🌟"
+    ),
+    'unhandled_error': "🆘 An error occurred! The administrators have been notified. 🆘",
+    'help': (
+        "🔧 *FORMACONTACT BOT HELP* 🔧\n\n"
+        "🚀 *Commands:*\n"
+        "/start - Start working with the bot\n"
+        "/help - Show this help\n\n"
+        "🆔 *Your Chat ID:* `{chat_id}`\n\n"
+        "📋 *How to use:*\n"
+        "1. Tap /start\n"
+        "2. Tap the \"Leave a request\" button\n"
+        "3. Enter your name\n"
+        "4. Enter your phone number\n"
+        "5. Done! Wait for our call!\n\n"
+        "📞 *Supported phone formats:*\n"
+        "🇷🇺 Russia: +7, 8, 7\n"
+        "🌍 International: +country code\n\n"
+        "💬 *Contact the administrator with any questions*"
+    ),
+    'admin_bad_code': "⛔ Invalid administrator code.",
+    'admin_enrolled': "👑 Done! This chat will receive new requests.",
+    'admin_full': "❌ The admin chat limit has been reached.",
+    'button_new_request': "🌟 Leave a request 🌟",
+}
+
+LOCALES = {'ru': RU, 'en': EN}
+
+# Заявка для админов всегда на одном языке
+ADMIN_LEAD = preformat(
+    "🎊 НОВАЯ ГОРЯЧАЯ ЗАЯВКА! 🎊\n\n"
+    "🌟 Имя: {name}\n"
+    "📱 Телефон: {phone}\n"
+    "🆔 User ID: {user_id}\n"
+    "👤 Telegram: @{username} ({full_name})\n"
+    "🗨️ Chat ID: {chat_id}\n"
+    "⏰ Время: {time}\n\n"
+    "🚀 Клиент готов к сотрудничеству! 🚀\n"
+    "💎 Действуйте быстро! 💎"
+)
+
+# Пометка перед ADMIN_LEAD, когда пользователь в окне повторов прислал другой телефон
+ADMIN_LEAD_REPEAT = preformat(
+    "🔁 Повторная заявка: ранее этот пользователь оставил телефон {previous_phone}\n\n"
+)
+
+# Заголовок сообщения-дайджеста с несколькими заявками (lead_digest.pack_digest)
+ADMIN_DIGEST = preformat("📦 Заявок в дайджесте: {count}\n\n")
+
+
+def build_templates(locale, texts):
+    """Сборка неизменяемого набора шаблонов одного языка"""
+    start_markup = InlineKeyboardMarkup([
+        [InlineKeyboardButton(texts['button_new_request'], callback_data='new_request')]
+    ])
+    return Templates(locale, start_markup, *(preformat(texts[field]) for field in TEMPLATE_FIELDS))
+
+
+class TemplateRegistry:
+    """Наборы шаблонов по языкам; выбор языка - один dict.get на сообщение"""
+
+    def __init__(self, locales=('ru',), default='ru'):
+        unknown = [locale for locale in locales if locale not in LOCALES]
+        if unknown or default not in LOCALES:
+            raise ValueError(f"Неизвестные языки шаблонов: {unknown or [default]}")
+        self._templates = {locale: build_templates(locale, LOCALES[locale]) for locale in locales}
+        self.default = self._templates.get(default) or build_templates(default, LOCALES[default])
+
+    def get(self, language_code=None):
+        """Шаблоны для language_code пользователя Telegram (например, 'en' или 'ru')"""
+        return self._templates.get(language_code, self.default)
+
+    def for_user(self, user):
+        return self._templates.get(user.language_code, self.default) if user else self.default
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Легковесные метрики в формате Prometheus: счетчики и гистограммы задержек
+обработчиков, воронка заявок и задержка вызовов Bot API. Эндпоинт /metrics на aiohttp
+(импортируется при запуске сервера: без METRICS_PORT polling-бот обходится без aiohttp).
+"""
+
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+from telegram.request import BaseRequest
+
+from log_setup import bind_handler
+from tracing import KIND_CLIENT, span, trace_handler
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Монотонный счетчик; значения хранятся по кортежу меток"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self.values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labelvalues, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {value}')
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: observe() - один bisect и два сложения"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labelvalues -> [counts по корзинам + +Inf, sum]
+
+    def observe(self, value, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labelvalues):
+        series = self.series.get(labelvalues)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        names = self.labelnames + ('le',)
+        for labelvalues, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(names, labelvalues + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_REQUESTS = REGISTRY.counter('bot_handler_requests_total', 'Обработанные обновления', ('handler',))
+HANDLER_ERRORS = REGISTRY.counter('bot_handler_errors_total', 'Необработанные исключения в обработчиках', ('handler',))
+HANDLER_LATENCY = REGISTRY.histogram('bot_handler_latency_seconds', 'Время работы обработчика', ('handler',))
+LEAD_FUNNEL = REGISTRY.counter('bot_lead_funnel_total', 'Воронка заявок: start, name, phone, duplicate, delivered', ('stage',))
+API_LATENCY = REGISTRY.histogram('bot_api_latency_seconds', 'Задержка вызовов Telegram Bot API', ('method',))
+API_ERRORS = REGISTRY.counter('bot_api_errors_total', 'Ошибки вызовов Telegram Bot API', ('method',))
+RATE_LIMITED = REGISTRY.counter(
+    'bot_rate_limited_total', 'Обновления, отброшенные или задержанные лимитом флуда', ('scope', 'action')
+)
+CLUSTER_UPDATES = REGISTRY.counter(
+    'bot_cluster_updates_total', 'Обновления кластера реплик: local, remote, rerouted, received', ('route',)
+)
+
+
+def count_handler(name, handler):
+    """Обертка обработчика: счетчик вызовов, ошибок и гистограмма задержки"""
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_REQUESTS.inc(name)
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def instrument_handler(name, handler):
+    """
+    Все обертки обработчика сразу: имя в логах, метрики и спан handler. Бот собирает их
+    по отдельности через handler_registry, чтобы выключенные не стояли в цепочке.
+    """
+    return bind_handler(name, count_handler(name, trace_handler(name, handler)))
+
+
+class InstrumentedRequest(BaseRequest):
+    """Транспорт Bot API, который замеряет задержку каждого метода (sendMessage, ...) и пишет спан bot_api"""
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    @property
+    def read_timeout(self):
+        return self._inner.read_timeout
+
+    async def initialize(self):
+        await self._inner.initialize()
+
+    async def shutdown(self):
+        await self._inner.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            with span(f'bot_api {api_method}', kind=KIND_CLIENT) as api_span:
+                code, payload = await self._inner.do_request(
+                    url, method, request_data,
+                    read_timeout=read_timeout,
+                    write_timeout=write_timeout,
+                    connect_timeout=connect_timeout,
+                    pool_timeout=pool_timeout
+                )
+                api_span.set('http.status_code', code)
+        except Exception:
+            API_ERRORS.inc(api_method)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, api_method)
+        if code >= 400:
+            API_ERRORS.inc(api_method)
+        return code, payload
+
+
+async def start_metrics_server(listen, port, registry=REGISTRY):
+    """HTTP-сервер с эндпоинтом /metrics, возвращает runner для остановки"""
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    web_app = web.Application()
+    web_app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, listen, port).start()
+    logger.info("📊 Метрики доступны на http://%s:%s/metrics", listen, port)
+    return runner
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Параллельная рассылка уведомлений админам с ограничением скорости по лимитам Telegram"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений/с всего, 1/с в личный чат, 20/мин в группу
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+GROUP_RATE = 20.0 / 60.0
+# Максимальная длина текста сообщения (Telegram считает в единицах UTF-16)
+TELEGRAM_TEXT_LIMIT = 4096
+
+DeliveryResult = namedtuple('DeliveryResult', ['chat_id', 'ok', 'error', 'elapsed'])
+
+
+def parse_chat_ids(*values):
+    """Список chat_id из строк вида '123, -100456' без повторов, некорректные значения пропускаются"""
+    chat_ids = []
+    for value in values:
+        for item in (value or '').split(','):
+            item = item.strip()
+            if item.lstrip('-').isdigit() and int(item) not in chat_ids:
+                chat_ids.append(int(item))
+    return chat_ids
+
+
+def text_length(text):
+    """Длина текста так, как ее считает Telegram: эмодзи вне BMP занимают две единицы"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def split_text(text, limit=TELEGRAM_TEXT_LIMIT):
+    """
+    Части текста не длиннее limit по границам строк; строка длиннее limit режется посимвольно.
+    Пустые части (одни переводы строк на стыке) отбрасываются.
+    """
+    if text_length(text) <= limit:
+        return [text]
+    parts = []
+    current, size = '', 0
+    for line in text.splitlines(keepends=True):
+        length = text_length(line)
+        if size + length > limit and current:
+            parts.append(current)
+            current, size = '', 0
+        if length <= limit:
+            current += line
+            size += length
+            continue
+        for char in line:
+            width = 2 if ord(char) > 0xFFFF else 1
+            if size + width > limit:
+                parts.append(current)
+                current, size = '', 0
+            current += char
+            size += width
+    parts.append(current)
+    return [part.strip('\n') for part in parts if part.strip('\n')]
+
+
+class TokenBucket:
+    """Token bucket с резервированием: каждый вызов получает свое время ожидания"""
+
+    def __init__(self, rate, capacity=1.0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def reserve(self):
+        """Забрать токен (возможно в долг), вернуть сколько секунд ждать"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1.0
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_reserve(self, max_delay=0.0):
+        """Забрать токен, только если ждать не дольше max_delay: задержка или None без списания"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        delay = 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+        if delay > max_delay:
+            return None
+        self.tokens -= 1.0
+        return delay
+
+    def refund(self):
+        """Вернуть токен, взятый reserve/try_reserve, если действие так и не выполнялось"""
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class NotificationDispatcher:
+    """
+    Отправка одного текста нескольким чатам параллельно, с таймаутом на каждого получателя.
+    Текст длиннее TELEGRAM_TEXT_LIMIT уходит несколькими сообщениями подряд.
+    """
+
+    def __init__(self, bot, max_concurrency=8, timeout=10.0, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, group_rate=GROUP_RATE):
+        self.bot = bot
+        self.timeout = timeout
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательные chat_id - группы и каналы, у них лимит строже
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    async def _send_one(self, chat_id, text, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                await asyncio.wait_for(self._rate_limited_send(chat_id, text, **kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"таймаут {self.timeout} c")
+            logger.error("⏱️ Таймаут отправки в чат %s", chat_id)
+            return DeliveryResult(chat_id, False, error, time.perf_counter() - started)
+        except Exception as e:
+            logger.error("❌ Ошибка отправки в чат %s: %s", chat_id, e)
+            return DeliveryResult(chat_id, False, e, time.perf_counter() - started)
+        return DeliveryResult(chat_id, True, None, time.perf_counter() - started)
+
+    async def _rate_limited_send(self, chat_id, text, **kwargs):
+        for part in split_text(text):
+            await self._chat_bucket(chat_id).acquire()
+            await self._global_bucket.acquire()
+            await self.bot.send_message(chat_id=chat_id, text=part, **kwargs)
+
+    async def send(self, chat_ids, text, **kwargs):
+        """Рассылка всем chat_ids, возвращает список DeliveryResult в том же порядке"""
+        return await asyncio.gather(*(self._send_one(chat_id, text, **kwargs) for chat_id in chat_ids))
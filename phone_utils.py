@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Единые правила для номеров телефонов: очистка, валидация и форматирование за один проход.
+
+Российские номера приводятся к +7 (XXX) XXX-XX-XX, международные - к E.164 (+XXXXXXXXXXX).
+"""
+
+import re
+from collections import namedtuple
+
+# Все, кроме цифр и +, удаляется одним заранее скомпилированным выражением
+_NON_PHONE_CHARS = re.compile(r'[^0-9+]')
+
+# E.164: от 7 до 15 цифр без учета +
+MIN_DIGITS = 7
+MAX_DIGITS = 15
+
+# Российские префиксы: (есть +, первая цифра) -> обязательное число цифр
+_RUSSIAN_PREFIXES = {
+    (True, '7'): 11,   # +7XXXXXXXXXX
+    (False, '7'): 11,  # 7XXXXXXXXXX
+    (False, '8'): 11,  # 8XXXXXXXXXX
+}
+_RUSSIAN_MOBILE_WITHOUT_CODE = ('9', 10)  # 9XXXXXXXXX
+
+PhoneNumber = namedtuple('PhoneNumber', ['e164', 'display'])
+
+
+def clean_phone(phone_str):
+    """Очистка номера телефона от лишних символов"""
+    return _NON_PHONE_CHARS.sub('', phone_str)
+
+
+def _russian(national):
+    """Номер России по 10 цифрам после кода страны"""
+    return PhoneNumber(
+        '+7' + national,
+        f"+7 ({national[0:3]}) {national[3:6]}-{national[6:8]}-{national[8:10]}"
+    )
+
+
+def normalize_phone(phone_str):
+    """Очистка + валидация + форматирование; None, если номер некорректный"""
+    clean = _NON_PHONE_CHARS.sub('', phone_str)
+    has_plus = clean[:1] == '+'
+    digits = clean[1:] if has_plus else clean
+
+    # isdigit() заодно отсекает пустую строку и лишние + внутри номера
+    length = len(digits)
+    if not digits.isdigit() or length < MIN_DIGITS or length > MAX_DIGITS:
+        return None
+
+    first = digits[0]
+    required = _RUSSIAN_PREFIXES.get((has_plus, first))
+    if required is not None:
+        return _russian(digits[1:]) if length == required else None
+
+    if not has_plus:
+        if (first, length) == _RUSSIAN_MOBILE_WITHOUT_CODE:
+            return _russian(digits)
+        # Международный номер без + (код страны не 7, 8, 9)
+        if length < 10 or first in '789':
+            return None
+
+    return PhoneNumber('+' + digits, '+' + digits)
+
+
+def normalize_many(phones):
+    """Пакетная нормализация (например, перепроверка сохраненных заявок)"""
+    return list(map(normalize_phone, phones))
+
+
+def is_valid_phone(phone):
+    """Проверка корректности номера телефона"""
+    return normalize_phone(phone) is not None
+
+
+def format_phone(phone):
+    """Форматирование номера телефона для красивого отображения"""
+    number = normalize_phone(phone)
+    return number.display if number else phone
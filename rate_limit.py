@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Защита от флуда: token bucket на каждого пользователя и общий на бота.
+
+Проверка стоит в группе обработчиков -1, до анкеты: отброшенное обновление останавливается
+ApplicationHandlerStop и не вызывает ни одного запроса к Bot API.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+from metrics import RATE_LIMITED
+from notify_dispatcher import TokenBucket
+from update_processor import update_user_key
+
+logger = logging.getLogger(__name__)
+
+# Обычная анкета - 4 обновления за несколько секунд, это укладывается в запас
+USER_RATE = 1.0
+USER_BURST = 5.0
+GLOBAL_RATE = 100.0
+GLOBAL_BURST = 200.0
+DEFAULT_MAX_USERS = 100_000
+
+# Группа, в которой проверка выполняется раньше всех обработчиков
+RATE_LIMIT_GROUP = -1
+
+
+class RateLimiter:
+    """
+    Корзины пользователей в OrderedDict по времени последнего обращения. Корзина, простоявшая
+    capacity / rate секунд, снова полная и ничем не отличается от новой, поэтому удаляется;
+    max_users дополнительно ограничивает память при наплыве новых пользователей.
+    """
+
+    def __init__(self, user_rate=USER_RATE, user_burst=USER_BURST, global_rate=GLOBAL_RATE,
+                 global_burst=GLOBAL_BURST, max_delay=0.0, max_users=DEFAULT_MAX_USERS, clock=time.monotonic):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_delay = max_delay
+        self.max_users = max_users
+        self.clock = clock
+        self._idle_after = user_burst / user_rate
+        # global_rate <= 0 - без общего лимита
+        self._global = TokenBucket(global_rate, capacity=global_burst, clock=clock) if global_rate > 0 else None
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            bucket = next(iter(buckets.values()))
+            if now - bucket.updated < self._idle_after and len(buckets) <= self.max_users:
+                break
+            buckets.popitem(last=False)
+
+    def check(self, user_id):
+        """(scope, задержка): задержка None - обновление отбрасывается, scope - чей лимит сработал"""
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, capacity=self.user_burst, clock=self.clock)
+        else:
+            self._buckets.move_to_end(user_id)
+        delay = bucket.try_reserve(self.max_delay)
+        self._evict(bucket.updated)
+        if delay is None:
+            return 'user', None
+        if self._global is None:
+            return 'user', delay
+        global_delay = self._global.try_reserve(self.max_delay)
+        if global_delay is None:
+            # Обновление не пройдет: токен пользователя не должен сгореть из-за чужого флуда
+            bucket.refund()
+            return 'global', None
+        return 'global' if global_delay > delay else 'user', max(delay, global_delay)
+
+
+def rate_limit_handler(limiter):
+    """TypeHandler для группы RATE_LIMIT_GROUP: отбрасывает или придерживает флуд"""
+
+    async def check_rate(update, context):
+        user_id = update_user_key(update)
+        if user_id is None:
+            return
+        scope, delay = limiter.check(user_id)
+        if delay is None:
+            RATE_LIMITED.inc(scope, 'dropped')
+            logger.debug("🚫 Флуд от %s: обновление отброшено (лимит %s)", user_id, scope)
+            raise ApplicationHandlerStop
+        if delay > 0:
+            RATE_LIMITED.inc(scope, 'delayed')
+            await asyncio.sleep(delay)
+
+    return TypeHandler(Update, check_rate)
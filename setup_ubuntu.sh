@@ -21,8 +21,8 @@ fi
 
 # Создание директории проекта
 echo "📁 Создание директории проекта..."
-sudo mkdir -p /opt/telegram_bot
-sudo chown telegram_bot:telegram_bot /opt/telegram_bot
+sudo mkdir -p /opt/telegram_bot/logs
+sudo chown -R telegram_bot:telegram_bot /opt/telegram_bot
 
 # Переключение на пользователя telegram_bot для дальнейших операций
 echo "🔄 Настройка проекта..."
@@ -71,6 +71,8 @@ User=telegram_bot
 Group=telegram_bot
 WorkingDirectory=/opt/telegram_bot
 Environment=PATH=/opt/telegram_bot/venv/bin
+# ProtectHome и ReadWritePaths: бот пишет только в /opt/telegram_bot (логи и базы SQLite)
+Environment=LOGS_DIR=/opt/telegram_bot/logs
 ExecStart=/opt/telegram_bot/venv/bin/python /opt/telegram_bot/telegram_bot.py
 Restart=always
 RestartSec=10
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Хранилище состояний диалога (шаг формы, имя, телефон) с вытеснением брошенных анкет"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Незаполненная анкета живет сутки с последнего шага
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_USERS = 100_000
+DEFAULT_DB_PATH = 'bot_state.sqlite3'
+STATE_BACKENDS = ('memory', 'sqlite')
+
+
+class StateStore:
+    """Асинхронный интерфейс хранилища состояний пользователей"""
+
+    async def get(self, user_id):
+        """Состояние пользователя или None, если его нет или оно устарело"""
+        raise NotImplementedError
+
+    async def set(self, user_id, state):
+        """Сохранение состояния и продление срока жизни"""
+        raise NotImplementedError
+
+    async def delete(self, user_id):
+        raise NotImplementedError
+
+    async def evict_expired(self):
+        """Удаление устаревших состояний, возвращает их количество"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def snapshot(self, path):
+        """Сохранение состояний на диск при остановке; возвращает число анкет (0 - хранилище и так на диске)"""
+        return 0
+
+    async def restore(self, path):
+        """Загрузка снимка, сделанного snapshot() при прошлой остановке"""
+        return 0
+
+    async def run_eviction(self, interval):
+        """Фоновая периодическая очистка брошенных анкет"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.evict_expired()
+                if evicted:
+                    logger.info("🧹 Удалено брошенных анкет: %s", evicted)
+            except Exception as e:
+                logger.error("❌ Ошибка очистки состояний: %s", e)
+
+
+class MemoryStateStore(StateStore):
+    """In-memory LRU с TTL: размер ограничен max_users, старые записи вытесняются"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_users=DEFAULT_MAX_USERS, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.clock = clock
+        self._states = OrderedDict()  # user_id -> (expires_at, state)
+
+    def __len__(self):
+        return len(self._states)
+
+    async def get(self, user_id):
+        item = self._states.get(user_id)
+        if item is None:
+            return None
+        expires_at, state = item
+        if expires_at <= self.clock():
+            del self._states[user_id]
+            return None
+        self._states.move_to_end(user_id)
+        return state
+
+    async def set(self, user_id, state):
+        self._states[user_id] = (self.clock() + self.ttl, state)
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+
+    async def delete(self, user_id):
+        self._states.pop(user_id, None)
+
+    async def evict_expired(self):
+        now = self.clock()
+        expired = [user_id for user_id, (expires_at, _) in self._states.items() if expires_at <= now]
+        for user_id in expired:
+            del self._states[user_id]
+        return len(expired)
+
+    async def snapshot(self, path):
+        """
+        Анкеты в JSON с остатком TTL (monotonic-часы не переживают перезапуск): порядок LRU
+        сохраняется, файл подменяется атомарно через os.replace.
+        """
+        now = self.clock()
+        states = [[user_id, expires_at - now, state] for user_id, (expires_at, state) in self._states.items()
+                  if expires_at > now]
+        if not states:
+            return 0
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'saved_at': time.time(), 'states': states}, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(states)
+
+    async def restore(self, path):
+        """Анкеты из снимка; время простоя вычитается из TTL, файл удаляется после загрузки"""
+        try:
+            with open(path, encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            return 0
+        downtime = max(0.0, time.time() - snapshot['saved_at'])
+        now = self.clock()
+        restored = 0
+        for user_id, remaining, state in snapshot['states']:
+            if remaining > downtime and user_id not in self._states:
+                self._states[user_id] = (now + remaining - downtime, state)
+                restored += 1
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+        os.remove(path)
+        return restored
+
+
+class SqliteStateStore(StateStore):
+    """Состояния в SQLite: переживают перезапуск бота"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS states ('
+            'user_id INTEGER PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS states_expires_at ON states (expires_at)')
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT state FROM states WHERE user_id = ? AND expires_at > ?',
+                (user_id, self.clock())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get(self, user_id):
+        return await asyncio.to_thread(self._get, user_id)
+
+    async def set(self, user_id, state):
+        await asyncio.to_thread(
+            self._execute,
+            'INSERT OR REPLACE INTO states (user_id, state, expires_at) VALUES (?, ?, ?)',
+            (user_id, json.dumps(state, ensure_ascii=False), self.clock() + self.ttl)
+        )
+
+    async def delete(self, user_id):
+        await asyncio.to_thread(self._execute, 'DELETE FROM states WHERE user_id = ?', (user_id,))
+
+    async def evict_expired(self):
+        cursor = await asyncio.to_thread(self._execute, 'DELETE FROM states WHERE expires_at <= ?', (self.clock(),))
+        return cursor.rowcount
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_state_store(backend='memory', path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL, max_users=DEFAULT_MAX_USERS):
+    """Хранилище анкет по STATE_BACKEND: memory (LRU+TTL в процессе) или sqlite (общее для реплик)"""
+    if backend == 'sqlite':
+        logger.info("💾 Состояния пользователей в SQLite: %s", path)
+        return SqliteStateStore(path, ttl=ttl)
+    if backend == 'memory':
+        return MemoryStateStore(ttl=ttl, max_users=max_users)
+    raise ValueError(f"Неизвестный STATE_BACKEND: {backend} (ожидается memory или sqlite)")
@@ -1,68 +1,126 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+"""
+Telegram-бот FormaContact: анкета заявки и доставка заявок админам.
+
+Импорт модуля не трогает диск и сеть: .env, логирование, проверка конфигурации и хранилища
+создаются в configure(), которую вызывает фабрика build_application(). aiohttp (webhook,
+кластер, /metrics) импортируется только в тех режимах, где он нужен. О готовности принимать
+обновления процесс сообщает systemd (sd_notify) и файлом READY_FILE, см. lifecycle.py.
+
+Обработчики и то, что встраивается вокруг них (контекст логов, метрики, трассировка, лимит
+флуда), собирает handler_registry(): выключенная в настройках функция в цепочку не попадает.
+telegram_bot.py - точка входа Dockerfile и скриптов установки, запускает этот же бот.
+"""
+
+import asyncio
 import logging
-import os
-import sys
-import traceback
-from datetime import datetime
-from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from datetime import datetime, timezone
+from functools import partial
+from telegram import Update
+from telegram.error import RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
-import re
-
-# Загрузка переменных окружения
-load_dotenv()
-
-# Создание директории для логов
-logs_dir = '/home/enclude/FormaContact/logs'
-os.makedirs(logs_dir, exist_ok=True)
-
-# Улучшенная настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f'{logs_dir}/bot.log', encoding='utf-8'),
-        logging.FileHandler(f'{logs_dir}/bot_errors.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from telegram.request import BaseRequest
+
+from admin_registry import AdminRegistry, check_enroll_code
+from bot_config import BotConfig
+from form_schema import LEAD_FORM
+from handler_registry import HandlerRegistry
+from http_transport import create_request
+from lead_digest import DigestWorker, is_priority
+from lead_index import LeadIndex
+from lead_outbox import LeadOutbox, OutboxWorker
+from lead_store import LeadStore
+from lifecycle import run_until_signal, serve_polling, time_left
+from log_setup import UPDATES_LOGGER, UserLabel, bind_handler, setup_logging
+from message_templates import ADMIN_DIGEST, ADMIN_LEAD, ADMIN_LEAD_REPEAT, TemplateRegistry
+from metrics import LEAD_FUNNEL, InstrumentedRequest, count_handler, start_metrics_server
+from notify_dispatcher import NotificationDispatcher
+from phone_utils import format_phone
+from rate_limit import RATE_LIMIT_GROUP, RateLimiter, rate_limit_handler
+from state_store import create_state_store
+from text_utils import escape_markdown
+from tracing import current_traceparent, setup_tracing, span, trace_handler
+from update_processor import PerUserUpdateProcessor
 
-# Настройка логгера для ошибок
+# Логгер для ошибок (пишется в bot_errors.log через корневой логгер)
 error_logger = logging.getLogger('errors')
-error_handler = logging.FileHandler(f'{logs_dir}/bot_errors.log', encoding='utf-8')
-error_handler.setLevel(logging.ERROR)
-error_formatter = logging.Formatter('%(asctime)s - ERROR - %(message)s')
-error_handler.setFormatter(error_formatter)
-error_logger.addHandler(error_handler)
 
 logger = logging.getLogger(__name__)
+# INFO-строки на каждое обновление, доля задается LOG_SAMPLE_RATE
+update_logger = logging.getLogger(UPDATES_LOGGER)
 
-# Конфигурация из переменных окружения
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-ADMIN_CHAT_ID = os.getenv('ADMIN_CHAT_ID')
+# Конфигурация и сервисы процесса, заполняются в configure()
+config = None
+log_listener = None
+templates = None  # Тексты и клавиатуры, собираются один раз
+state_store = None  # Анкеты пользователей (memory LRU+TTL или SQLite, см. STATE_BACKEND)
+lead_outbox = None
+lead_index = None  # None - отсев повторов выключен (LEAD_DEDUP_WINDOW=0)
+lead_store = None
+admin_registry = None
+count_lead = None  # Этап воронки для /metrics; без METRICS_PORT - пустая функция (funnel_counter)
 
-# Проверка наличия обязательных переменных
-if not BOT_TOKEN:
-    logger.error("BOT_TOKEN не найден в переменных окружения")
-    raise ValueError("BOT_TOKEN не найден в переменных окружения")
+def configure(env_file=None) -> BotConfig:
+    """
+    Однократная настройка процесса: .env, логирование, проверка конфигурации и хранилища.
+    Повторный вызов возвращает уже готовую конфигурацию.
+    """
+    global config, log_listener, templates, state_store, lead_outbox, lead_index, lead_store, admin_registry, count_lead
+    if config is not None:
+        return config
 
-# Хранилище состояний пользователей
-user_data = {}
-admin_chat_ids = set()  # Для хранения потенциальных админов
+    from dotenv import load_dotenv
+    load_dotenv(env_file)
+    settings = BotConfig()
+    try:
+        settings.validate()
+    except ValueError as e:
+        # Ошибка могла быть и в LOG_*: пишем ее в логи с настройками по умолчанию
+        setup_logging(settings.logs_dir)
+        logger.error("❌ %s", e)
+        raise
+
+    # Неблокирующее логирование: файлы пишет отдельный поток (см. log_setup.py)
+    log_listener = setup_logging(
+        settings.logs_dir,
+        level=settings.log_level,
+        rotation=settings.log_rotation,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        when=settings.log_rotation_when,
+        sample_rate=settings.log_sample_rate,
+        style=settings.log_format
+    )
+    if settings.trace_sample_rate > 0:
+        # Спаны пишет отдельный поток (см. tracing.py), разбор - python trace_flame.py
+        setup_tracing(settings.trace_file, settings.trace_sample_rate)
+        logger.info("🔬 Трассировка %s обновлений в %s", settings.trace_sample_rate, settings.trace_file)
+
+    count_lead = funnel_counter(settings)
+    templates = TemplateRegistry(settings.bot_locales, settings.bot_default_locale)
+    state_store = create_state_store(settings.state_backend, path=settings.state_db_path,
+                                     ttl=settings.state_ttl, max_users=settings.state_max_users)
+    lead_outbox = LeadOutbox(settings.lead_outbox_path)
+    if settings.lead_dedup_window > 0:
+        lead_index = LeadIndex(settings.lead_index_path, window=settings.lead_dedup_window)
+    lead_store = LeadStore(settings.lead_db_path)
+    admin_registry = AdminRegistry(settings.admin_db_path, max_admins=settings.admin_max_chats)
+    config = settings
+    return config
 
 async def error_handler_func(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик ошибок"""
-    error_msg = f"Exception while handling an update: {context.error}"
-    logger.error(error_msg)
-    error_logger.error(f"{error_msg}\nUpdate: {update}\nTraceback: {traceback.format_exc()}")
+    logger.error("Exception while handling an update: %s", context.error)
+    error_logger.error("Exception while handling an update: %s\nUpdate: %s", context.error, update,
+                       exc_info=context.error)
     
     # Если есть update и это сообщение
     if update and hasattr(update, 'effective_message') and update.effective_message:
         try:
             await update.effective_message.reply_text(
-                "🆘 Произошла ошибка! Администраторы уже уведомлены. 🆘"
+                templates.for_user(update.effective_user).unhandled_error
             )
         except Exception:
             pass
@@ -71,68 +129,42 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /start"""
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    user_info = f"@{update.effective_user.username or 'no_username'} ({update.effective_user.first_name})"
+    t = templates.for_user(update.effective_user)
     
     # Проверяем параметры deep linking
     start_param = None
     if context.args:
         start_param = context.args[0]
-        logger.info(f"🔗 Deep link параметр: {start_param}")
+        update_logger.info("🔗 Deep link параметр: %s", start_param)
     
-    logger.info(f"🚀 Команда /start от пользователя {user_id} ({user_info}), Chat ID: {chat_id}")
-    
-    # Сохраняем потенциальных админов
-    admin_chat_ids.add(chat_id)
+    update_logger.info("🚀 Команда /start от пользователя %s (%s), Chat ID: %s",
+                       user_id, UserLabel(update.effective_user), chat_id)
+    count_lead('start')
     
     # Логируем Chat ID для администратора (только в логи)
-    logger.info(f"📝 Chat ID для настройки: {chat_id}")
-    
-    user_data[user_id] = {}
+    update_logger.info("📝 Chat ID для настройки: %s", chat_id)
     
     # Если пользователь пришел по ссылке с параметром, сразу показываем форму заявки
     if start_param in ['form', 'request', 'application']:
-        user_data[user_id] = {'step': 'waiting_name'}
+        await state_store.set(user_id, LEAD_FORM.start_state())
         try:
-            await update.message.reply_text(
-                "🌟 *ДОБРО ПОЖАЛОВАТЬ! ДАВАЙТЕ ОФОРМИМ ЗАЯВКУ!* 🌟\n\n"
-                "✨ Для начала введите ваше имя:\n"
-                "💫 Мы хотим знать, как к вам обращаться! 💫",
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Автоматический запуск формы для пользователя {user_id}")
+            await update.message.reply_text(t.form_deeplink, parse_mode='Markdown', reply_markup=LEAD_FORM.first.markup)
+            update_logger.info("✅ Автоматический запуск формы для пользователя %s", user_id)
             return
         except Exception as e:
-            logger.error(f"❌ Ошибка автоматического запуска формы: {e}")
-    
-    keyboard = [
-        [InlineKeyboardButton("🌟 Оставить заявку 🌟", callback_data='new_request')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    welcome_text = """
-🎉 *ДОБРО ПОЖАЛОВАТЬ В МИР НЕДВИЖИМОСТИ!* 🎉
-
-🏡✨ Ваш личный помощник по анализу недвижимости ждет вас! ✨🏡
-
-🌈 Что мы предлагаем:
-🔥 Профессиональные консультации
-💎 Эксклюзивные предложения  
-🚀 Быстрый анализ рынка
-🎯 Персональный подход
-
-💫 Готовы начать путешествие в мир недвижимости? 💫
-Жмите яркую кнопку ниже! 👇✨
-    """
+            logger.error("❌ Ошибка автоматического запуска формы: %s", e)
+    else:
+        await state_store.set(user_id, {})
     
     try:
         await update.message.reply_text(
-            welcome_text,
+            t.welcome,
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=t.start_markup
         )
-        logger.info(f"✅ Приветствие отправлено пользователю {user_id}")
+        update_logger.info("✅ Приветствие отправлено пользователю %s", user_id)
     except Exception as e:
-        logger.error(f"❌ Ошибка отправки приветствия: {e}")
+        logger.error("❌ Ошибка отправки приветствия: %s", e)
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик нажатий на кнопки"""
@@ -140,303 +172,491 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await query.answer()
     
     user_id = query.from_user.id
-    user_info = f"@{query.from_user.username or 'no_username'} ({query.from_user.first_name})"
     
-    logger.info(f"🔘 Нажата кнопка '{query.data}' пользователем {user_id} ({user_info})")
+    update_logger.info("🔘 Нажата кнопка '%s' пользователем %s (%s)", query.data, user_id, UserLabel(query.from_user))
     
     if query.data == 'new_request':
-        user_data[user_id] = {'step': 'waiting_name'}
+        first = LEAD_FORM.first
+        await state_store.set(user_id, LEAD_FORM.start_state())
         try:
             await query.edit_message_text(
-                "🌟 *КАК ВАС ЗОВУТ?* 🌟\n\n"
-                "✨ Введите ваше прекрасное имя:\n"
-                "💫 Мы хотим знать, как к вам обращаться! 💫",
-                parse_mode='Markdown'
+                getattr(templates.for_user(query.from_user), first.field.prompt),
+                parse_mode='Markdown',
+                reply_markup=first.markup
             )
-            logger.info(f"✅ Запрос имени отправлен пользователю {user_id}")
+            update_logger.info("✅ Запрос имени отправлен пользователю %s", user_id)
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки запроса имени: {e}")
+            logger.error("❌ Ошибка отправки запроса имени: %s", e)
+        return
+    
+    # Вариант ответа кнопкой засчитывается, только если пользователь сейчас на этом шаге
+    choice = LEAD_FORM.choice(query.data)
+    if choice is None:
+        return
+    step, value = choice
+    state = await state_store.get(user_id)
+    if state is None or LEAD_FORM.step(state) is not step:
+        return
+    await answer_form(update, context, state, step, value, datetime.now(timezone.utc))
 
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик текстовых сообщений"""
     user_id = update.effective_user.id
-    chat_id = update.effective_chat.id
     message_text = update.message.text
-    user_info = f"@{update.effective_user.username or 'no_username'} ({update.effective_user.first_name})"
+    t = templates.for_user(update.effective_user)
     
-    logger.info(f"📨 Сообщение от {user_id} ({user_info}): '{message_text[:100]}...'")
+    update_logger.info("📨 Сообщение от %s (%s): '%.100s...'", user_id, UserLabel(update.effective_user), message_text)
     
-    # Добавляем Chat ID в список потенциальных админов
-    admin_chat_ids.add(chat_id)
-    
-    if user_id not in user_data:
+    state = await state_store.get(user_id)
+    if state is None:
         try:
-            await update.message.reply_text(
-                "🌈 Давайте начнем с команды /start! 🌈\n✨ Приключение ждет! ✨"
-            )
-            logger.info(f"✅ Предложение старта отправлено пользователю {user_id}")
+            await update.message.reply_text(t.start_first)
+            update_logger.info("✅ Предложение старта отправлено пользователю %s", user_id)
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки предложения старта: {e}")
+            logger.error("❌ Ошибка отправки предложения старта: %s", e)
         return
     
-    current_step = user_data[user_id].get('step')
+    step = LEAD_FORM.step(state)
+    if step is None:
+        return
     
-    if current_step == 'waiting_name':
-        # Валидация имени
-        if len(message_text.strip()) < 2:
-            try:
-                await update.message.reply_text(
-                    "🎭 Упс! Имя должно быть длиннее! 🎭\n"
-                    "✨ Введите имя минимум из 2 символов ✨\n"
-                    "💫 Мы верим в вас! 💫"
-                )
-                logger.warning(f"⚠️ Некорректное имя от пользователя {user_id}: '{message_text}'")
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки сообщения об ошибке имени: {e}")
-            return
-        
-        user_data[user_id]['name'] = message_text.strip()
-        user_data[user_id]['step'] = 'waiting_phone'
-        
-        logger.info(f"✅ Имя получено от пользователя {user_id}: '{message_text.strip()}'")
-        
+    with span('form.validate', field=step.field.key):
+        value = step.field.validate(message_text)
+    if value is None:
         try:
-            await update.message.reply_text(
-                "🎯 *ОТЛИЧНО! ТЕПЕРЬ ТЕЛЕФОН!* 🎯\n\n"
-                "📱 Укажите номер телефона для связи:\n\n"
-                "🇷🇺 *Российские номера:*\n"
-                "🌟 +7 916 123 45 67\n"
-                "🌟 8 (916) 123-45-67\n"
-                "🌟 79161234567\n"
-                "🌟 9161234567\n\n"
-                "🌍 *Международные номера:*\n"
-                "🔥 +380 67 123 45 67 (Украина)\n"
-                "🔥 +1 555 123 4567 (США/Канада)\n"
-                "🔥 +49 30 12345678 (Германия)\n"
-                "🔥 +33 1 42 86 83 26 (Франция)\n"
-                "🔥 +86 138 0013 8000 (Китай)\n"
-                "🔥 +44 20 7946 0958 (Великобритания)",
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Запрос телефона отправлен пользователю {user_id}")
+            await update.message.reply_text(getattr(t, step.field.error))
+            logger.warning("⚠️ Некорректный ответ на шаг '%s' от пользователя %s: '%s'", step.name, user_id, message_text)
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки запроса телефона: {e}")
+            logger.error("❌ Ошибка отправки сообщения об ошибке поля '%s': %s", step.field.key, e)
+        return
     
-    elif current_step == 'waiting_phone':
-        # Валидация телефона
-        phone = clean_phone(message_text)
-        if not is_valid_phone(phone):
-            try:
-                await update.message.reply_text(
-                    "🚨 УПС! ЧТО-ТО ПОШЛО НЕ ТАК! 🚨\n\n"
-                    "💡 *Требования к номеру:*\n"
-                    "🎯 От 7 до 15 цифр\n"
-                    "🎯 Только цифры и символ +\n"
-                    "🎯 Российские или международные номера\n\n"
-                    "🌟 *Попробуйте эти форматы:*\n"
-                    "🇷🇺 *Россия:*\n"
-                    "💫 +7 916 123 45 67\n"
-                    "💫 8 (916) 123-45-67\n"
-                    "💫 79161234567\n\n"
-                    "🌍 *Мир:*\n"
-                    "🔥 +380 67 123 45 67 (Украина)\n"
-                    "🔥 +1 555 123 4567 (США)\n"
-                    "🔥 +49 30 12345678 (Германия)\n"
-                    "🔥 +86 138 0013 8000 (Китай)\n\n"
-                    "💪 Попробуйте еще раз! У вас получится! 💪"
-                )
-                logger.warning(f"⚠️ Некорректный телефон от пользователя {user_id}: '{message_text}'")
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки сообщения об ошибке телефона: {e}")
-            return
-        
-        user_data[user_id]['phone'] = format_phone(phone)
-        
-        # Формируем заявку
-        name = user_data[user_id]['name']
-        phone_formatted = user_data[user_id]['phone']
-        username = update.effective_user.username
-        user_full_name = f"{update.effective_user.first_name or ''} {update.effective_user.last_name or ''}".strip()
-        
-        logger.info(f"📋 Новая заявка от {user_id}: Имя='{name}', Телефон='{phone_formatted}'")
-        
-        # Отправляем заявку администратору
-        admin_message = f"""🎊 НОВАЯ ГОРЯЧАЯ ЗАЯВКА! 🎊
+    await answer_form(update, context, state, step, value, update.message.date)
 
-🌟 Имя: {name}
-📱 Телефон: {phone_formatted}
-🆔 User ID: {user_id}
-👤 Telegram: @{username or 'не указан'} ({user_full_name})
-🗨️ Chat ID: {chat_id}
-⏰ Время: {update.message.date.strftime('%d.%m.%Y %H:%M:%S')}
+async def answer_form(update: Update, context: ContextTypes.DEFAULT_TYPE, state, step, value, sent_at) -> None:
+    """Принятый ответ на шаг анкеты: следующий вопрос или заявка, если поле было последним"""
+    user_id = update.effective_user.id
+    following = LEAD_FORM.advance(state, step, value)
+    if following is None:
+        await submit_lead(update, context, state, sent_at)
+        return
+    
+    if step.field.funnel:
+        count_lead(step.field.funnel)
+    await state_store.set(user_id, state)
+    update_logger.info("✅ %s получено от пользователя %s: '%s'", step.field.label, user_id, step.field.display(value))
+    
+    t = templates.for_user(update.effective_user)
+    try:
+        await update.effective_message.reply_text(
+            getattr(t, following.field.prompt),
+            parse_mode='Markdown',
+            reply_markup=following.markup
+        )
+        update_logger.info("✅ Запрос поля '%s' отправлен пользователю %s", following.field.key, user_id)
+    except Exception as e:
+        logger.error("❌ Ошибка отправки запроса поля '%s': %s", following.field.key, e)
 
-🚀 Клиент готов к сотрудничеству! 🚀
-💎 Действуйте быстро! 💎"""
-        
-        # Попытка отправки всем потенциальным админам
-        admin_sent = False
-        if ADMIN_CHAT_ID and ADMIN_CHAT_ID.isdigit():
-            try:
-                await context.bot.send_message(
-                    chat_id=int(ADMIN_CHAT_ID),
-                    text=admin_message
-                )
-                logger.info(f"✅ Заявка отправлена админу {ADMIN_CHAT_ID}")
-                admin_sent = True
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки заявки админу {ADMIN_CHAT_ID}: {e}")
+async def submit_lead(update: Update, context: ContextTypes.DEFAULT_TYPE, state, sent_at) -> None:
+    """Заполненная анкета: отсев повторов, сохранение, outbox для админов и подтверждение"""
+    user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
+    t = templates.for_user(update.effective_user)
+    
+    # Формируем заявку
+    name = state['name']
+    phone_e164 = state['phone']
+    phone_formatted = format_phone(phone_e164)
+    username = update.effective_user.username
+    user_full_name = f"{update.effective_user.first_name or ''} {update.effective_user.last_name or ''}".strip()
+    
+    update_logger.info("📋 Новая заявка от %s: Имя='%s', Телефон='%s'", user_id, name, phone_formatted)
+    
+    # Повтор того же телефона в окне сливается с первой заявкой и админам не отправляется.
+    # Новая заявка попадает в индекс только после outbox или прямой отправки: иначе потерянную
+    # заявку нельзя было бы отправить повторно до конца окна.
+    with span('lead.dedup'):
+        match = lead_index.lookup(user_id, phone_e164) if lead_index is not None else None
+    duplicate = match is not None and match.matched_by == 'phone'
+    try:
+        with span('lead.store'):
+            await lead_store.add(
+                sent_at.timestamp(), user_id, chat_id, name, phone_e164,
+                username=username, full_name=user_full_name, duplicate=duplicate
+            )
+    except Exception as e:
+        logger.error("❌ Ошибка сохранения заявки в базу: %s", e)
+    
+    if duplicate:
+        await lead_index.register(user_id, phone_e164)
+        count_lead('duplicate')
+        update_logger.info(
+            "🔁 Повтор заявки от %s: телефон уже получен (повторов: %s), админам не отправляется",
+            user_id, match.record.repeats + 1
+        )
+    else:
+        # Отправляем заявку администратору
+        admin_message = ADMIN_LEAD(
+            name=name,
+            phone=phone_formatted,
+            user_id=user_id,
+            username=username or 'не указан',
+            full_name=user_full_name,
+            chat_id=chat_id,
+            time=sent_at.strftime('%d.%m.%Y %H:%M:%S')
+        )
+        extra = LEAD_FORM.extra_answers(state, skip=('name', 'phone'))
+        if extra:
+            admin_message += '\n\n' + '\n'.join(f"📝 {label}: {value}" for label, value in extra)
+        if match is not None:
+            admin_message = ADMIN_LEAD_REPEAT(previous_phone=format_phone(match.record.phone)) + admin_message
         
-        # Если не удалось отправить админу, отправляем всем известным чатам
-        if not admin_sent:
-            logger.warning("⚠️ ADMIN_CHAT_ID не настроен или недоступен, отправка заявки всем известным чатам")
-            for admin_id in admin_chat_ids:
-                try:
-                    # Проверяем, не отправляем ли заявку самому заявителю
-                    if admin_id != chat_id:
-                        await context.bot.send_message(
-                            chat_id=admin_id,
-                            text=admin_message
-                        )
-                        logger.info(f"✅ Заявка отправлена потенциальному админу {admin_id}")
-                        admin_sent = True
-                    else:
-                        # Если это сам заявитель, записываем в логи для настройки
-                        logger.warning(f"📝 НАСТРОЙКА: Установите ADMIN_CHAT_ID={admin_id} в .env файле для получения заявок")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки заявки потенциальному админу {admin_id}: {e}")
+        count_lead('phone')
         
+        # Сохраняем заявку в outbox, доставку админу выполняет фоновый воркер
+        lead = {'text': admin_message, 'user_id': user_id, 'chat_id': chat_id}
+        if is_priority(state, config.lead_priority):
+            lead['priority'] = True  # В режиме дайджеста уходит сразу
+        traceparent = current_traceparent()
+        if traceparent:
+            lead['trace'] = traceparent  # Доставка воркером продолжит трассу этого обновления
+        accepted = False
         try:
-            # Подтверждение пользователю
-            await update.message.reply_text(
-                "🎉 *ПОТРЯСАЮЩЕ! ЗАЯВКА ПРИНЯТА!* 🎉\n\n"
-                "✨ *Ваши данные:* ✨\n"
-                f"🌟 **Имя:** {name}\n"
-                f"📱 **Телефон:** {phone_formatted}\n\n"
-                "🚀 *Что дальше?*\n"
-                "💫 Наш супер-специалист уже мчится к телефону!\n"
-                "🔥 Скоро получите звонок с эксклюзивным предложением!\n"
-                "💎 Приготовьтесь к удивительным возможностям!\n\n"
-                "🌈 Хотите оставить еще одну заявку? Жмите /start! 🌈\n"
-                "✨ Мы всегда рады помочь! ✨",
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Подтверждение отправлено пользователю {user_id}")
-            
-            # Очищаем данные пользователя
-            del user_data[user_id]
-            
+            with span('outbox.enqueue'):
+                lead_id = await lead_outbox.enqueue(lead)
+            accepted = True
+            update_logger.info("📥 Заявка #%s сохранена в outbox", lead_id)
+            lead_worker = context.bot_data.get('lead_worker')
+            if lead_worker:
+                lead_worker.notify()
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки подтверждения: {e}")
+            logger.error("❌ Ошибка сохранения заявки в outbox, отправка напрямую: %s", e)
             try:
-                await update.message.reply_text(
-                    "🆘 Упс! Произошла техническая заминка! 🆘\n"
-                    "🔧 Наши программисты уже чинят это!\n"
-                    "💫 Попробуйте через минутку или напишите администратору! 💫\n"
-                    "🌟 Мы обязательно вам поможем! 🌟"
-                )
+                await deliver_lead(context.bot_data['notification_dispatcher'], lead)
+                accepted = True
             except Exception as e2:
-                logger.error(f"❌ Критическая ошибка отправки сообщения об ошибке: {e2}")
-
-def clean_phone(phone_str):
-    """Очистка номера телефона от лишних символов"""
-    return re.sub(r'[^\d+]', '', phone_str)
-
-def is_valid_phone(phone):
-    """Валидация номера телефона"""
-    # Российские номера: 7XXXXXXXXXX, 8XXXXXXXXXX, или международные +XXXXXXXXXXXXX
-    patterns = [
-        r'^\+?7\d{10}$',  # +7XXXXXXXXXX или 7XXXXXXXXXX
-        r'^8\d{10}$',     # 8XXXXXXXXXX 
-        r'^\d{10}$',      # XXXXXXXXXX (будет +7)
-        r'^\+\d{7,15}$'   # Международные +XXXXXXXXXXXXX
+                logger.error("❌ Ошибка прямой отправки заявки: %s", e2)
+        if accepted and lead_index is not None:
+            try:
+                with span('lead.dedup'):
+                    await lead_index.register(user_id, phone_e164)
+            except Exception as e:
+                logger.error("❌ Ошибка учета заявки в окне повторов: %s", e)
+    
+    try:
+        # Подтверждение пользователю
+        await update.effective_message.reply_text(
+            t.confirmation(name=escape_markdown(name), phone=escape_markdown(phone_formatted)),
+            parse_mode='Markdown'
+        )
+        update_logger.info("✅ Подтверждение отправлено пользователю %s", user_id)
+        
+        # Очищаем данные пользователя
+        await state_store.delete(user_id)
+        
+    except Exception as e:
+        logger.error("❌ Ошибка отправки подтверждения: %s", e)
+        try:
+            await update.effective_message.reply_text(t.tech_error)
+        except Exception as e2:
+            logger.error("❌ Критическая ошибка отправки сообщения об ошибке: %s", e2)
+
+async def deliver_lead(dispatcher, lead) -> None:
+    """
+    Доставка заявки (или дайджеста из lead['leads'] заявок) админам; исключение означает,
+    что воркер повторит попытку позже
+    """
+    recipients = config.admin_recipients + [
+        chat_id for chat_id in admin_registry.chat_ids() if chat_id not in config.admin_recipients
     ]
+    if not recipients:
+        logger.warning("📝 НАСТРОЙКА: Установите ADMIN_CHAT_ID в .env файле или отправьте боту /admin <код> для получения заявок")
+        raise RuntimeError("Нет настроенных получателей заявки")
     
-    for pattern in patterns:
-        if re.match(pattern, phone):
-            return True
-    return False
-
-def format_phone(phone):
-    """Форматирование номера телефона"""
-    # Убираем все кроме цифр и +
-    clean = re.sub(r'[^\d+]', '', phone)
-    
-    # Российские номера
-    if clean.startswith('8') and len(clean) == 11:
-        return '+7' + clean[1:]
-    elif clean.startswith('7') and len(clean) == 11:
-        return '+' + clean
-    elif clean.startswith('+7') and len(clean) == 12:
-        return clean
-    elif len(clean) == 10:  # Номер без кода страны
-        return '+7' + clean
-    elif clean.startswith('+'):
-        return clean
-    else:
-        return '+' + clean
+    results = await dispatcher.send(recipients, lead['text'])
+    delivered = [result.chat_id for result in results if result.ok]
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        logger.error("❌ Ошибка отправки заявки в чат %s: %s", result.chat_id, result.error)
+    if delivered:
+        leads = lead.get('leads')
+        if leads is None:
+            logger.info("✅ Заявка отправлена в чаты: %s", delivered)
+        else:
+            # Число заявок в строке: log_analytics считает доставленные заявки, а не сообщения
+            logger.info("✅ Заявок отправлено дайджестом: %s, чаты: %s", leads, delivered)
+        count_lead('delivered', amount=leads or 1)
+        return
+    
+    # Ни один получатель не принял заявку: RetryAfter передаем воркеру как есть
+    for result in failed:
+        if isinstance(result.error, RetryAfter):
+            raise result.error
+    raise RuntimeError("Нет доступных получателей заявки")
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /help"""
     chat_id = update.effective_chat.id
     user_id = update.effective_user.id
     
-    logger.info(f"ℹ️ Команда /help от пользователя {user_id}")
+    update_logger.info("ℹ️ Команда /help от пользователя %s", user_id)
+    
+    help_text = templates.for_user(update.effective_user).help(chat_id=chat_id)
+    
+    try:
+        await update.message.reply_text(help_text, parse_mode='Markdown')
+        update_logger.info("✅ Справка отправлена пользователю %s", user_id)
+    except Exception as e:
+        logger.error("❌ Ошибка отправки справки: %s", e)
+
+async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /admin <код> - регистрация чата для получения заявок"""
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    code = context.args[0] if context.args else ''
+    t = templates.for_user(update.effective_user)
+    
+    if not check_enroll_code(code, config.admin_enroll_code):
+        logger.warning("⛔ Неверный код /admin от пользователя %s, Chat ID: %s", user_id, chat_id)
+        text = t.admin_bad_code
+    elif await admin_registry.enroll(chat_id):
+        logger.info("👑 Чат %s зарегистрирован как админ пользователем %s", chat_id, user_id)
+        text = t.admin_enrolled
+    else:
+        logger.error("❌ Реестр админов заполнен, чат %s не добавлен", chat_id)
+        text = t.admin_full
+    
+    try:
+        await update.message.reply_text(text)
+    except Exception as e:
+        logger.error("❌ Ошибка ответа на /admin: %s", e)
+
+async def post_init(application: Application) -> None:
+    """Запуск фоновых задач после инициализации приложения"""
+    restored = await state_store.restore(config.state_snapshot_path)
+    if restored:
+        logger.info("♻️ Восстановлено незаполненных анкет из снимка: %s", restored)
+
+    application.bot_data['state_eviction_task'] = asyncio.create_task(
+        state_store.run_eviction(config.state_eviction_interval)
+    )
+    if lead_index is not None:
+        application.bot_data['lead_index_eviction_task'] = asyncio.create_task(
+            lead_index.run_eviction(config.state_eviction_interval)
+        )
+    
+    async def deliver(lead):
+        await deliver_lead(application.bot_data['notification_dispatcher'], lead)
     
-    help_text = f"""
-🔧 *ПОМОЩЬ ПО БОТУ FORMACONTACT* 🔧
+    if config.lead_digest_window > 0:
+        lead_worker = DigestWorker(lead_outbox, deliver, config.lead_digest_window,
+                                   max_leads=config.lead_digest_size, header=ADMIN_DIGEST)
+        logger.info("📦 Заявки админам дайджестом: до %s шт. или %g с", config.lead_digest_size, config.lead_digest_window)
+    else:
+        lead_worker = OutboxWorker(lead_outbox, deliver)
+    application.bot_data['lead_worker'] = lead_worker
+    application.bot_data['lead_worker_task'] = asyncio.create_task(lead_worker.run())
+    pending = await lead_outbox.pending_count()
+    if pending:
+        logger.info("📮 Недоставленных заявок в outbox: %s", pending)
+    
+    if len(config.cluster_nodes) > 1:
+        application.bot_data['admin_reload_task'] = asyncio.create_task(
+            admin_registry.run_reload(config.cluster_lease_ttl)
+        )
+    
+    if config.metrics_port:
+        application.bot_data['metrics_runner'] = await start_metrics_server(config.metrics_listen, config.metrics_port)
 
-🚀 *Команды:*
-/start - Начать работу с ботом
-/help - Показать эту справку
+async def _cancel_background_tasks(application: Application) -> None:
+    for name in ('state_eviction_task', 'lead_index_eviction_task', 'lead_worker_task', 'admin_reload_task'):
+        task = application.bot_data.pop(name, None)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
-🆔 *Ваш Chat ID:* `{chat_id}`
+async def post_stop(application: Application) -> None:
+    """Обработчики завершены, бот еще может отправлять: доставка заявок и снимок анкет"""
+    await _cancel_background_tasks(application)
+    lead_worker = application.bot_data.get('lead_worker')
+    if lead_worker:
+        left = await lead_worker.drain(time_left(application, config.shutdown_timeout))
+        if left:
+            logger.warning("📮 В outbox остались заявки (%s), они уйдут после запуска", left)
+    try:
+        saved = await state_store.snapshot(config.state_snapshot_path)
+        if saved:
+            logger.info("💾 Незаполненных анкет сохранено в снимок: %s", saved)
+    except Exception as e:
+        logger.error("❌ Ошибка сохранения снимка анкет: %s", e)
+
+async def post_shutdown(application: Application) -> None:
+    """Остановка фоновых задач и закрытие хранилищ"""
+    await _cancel_background_tasks(application)
+    metrics_runner = application.bot_data.pop('metrics_runner', None)
+    if metrics_runner:
+        await metrics_runner.cleanup()
+    await state_store.close()
+    await lead_outbox.close()
+    await lead_store.close()
+    if lead_index is not None:
+        await lead_index.close()
+    await admin_registry.close()
+
+def handler_registry(settings) -> HandlerRegistry:
+    """Общие обработчики бота и функции вокруг них; выключенные в настройках в цепочку не попадают"""
+    registry = HandlerRegistry()
+    # Обертки обработчиков, внешняя - первая: имя в логах, метрики для /metrics, спан трассировки
+    registry.middleware('log_context', bind_handler)
+    registry.middleware('metrics', count_handler, enabled=settings.metrics_port > 0)
+    registry.middleware('tracing', trace_handler, enabled=settings.trace_sample_rate > 0)
+    
+    # Лимит флуда срабатывает раньше анкеты; отброшенные сообщения не получают ответа
+    def install_rate_limit(application):
+        rate_limiter = RateLimiter(
+            user_rate=settings.rate_limit_user_rate,
+            user_burst=settings.rate_limit_user_burst,
+            global_rate=settings.rate_limit_global_rate / settings.cluster_size,
+            global_burst=settings.rate_limit_global_burst,
+            max_delay=settings.rate_limit_max_delay,
+            max_users=settings.rate_limit_max_users
+        )
+        application.add_handler(rate_limit_handler(rate_limiter), group=RATE_LIMIT_GROUP)
+    
+    registry.plugin('rate_limit', install_rate_limit, enabled=settings.rate_limit_user_rate > 0)
+    
+    registry.handler('start', start, partial(CommandHandler, 'start'))
+    registry.handler('help', help_command, partial(CommandHandler, 'help'))
+    registry.handler('admin', admin_command, partial(CommandHandler, 'admin'))
+    registry.handler('button', button_handler, CallbackQueryHandler)
+    registry.handler('message', message_handler, partial(MessageHandler, filters.TEXT & ~filters.COMMAND))
+    return registry
 
-📋 *Как пользоваться:*
-1. Нажмите /start
-2. Нажмите кнопку "Оставить заявку"
-3. Введите ваше имя
-4. Введите номер телефона
-5. Готово! Ждите звонка!
+def _skip_count(*labelvalues, amount=1):
+    pass
 
-📞 *Поддерживаемые форматы телефонов:*
-🇷🇺 Россия: +7, 8, 7
-🌍 Международные: +код страны
+def funnel_counter(settings):
+    """LEAD_FUNNEL.inc, если метрики включены (METRICS_PORT), иначе пустая функция"""
+    return LEAD_FUNNEL.inc if settings.metrics_port > 0 else _skip_count
 
-💬 *По вопросам пишите администратору*
+def instrument_request(settings, request) -> BaseRequest:
+    """Замер вызовов Bot API (метрики и спаны bot_api) - только при включенных метриках или трассировке"""
+    if settings.metrics_port > 0 or settings.trace_sample_rate > 0:
+        return InstrumentedRequest(request)
+    return request
+
+def bot_api_request(kind, base_url) -> BaseRequest:
+    """Пул HTTPX к Bot API с настройками HTTP_* (kind - send или updates)"""
+    return create_request(
+        kind, base_url,
+        pool_size=config.http_updates_pool_size if kind == 'updates' else config.http_pool_size,
+        keepalive=config.http_keepalive,
+        keepalive_expiry=config.http_keepalive_expiry,
+        http_version=config.http_version,
+        connect_timeout=config.http_connect_timeout,
+        read_timeout=config.http_read_timeout,
+        write_timeout=config.http_write_timeout,
+        pool_timeout=config.http_pool_timeout
+    )
+
+def build_application(base_url=None, request=None, plugins=()) -> Application:
     """
+    Фабрика приложения с общей регистрацией обработчиков для polling, webhook и кластера.
+    При первом вызове настраивает процесс (configure).
+    request - транспорт Bot API (по умолчанию пул HTTPX из http_transport), например фейковый для бенчмарков.
+    getUpdates всегда идет через отдельный пул, чтобы долгий опрос не мешал ответам.
+    plugins - функции plugin(registry), которые добавляют свои обработчики, обертки и плагины
+    в handler_registry до сборки приложения.
+    """
+    configure()
+    base_url = base_url or config.bot_api_base_url
+    builder = (
+        Application.builder()
+        .token(config.bot_token)
+        .request(instrument_request(config, request or bot_api_request('send', base_url)))
+        .get_updates_request(instrument_request(config, bot_api_request('updates', base_url)))
+        .concurrent_updates(PerUserUpdateProcessor(config.update_concurrency))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    application.bot_data['notification_dispatcher'] = NotificationDispatcher(
+        application.bot,
+        max_concurrency=config.notify_concurrency,
+        timeout=config.notify_timeout,
+        global_rate=config.notify_global_rate / config.cluster_size,
+        chat_rate=config.notify_chat_rate
+    )
     
-    try:
-        await update.message.reply_text(help_text, parse_mode='Markdown')
-        logger.info(f"✅ Справка отправлена пользователю {user_id}")
-    except Exception as e:
-        logger.error(f"❌ Ошибка отправки справки: {e}")
+    # Добавляем обработчик ошибок
+    application.add_error_handler(error_handler_func)
+    
+    registry = handler_registry(config)
+    for plugin in plugins:
+        plugin(registry)
+    registry.install(application)
+    
+    enabled, disabled = registry.features()
+    logger.info("✅ Все обработчики зарегистрированы; включено: %s; выключено: %s",
+                ', '.join(enabled), ', '.join(disabled) or '-')
+    return application
 
 def main() -> None:
     """Запуск бота"""
+    configure()
     logger.info("🎉 Telegram бот FormaContact с улучшенным логированием запускается! 🎉")
     
     # Создаем приложение
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # Добавляем обработчик ошибок
-    application.add_error_handler(error_handler_func)
-    
-    # Регистрируем обработчики
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CallbackQueryHandler(button_handler))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+    application = build_application()
     
-    logger.info("✅ Все обработчики зарегистрированы")
-    logger.info(f"🆔 Потенциальные админ чаты: {list(admin_chat_ids)}")
+    logger.info("🆔 Админ чаты: %s", config.admin_recipients + admin_registry.chat_ids())
     
     # Запускаем бот
     try:
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if config.cluster_nodes:
+            from cluster import run_cluster
+            logger.info("🧩 Режим кластера (%s): реплика %s из %s", config.bot_mode, config.cluster_node, config.cluster_size)
+            run_cluster(
+                application,
+                nodes=config.cluster_nodes,
+                node=config.cluster_node,
+                secret=config.cluster_secret,
+                lock_path=config.cluster_lock_path,
+                listen=config.cluster_listen,
+                port=config.cluster_port,
+                mode=config.bot_mode,
+                lease_ttl=config.cluster_lease_ttl,
+                webhook_path=config.webhook_path,
+                webhook_secret=config.webhook_secret,
+                webhook_url=config.webhook_url,
+                allowed_updates=Update.ALL_TYPES,
+                shutdown_timeout=config.shutdown_timeout
+            )
+        elif config.bot_mode == 'webhook':
+            from webhook_server import run_webhook
+            logger.info("🌐 Режим webhook: %s:%s%s", config.webhook_listen, config.webhook_port, config.webhook_path)
+            run_webhook(
+                application,
+                listen=config.webhook_listen,
+                port=config.webhook_port,
+                path=config.webhook_path,
+                secret_token=config.webhook_secret,
+                webhook_url=config.webhook_url,
+                allowed_updates=Update.ALL_TYPES,
+                shutdown_timeout=config.shutdown_timeout
+            )
+        else:
+            run_until_signal(serve_polling, application, allowed_updates=Update.ALL_TYPES,
+                             shutdown_timeout=config.shutdown_timeout)
     except Exception as e:
-        logger.error(f"💥 Критическая ошибка запуска бота: {e}")
-        error_logger.error(f"Критическая ошибка: {traceback.format_exc()}")
+        logger.error("💥 Критическая ошибка запуска бота: %s", e)
+        error_logger.error("Критическая ошибка", exc_info=True)
         raise
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+
+from admin_registry import AdminRegistry, check_enroll_code
+
+
+def test_enrollment_is_bounded_and_persisted():
+    """Реестр ограничен по размеру и восстанавливается с диска"""
+    async def scenario(path):
+        registry = AdminRegistry(path, max_admins=2)
+        assert await registry.enroll(10)
+        assert await registry.enroll(-100200)
+        assert await registry.enroll(10)  # Повторная регистрация не занимает место
+        assert not await registry.enroll(30)
+        await registry.close()
+
+        registry = AdminRegistry(path, max_admins=2)
+        assert 10 in registry and 30 not in registry
+        assert registry.chat_ids() == [-100200, 10]
+        assert await registry.remove(10)
+        assert registry.chat_ids() == [-100200]
+        await registry.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'admins.sqlite3')))
+
+
+def test_enroll_code():
+    assert check_enroll_code('s3cret', 's3cret')
+    assert not check_enroll_code('wrong', 's3cret')
+    assert not check_enroll_code('', None)
+
+
+if __name__ == '__main__':
+    test_enrollment_is_bounded_and_persisted()
+    test_enroll_code()
+    print("✅ Тесты реестра админов пройдены")
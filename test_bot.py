@@ -16,6 +16,10 @@ if not BOT_TOKEN:
     exit(1)
     
 BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+TIMEOUT = 10
+
+# Одна сессия на все проверки: соединение с api.telegram.org переиспользуется
+session = requests.Session()
 
 def test_bot():
     """Тестирование доступности бота"""
@@ -24,7 +28,7 @@ def test_bot():
     
     # 1. Проверка токена
     try:
-        response = requests.get(f"{BASE_URL}/getMe")
+        response = session.get(f"{BASE_URL}/getMe", timeout=TIMEOUT)
         data = response.json()
         
         if data['ok']:
@@ -42,7 +46,7 @@ def test_bot():
     
     # 2. Проверка последних обновлений
     try:
-        response = requests.get(f"{BASE_URL}/getUpdates")
+        response = session.get(f"{BASE_URL}/getUpdates", timeout=TIMEOUT)
         data = response.json()
         
         if data['ok']:
@@ -71,11 +75,11 @@ def test_bot():
     test_message = "🧪 Тестовое сообщение от бота"
     
     try:
-        response = requests.post(f"{BASE_URL}/sendMessage", {
+        response = session.post(f"{BASE_URL}/sendMessage", {
             'chat_id': admin_chat_id,
             'text': test_message,
             'parse_mode': 'Markdown'
-        })
+        }, timeout=TIMEOUT)
         data = response.json()
         
         if data['ok']:
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from bot_config import BotConfig
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _error(env):
+    try:
+        BotConfig(env).validate()
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def test_config_defaults_and_validation():
+    config = BotConfig({'BOT_TOKEN': '1:x', 'ADMIN_CHAT_ID': '5', 'ADMIN_CHAT_IDS': '6, 5'}).validate()
+    assert config.admin_recipients == [5, 6]
+    assert config.bot_mode == 'polling' and config.cluster_size == 1
+    assert config.lead_dedup_window == 86400
+    assert config.lead_digest_window == 0 and config.lead_priority == {}
+    assert BotConfig({'LEAD_PRIORITY': 'budget=gt10, budget=gt50'}).lead_priority == {'budget': {'gt10', 'gt50'}}
+    assert 'LEAD_DIGEST' in _error({'BOT_TOKEN': '1:x', 'LEAD_DIGEST_SIZE': '0'})
+
+    assert 'BOT_TOKEN' in _error({})
+    assert 'BOT_MODE' in _error({'BOT_TOKEN': '1:x', 'BOT_MODE': 'push'})
+    assert 'WEBHOOK_SECRET' in _error({'BOT_TOKEN': '1:x', 'BOT_MODE': 'webhook'})
+    cluster = {'BOT_TOKEN': '1:x', 'CLUSTER_NODES': 'http://a:8090/, http://b:8090',
+               'CLUSTER_NODE': 'http://a:8090', 'CLUSTER_SECRET': 's'}
+    assert 'STATE_BACKEND' in _error(cluster)
+    assert _error(dict(cluster, STATE_BACKEND='sqlite')) is None
+    assert BotConfig(cluster).cluster_size == 2
+    assert 'CLUSTER_NODE' in _error(dict(cluster, STATE_BACKEND='sqlite', CLUSTER_NODE='http://c:8090'))
+
+
+def test_transport_state_and_log_settings():
+    """STATE_*, HTTP_* и LOG_* проверяются вместе с остальными настройками, а не при первом использовании"""
+    config = BotConfig({'BOT_TOKEN': '1:x', 'HTTP_POOL_SIZE': '32', 'LOG_LEVEL': 'debug', 'STATE_TTL': '60'}).validate()
+    assert config.http_pool_size == 32 and config.log_level == 'DEBUG' and config.state_ttl == 60
+    assert config.log_rotation == 'size' and config.http_version == 'auto'
+
+    assert 'STATE_TTL' in _error({'BOT_TOKEN': '1:x', 'STATE_TTL': 'abc'})
+    assert 'HTTP_POOL_SIZE' in _error({'BOT_TOKEN': '1:x', 'HTTP_POOL_SIZE': 'x'})
+    assert 'HTTP_READ_TIMEOUT' in _error({'BOT_TOKEN': '1:x', 'HTTP_READ_TIMEOUT': '1s'})
+    assert 'HTTP_VERSION' in _error({'BOT_TOKEN': '1:x', 'HTTP_VERSION': '3'})
+    assert 'https' in _error({'BOT_TOKEN': '1:x', 'HTTP_VERSION': '2', 'BOT_API_BASE_URL': 'http://127.0.0.1:8081/bot'})
+    assert _error({'BOT_TOKEN': '1:x', 'HTTP_VERSION': '2'}) is None
+    assert 'LOG_FORMAT' in _error({'BOT_TOKEN': '1:x', 'LOG_FORMAT': 'xml'})
+    assert 'LOG_LEVEL' in _error({'BOT_TOKEN': '1:x', 'LOG_LEVEL': 'LOUD'})
+    assert 'LOG_SAMPLE_RATE' in _error({'BOT_TOKEN': '1:x', 'LOG_SAMPLE_RATE': '2'})
+
+
+def test_import_has_no_side_effects():
+    """Импорт бота без BOT_TOKEN не падает, не создает логи и файлы и не тянет aiohttp"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {key: value for key, value in os.environ.items() if key != 'BOT_TOKEN'}
+        env.update(LOGS_DIR=os.path.join(tmp, 'logs'), PYTHONPATH=HERE)
+        code = "import sys, telegram_bot_current as bot; assert bot.config is None; print('aiohttp' in sys.modules)"
+        result = subprocess.run([sys.executable, '-c', code], cwd=tmp, env=env,
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == 'False'
+        assert os.listdir(tmp) == []
+
+
+if __name__ == '__main__':
+    test_config_defaults_and_validation()
+    test_transport_state_and_log_settings()
+    test_import_has_no_side_effects()
+    print("✅ Тесты конфигурации пройдены")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import socket
+import tempfile
+from collections import Counter
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+from telegram import Update
+
+import cluster
+from cluster import ClusterRouter, HashRing, LeaderLease, create_cluster_app
+from fake_application import LifecycleApplication
+from fake_clock import FakeClock
+
+
+def test_ring_is_balanced_and_stable():
+    """Пользователи делятся примерно поровну, отключение реплики двигает только ее пользователей"""
+    nodes = ['http://bot-1:8090', 'http://bot-2:8090', 'http://bot-3:8090']
+    ring = HashRing(nodes)
+    owners = {user_id: ring.node_for(user_id) for user_id in range(30_000)}
+    assert min(Counter(owners.values()).values()) > 7_000
+
+    smaller = HashRing(nodes[:2])
+    for user_id, owner in owners.items():
+        if owner != nodes[2]:
+            assert smaller.node_for(user_id) == owner
+            assert ring.node_for(user_id, down={nodes[2]}) == owner
+    assert ring.node_for(1, down=set(nodes)) is None
+
+
+def _try_acquire(args):
+    path, owner = args
+    lease = LeaderLease(path, owner)
+    return lease.try_acquire()
+
+
+def test_single_leader_across_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cluster.sqlite3')
+        with Pool(4) as pool:
+            results = pool.map(_try_acquire, [(path, f'replica-{index}') for index in range(8)])
+        assert results.count(True) == 1
+
+
+def test_lease_renewal_and_takeover():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cluster.sqlite3')
+        clock = FakeClock()
+        first = LeaderLease(path, 'a', ttl=15, clock=clock)
+        second = LeaderLease(path, 'b', ttl=15, clock=clock)
+        assert first.try_acquire()
+        clock.now += 10
+        assert first.try_acquire()  # продление
+        clock.now += 10
+        assert not second.try_acquire()
+        clock.now += 6  # лидер не продлил аренду вовремя
+        assert second.try_acquire()
+        assert first.holder() == 'b'
+        second.release()
+        assert first.try_acquire()
+
+
+def _update(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': f'шаг {update_id}',
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+        },
+    }, None)
+
+
+def test_router_forwards_in_order_and_fails_over():
+    async def scenario():
+        remote = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        runner = web.AppRunner(create_cluster_app(remote, 'secret'))
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        node_b = f'http://127.0.0.1:{runner.addresses[0][1]}'
+        node_a = 'http://replica-a'
+
+        ring = HashRing([node_a, node_b])
+        local = []
+
+        async def put_local(update):
+            local.append(update)
+
+        router = ClusterRouter(ring, node_a, put_local, 'secret', batch_size=7, retry_delay=0.01)
+        await router.start()
+        for update_id in range(1, 201):
+            await router.route(_update(update_id, update_id % 20))
+        await router.flush()
+
+        forwarded = []
+        while not remote.update_queue.empty():
+            forwarded.append(remote.update_queue.get_nowait())
+        assert {ring.node_for(update.effective_user.id) for update in forwarded} == {node_b}
+        assert {ring.node_for(update.effective_user.id) for update in local} == {node_a}
+        assert len(forwarded) + len(local) == 200
+        assert [update.update_id for update in forwarded] == sorted(update.update_id for update in forwarded)
+
+        # Реплика B остановлена: ее пользователи переходят к A, ничего не теряется
+        await runner.cleanup()
+        moved = [user_id for user_id in range(20) if ring.node_for(user_id) == node_b]
+        local.clear()
+        for update_id, user_id in enumerate(moved, start=1000):
+            await router.route(_update(update_id, user_id))
+        await router.flush()
+        assert router.down == {node_b}
+        assert sorted(update.effective_user.id for update in local) == sorted(moved)
+        await router.close()
+
+    asyncio.run(scenario())
+
+
+def test_cluster_batch_requires_secret():
+    async def scenario():
+        remote = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        runner = web.AppRunner(create_cluster_app(remote, 'secret'))
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        ring = HashRing(['http://replica-a', f'http://127.0.0.1:{runner.addresses[0][1]}'])
+        router = ClusterRouter(ring, 'http://replica-a', None, 'wrong')
+        await router.start()
+        try:
+            await router._post(ring.nodes[1], [])
+        except RuntimeError as e:
+            assert '403' in str(e)
+        else:
+            raise AssertionError('пачка с чужим секретом принята')
+        await router.close()
+        await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_failed_bind_stops_replica(monkeypatch):
+    """Порт занят: приложение останавливается, сессия маршрутизатора закрывается, ошибка не проглатывается"""
+    routers = []
+
+    class RecordingRouter(ClusterRouter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            routers.append(self)
+
+    monkeypatch.setattr(cluster, 'ClusterRouter', RecordingRouter)
+    application = LifecycleApplication()
+    with tempfile.TemporaryDirectory() as tmp, socket.socket() as busy:
+        busy.bind(('127.0.0.1', 0))
+        busy.listen()
+        with pytest.raises(OSError):
+            asyncio.run(cluster.serve_cluster(
+                application, nodes=['http://a:8090', 'http://b:8090'], node='http://a:8090', secret='s',
+                lock_path=os.path.join(tmp, 'lease.sqlite3'), listen='127.0.0.1', port=busy.getsockname()[1]
+            ))
+    assert application.calls == ['initialize', 'start', 'stop', 'shutdown']
+    assert routers[0]._session.closed
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from form_schema import LEAD_FORM, Field, FormSchema, validate_name, validate_phone
+
+
+def test_lead_form_keeps_stored_steps():
+    """Имена шагов прежние: анкеты, сохраненные до перехода на схему, продолжаются"""
+    assert LEAD_FORM.start_state() == {'step': 'waiting_name'}
+    assert LEAD_FORM.step({'step': 'waiting_phone', 'name': 'Анна'}).field.key == 'phone'
+    assert LEAD_FORM.step({}) is None
+
+
+def test_text_steps_validate_and_advance():
+    state = LEAD_FORM.start_state()
+    step = LEAD_FORM.step(state)
+    assert step.field.validate(' А ') is None
+    assert step.field.validate('\u200bА\x00\u202e') is None
+
+    following = LEAD_FORM.advance(state, step, step.field.validate('  Анна '))
+    assert state == {'step': 'waiting_phone', 'name': 'Анна'}
+    assert following is LEAD_FORM.step(state)
+
+    assert following.field.validate('123') is None
+    assert LEAD_FORM.advance(state, following, following.field.validate('8 (916) 123-45-67')) is None
+    assert state == {'name': 'Анна', 'phone': '+79161234567'}
+
+
+def test_choice_step_by_button_or_label():
+    form = FormSchema([
+        Field('name', 'ask_name', 'name_too_short', validate_name, label='Имя'),
+        Field('budget', 'ask_phone', 'phone_invalid', label='Бюджет',
+              choices=(('lt10', 'до 10 млн'), ('gt10', 'от 10 млн'))),
+        Field('phone', 'ask_phone', 'phone_invalid', validate_phone),
+    ])
+    budget = form.steps['waiting_budget']
+    assert form.steps['waiting_name'].next is budget
+    assert [row[0].callback_data for row in budget.markup.inline_keyboard] == ['form:1:0', 'form:1:1']
+    assert form.choice('form:1:1') == (budget, 'gt10')
+    assert form.choice('new_request') is None
+    assert budget.field.validate(' ОТ 10 МЛН ') == 'gt10'
+    assert budget.field.validate('миллиард') is None
+
+    state = {'step': 'waiting_budget', 'name': 'Анна'}
+    form.advance(state, budget, 'lt10')
+    assert form.extra_answers(state, skip=('name', 'phone')) == [('Бюджет', 'до 10 млн')]
+
+
+def test_schema_errors_at_startup():
+    with pytest.raises(ValueError):
+        FormSchema([Field('name', 'ask_name', 'no_such_text', validate_name)])
+    with pytest.raises(ValueError):
+        FormSchema([Field('a', 'ask_name', 'name_too_short', validate_name)] * 2)
+    with pytest.raises(ValueError):
+        Field('free_text', 'ask_name', 'name_too_short')
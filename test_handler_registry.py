@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+from functools import partial
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters
+
+from bot_config import BotConfig
+from handler_registry import HandlerRegistry
+from metrics import LEAD_FUNNEL, InstrumentedRequest
+from rate_limit import RATE_LIMIT_GROUP
+
+
+def _tagging(calls, tag):
+    def wrap(name, callback):
+        async def wrapper(update, context):
+            calls.append(f'{tag}:{name}')
+            return await callback(update, context)
+        return wrapper
+    return wrap
+
+
+def test_middleware_order_and_disabled_features():
+    """Первая обертка - внешняя; выключенные обертки и плагины не встраиваются вовсе"""
+    calls = []
+
+    async def start(update, context):
+        calls.append('start')
+        return 'ok'
+
+    registry = HandlerRegistry()
+    registry.middleware('outer', _tagging(calls, 'outer'))
+    registry.middleware('off', _tagging(calls, 'off'), enabled=False)
+    registry.middleware('inner', _tagging(calls, 'inner'))
+    registry.plugin('guard', lambda application: application.add_handler(
+        TypeHandler(Update, start), group=RATE_LIMIT_GROUP))
+    registry.plugin('off_plugin', lambda application: calls.append('installed'), enabled=False)
+    registry.handler('start', start, partial(CommandHandler, 'start'))
+    registry.handler('message', start, partial(MessageHandler, filters.TEXT))
+
+    assert asyncio.run(registry.wrap('start', start)(None, None)) == 'ok'
+    assert calls == ['outer:start', 'inner:start', 'start']
+    assert registry.features() == (['outer', 'inner', 'guard'], ['off', 'off_plugin'])
+
+    application = registry.install(Application.builder().token('1:x').build())
+    assert 'installed' not in calls
+    assert [type(handler) for handler in application.handlers[0]] == [CommandHandler, MessageHandler]
+    assert [type(handler) for handler in application.handlers[RATE_LIMIT_GROUP]] == [TypeHandler]
+
+    bare = HandlerRegistry()
+    bare.middleware('off', _tagging(calls, 'off'), enabled=False)
+    assert bare.wrap('start', start) is start
+
+    try:
+        registry.handler('start', start, partial(CommandHandler, 'start'))
+    except ValueError as e:
+        assert 'start' in str(e)
+    else:
+        raise AssertionError('повторное имя обработчика должно отклоняться')
+
+
+def test_bot_registry_follows_config():
+    """Метрики, трассировка и лимит флуда встраиваются только при включении в настройках"""
+    import telegram_bot_current as bot
+
+    off = BotConfig({'BOT_TOKEN': '1:x', 'RATE_LIMIT_USER_RATE': '0'})
+    defaults = bot.handler_registry(off)
+    assert defaults.features() == (['log_context'], ['metrics', 'tracing', 'rate_limit'])
+    # Без метрик и трассировки транспорт Bot API не оборачивается, а воронка не считается
+    request = object()
+    assert bot.instrument_request(off, request) is request
+    assert bot.funnel_counter(off) != LEAD_FUNNEL.inc
+
+    on = BotConfig({'BOT_TOKEN': '1:x', 'METRICS_PORT': '9100', 'TRACE_SAMPLE_RATE': '0.1'})
+    full = bot.handler_registry(on)
+    assert full.features() == (['log_context', 'metrics', 'tracing', 'rate_limit'], [])
+    assert isinstance(bot.instrument_request(on, request), InstrumentedRequest)
+    assert bot.funnel_counter(on) == LEAD_FUNNEL.inc
+    application = full.install(Application.builder().token('1:x').build())
+    assert len(application.handlers[0]) == 5 and len(application.handlers[RATE_LIMIT_GROUP]) == 1
+
+
+if __name__ == '__main__':
+    test_middleware_order_and_disabled_features()
+    test_bot_registry_follows_config()
+    print("✅ Тесты реестра обработчиков пройдены")
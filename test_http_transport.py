@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import http_transport
+from http_transport import create_request, resolve_http_version
+
+
+def test_http_version_resolution(monkeypatch):
+    """HTTP/2 включается только для https и только при установленном h2"""
+    monkeypatch.setattr(http_transport, 'http2_available', lambda: True)
+    assert resolve_http_version('auto', 'https://api.telegram.org/bot') == '2'
+    assert resolve_http_version('auto', 'http://127.0.0.1:8081/bot') == '1.1'
+    assert resolve_http_version('1.1', 'https://api.telegram.org/bot') == '1.1'
+
+    # h2c (HTTP/2 без TLS) Bot API не поддерживает: явный HTTP/2 для http:// откатывается на HTTP/1.1
+    assert resolve_http_version('2', 'http://127.0.0.1:8081/bot') == '1.1'
+    assert resolve_http_version('2', 'HTTPS://api.telegram.org/bot') == '2'
+
+    monkeypatch.setattr(http_transport, 'http2_available', lambda: False)
+    assert resolve_http_version('auto') == '1.1'
+    assert resolve_http_version('2') == '1.1'
+
+
+def test_separate_pools_for_sends_and_updates():
+    send = create_request('send', pool_size=32, keepalive=100, pool_timeout=2.5)._client_kwargs
+    updates_limits = create_request('updates')._client_kwargs['limits']
+    assert send['limits'].max_connections == 32
+    assert send['limits'].max_keepalive_connections == 32
+    assert updates_limits.max_connections == http_transport.UPDATES_POOL_SIZE
+    assert send['timeout'].pool == 2.5
+
+
+def test_pools_share_ssl_context():
+    """Корневые сертификаты загружаются один раз на процесс, а не на каждый пул"""
+    send = create_request('send')._client_kwargs['verify']
+    assert create_request('updates')._client_kwargs['verify'] is send
+    assert send.verify_mode.name == 'CERT_REQUIRED'
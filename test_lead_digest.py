@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+
+from fake_clock import FakeClock
+from lead_digest import DigestWorker, is_priority, pack_digest
+from lead_outbox import LeadOutbox
+from message_templates import ADMIN_DIGEST
+from notify_dispatcher import split_text, text_length
+
+
+def test_digest_respects_message_limit():
+    """Дайджест не длиннее лимита (эмодзи считаются по UTF-16), заявки не делятся и идут по порядку"""
+    texts = [f"🎊 Заявка {number}\n🌟 Имя: Иван\n📱 Телефон: +7 900 000-00-{number:02d}" for number in range(40)]
+    messages = pack_digest(texts, limit=300, header=ADMIN_DIGEST)
+    assert [index for indexes, _ in messages for index in indexes] == list(range(40))
+    for indexes, text in messages:
+        assert text_length(text) <= 300
+        assert text.startswith(ADMIN_DIGEST(count=len(indexes)))
+        assert all(texts[index] in text for index in indexes)
+    assert len(messages) < 40
+
+    # Заявка длиннее лимита идет отдельным сообщением, диспетчер режет его по строкам
+    long_text = '\n'.join(['📝 Комментарий: ' + 'очень ' * 30] * 10)
+    assert [indexes for indexes, _ in pack_digest(['короткая', long_text, 'еще'], limit=300)] == [[0], [1], [2]]
+    parts = split_text(long_text, limit=300)
+    assert all(0 < text_length(part) <= 300 for part in parts)
+    assert ''.join(parts).replace('\n', '') == long_text.replace('\n', '')
+    assert split_text('😀' * 200, limit=150) == ['😀' * 75, '😀' * 75, '😀' * 50]
+
+
+def test_digest_worker_batches_and_bypass():
+    """Обычные заявки ждут окна или набора, срочная уходит сразу, при остановке дайджест досылается"""
+    async def scenario(path):
+        clock = FakeClock()
+        outbox = LeadOutbox(path, clock=clock)
+        sent = []
+
+        async def deliver(payload):
+            sent.append(payload)
+
+        worker = DigestWorker(outbox, deliver, window=60, max_leads=5, header=ADMIN_DIGEST)
+        for number in range(3):
+            await outbox.enqueue({'text': f'заявка {number}'})
+        await worker.drain_once()
+        assert sent == [] and await outbox.pending_count() == 3
+
+        await outbox.enqueue({'text': 'срочная', 'priority': True})
+        await worker.drain_once()
+        assert sent == [{'text': 'срочная', 'priority': True}]
+        assert await outbox.pending_count() == 3
+
+        clock.now += 60
+        await worker.drain_once()
+        assert len(sent) == 2 and sent[1]['leads'] == 3
+        assert sent[1]['text'].startswith(ADMIN_DIGEST(count=3)) and 'заявка 2' in sent[1]['text']
+        assert await outbox.pending_count() == 0
+
+        # Набралось max_leads - отправка без ожидания окна
+        for number in range(5):
+            await outbox.enqueue({'text': f'пик {number}'})
+        await worker.drain_once()
+        assert sent[2]['leads'] == 5 and await outbox.pending_count() == 0
+
+        await outbox.enqueue({'text': 'последняя'})
+        assert await worker.drain(timeout=5) == 0
+        assert sent[3] == {'text': 'последняя'}
+        await outbox.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+
+
+def test_digest_worker_wakes_at_window_deadline():
+    """Воркер ждет до закрытия окна самой старой заявки, а не следующего опроса poll_interval"""
+    async def scenario(path):
+        clock = FakeClock()
+        outbox = LeadOutbox(path, clock=clock)
+        sent = []
+
+        async def deliver(payload):
+            sent.append(payload)
+
+        worker = DigestWorker(outbox, deliver, window=60, poll_interval=30)
+        assert worker.wait_timeout() == 30
+        await outbox.enqueue({'text': 'заявка'})
+        clock.now += 50
+        await worker.drain_once()
+        assert sent == [] and worker.wait_timeout() == 10
+        clock.now += 20
+        assert worker.wait_timeout() == 0
+
+        # Живой цикл: окно 0.2 с при опросе раз в 5 с
+        realtime = DigestWorker(LeadOutbox(':memory:'), deliver, window=0.2, poll_interval=5)
+        await realtime.outbox.enqueue({'text': 'в окне'})
+        task = asyncio.create_task(realtime.run())
+        try:
+            for _ in range(100):
+                if {'text': 'в окне'} in sent:
+                    break
+                await asyncio.sleep(0.02)
+            assert {'text': 'в окне'} in sent
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await realtime.outbox.close()
+        await outbox.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+
+
+def test_is_priority():
+    rules = {'budget': {'gt10'}}
+    assert is_priority({'name': 'Иван', 'budget': 'gt10'}, rules)
+    assert not is_priority({'name': 'Иван', 'budget': 'lt10'}, rules)
+    assert not is_priority({'name': 'Иван'}, {})
+
+
+if __name__ == '__main__':
+    test_digest_respects_message_limit()
+    test_digest_worker_batches_and_bypass()
+    test_digest_worker_wakes_at_window_deadline()
+    test_is_priority()
+    print("✅ Тесты дайджеста заявок пройдены")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+
+from fake_clock import FakeClock
+from lead_index import LeadIndex
+
+
+def test_repeat_phone_is_merged_within_window():
+    """Тот же телефон (и от другого пользователя) в окне - повтор; после окна - новая заявка"""
+    async def scenario():
+        clock = FakeClock()
+        index = LeadIndex(':memory:', window=60, clock=clock)
+        assert await index.register(1, '+79161234567') is None
+
+        clock.now += 10
+        match = await index.register(1, '+79161234567')
+        assert match.matched_by == 'phone'
+        assert match.record.first_seen == 1000.0
+        match = await index.register(2, '+79161234567')
+        assert match.record.repeats == 1
+        assert index.lookup(1, '+79161234567').record.repeats == 2
+
+        clock.now += 60
+        assert await index.register(1, '+79161234567') is None
+        await index.close()
+
+    asyncio.run(scenario())
+
+
+def test_same_user_new_phone_is_annotated():
+    """Новый телефон того же пользователя - отдельная заявка с совпадением по user"""
+    async def scenario():
+        index = LeadIndex(':memory:', window=60, clock=FakeClock())
+        await index.register(1, '+79161234567')
+        match = await index.register(1, '+79167654321')
+        assert match.matched_by == 'user'
+        assert match.record.phone == '+79161234567'
+        assert index.lookup(1, '+79167654321').matched_by == 'phone'
+        assert len(index) == 2
+        await index.close()
+
+    asyncio.run(scenario())
+
+
+def test_window_restored_after_restart_and_evicted():
+    async def scenario():
+        clock = FakeClock()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.sqlite3')
+            index = LeadIndex(path, window=60, clock=clock)
+            await index.register(1, '+79161234567')
+            clock.now += 30
+            await index.register(2, '+79160000000')
+            await index.register(2, '+79160000000')
+            await index.close()
+
+            index = LeadIndex(path, window=60, clock=clock)
+            assert len(index) == 2
+            assert index.lookup(3, '+79160000000').record.repeats == 1
+
+            clock.now += 31
+            assert await index.evict_expired() == 1
+            assert index.lookup(1, '+79161234567') is None
+            # Вместе с окном в памяти чистится и таблица: она не растет бесконечно
+            assert index._execute('SELECT COUNT(*) FROM leads_seen', ()).fetchone() == (1,)
+            assert await index.evict_expired(keep=0) == 0
+            await index.close()
+
+            index = LeadIndex(path, window=3600, clock=clock)
+            assert len(index) == 0
+            await index.close()
+
+    asyncio.run(scenario())
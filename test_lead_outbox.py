@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+
+from telegram.error import NetworkError, RetryAfter
+
+from fake_clock import FakeClock
+from lead_outbox import LeadOutbox, OutboxWorker
+
+
+def test_outbox_retries_until_delivered():
+    """Заявка не теряется при ошибках доставки и уходит после повторов"""
+    async def scenario(path):
+        clock = FakeClock()
+        outbox = LeadOutbox(path, clock=clock)
+        errors = [RetryAfter(0), NetworkError('нет сети')]
+        delivered = []
+
+        async def deliver(payload):
+            if errors:
+                raise errors.pop(0)
+            delivered.append(payload)
+
+        worker = OutboxWorker(outbox, deliver, base_delay=10)
+        await outbox.enqueue({'text': 'заявка', 'chat_id': 5})
+
+        await worker.drain_once()  # RetryAfter: попытка не засчитывается
+        assert (await outbox.due())[0]['attempts'] == 0
+
+        await worker.drain_once()  # Сетевая ошибка: повтор через backoff
+        assert await outbox.due() == []
+        assert await outbox.pending_count() == 1
+
+        clock.now += worker.backoff(1)
+        await worker.drain_once()
+        assert delivered == [{'text': 'заявка', 'chat_id': 5}]
+        assert await outbox.pending_count() == 0
+        await outbox.close()
+
+        # Доставленные заявки не отправляются повторно после перезапуска
+        outbox = LeadOutbox(path, clock=clock)
+        assert await outbox.due() == []
+        await outbox.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+
+
+def test_claim_is_exclusive_between_replicas():
+    """Две реплики с общим outbox не берут одну заявку; остановленный воркер возвращает свои"""
+    async def scenario(path):
+        clock = FakeClock()
+        first = LeadOutbox(path, clock=clock)
+        second = LeadOutbox(path, clock=clock)
+        for number in range(3):
+            await first.enqueue({'text': f'заявка {number}'})
+
+        claimed = await first.claim(limit=2, lease=60)
+        assert len(claimed) == 2
+        assert [lead['payload']['text'] for lead in await second.claim(lease=60)] == ['заявка 2']
+        assert await second.claim() == []
+
+        await first.release([claimed[1]['id']])
+        assert [lead['id'] for lead in await second.claim()] == [claimed[1]['id']]
+        clock.now += 60  # реплика упала, не отметив заявку: захват истек
+        assert [lead['id'] for lead in await second.claim()][0] == claimed[0]['id']
+        await first.close()
+        await second.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+
+
+def test_drain_on_shutdown_is_bounded():
+    """При остановке готовые заявки уходят, а зависшая доставка не держит процесс дольше срока"""
+    async def scenario(path):
+        outbox = LeadOutbox(path)
+        delivered = []
+
+        async def deliver(payload):
+            if payload['text'] == 'зависла':
+                await asyncio.sleep(60)
+            delivered.append(payload['text'])
+
+        worker = OutboxWorker(outbox, deliver, batch_size=1)
+        for text in ('первая', 'вторая'):
+            await outbox.enqueue({'text': text})
+        assert await worker.drain(timeout=5) == 0
+        assert delivered == ['первая', 'вторая']
+
+        await outbox.enqueue({'text': 'зависла'})
+        assert await worker.drain(timeout=0.1) == 1
+        assert [lead['payload']['text'] for lead in await outbox.claim()] == ['зависла']
+        await outbox.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+
+
+if __name__ == '__main__':
+    test_outbox_retries_until_delivered()
+    test_claim_is_exclusive_between_replicas()
+    test_drain_on_shutdown_is_bounded()
+    print("✅ Тесты outbox пройдены")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import csv
+import io
+import json
+
+from lead_store import LeadStore, write_csv, write_jsonl
+
+
+async def _filled_store():
+    store = LeadStore(':memory:')
+    for day in range(10):
+        await store.add(
+            1_700_000_000 + day * 86400, 100 + day, 100 + day, f'Имя {day}', f'+7916000000{day}',
+            username=f'user{day}', full_name=f'User {day}', duplicate=day == 9
+        )
+    return store
+
+
+def test_date_range_uses_created_at_index():
+    """since включительно, until нет; фильтр идет по индексу, а не полным сканом"""
+    async def scenario():
+        store = await _filled_store()
+        since, until = 1_700_000_000 + 2 * 86400, 1_700_000_000 + 5 * 86400
+        leads = list(store.iter_leads(since=since, until=until, batch_size=2))
+        assert [lead.name for lead in leads] == ['Имя 2', 'Имя 3', 'Имя 4']
+        assert any('leads_created_at' in step for step in store.query_plan(since, until))
+        assert len(list(store.iter_leads())) == 10
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_streaming_export_formats():
+    async def scenario():
+        store = await _filled_store()
+        leads = store.iter_leads(since=1_700_000_000 + 8 * 86400)
+        assert not isinstance(leads, list)
+
+        stream = io.StringIO()
+        assert write_csv(leads, stream) == 2
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        assert rows[0]['phone'] == '+79160000008'
+        assert rows[0]['created_at'].startswith('2023-11-22T')
+        assert rows[1]['duplicate'] == 'True'
+
+        stream = io.StringIO()
+        assert write_jsonl(store.iter_leads(until=1_700_000_000 + 1), stream) == 1
+        row = json.loads(stream.getvalue().splitlines()[0])
+        assert row['name'] == 'Имя 0'
+        assert row['duplicate'] is False
+        await store.close()
+
+    asyncio.run(scenario())
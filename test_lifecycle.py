@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+import pytest
+from telegram import Update
+from telegram.error import NetworkError
+from telegram.ext import Application, MessageHandler, filters
+
+from fake_application import LifecycleApplication
+from lifecycle import notify_ready, notify_stopping, serve_polling, stop_application, time_left
+from test_update_processor import FakeRequest, _update
+from update_processor import PerUserUpdateProcessor
+
+
+def test_stop_waits_for_handlers_then_cancels_hung_ones():
+    """Быстрые обработчики дорабатывают, зависший отменяется по сроку, затем вызывается post_stop"""
+    async def scenario():
+        calls = []
+
+        async def post_stop(application):
+            calls.append(('post_stop', round(time_left(application, 99), 1)))
+
+        async def post_shutdown(application):
+            calls.append(('post_shutdown', None))
+
+        application = (
+            Application.builder().token('123:test').request(FakeRequest())
+            .concurrent_updates(PerUserUpdateProcessor(4))
+            .post_stop(post_stop).post_shutdown(post_shutdown)
+            .build()
+        )
+        finished = []
+
+        async def handler(update, context):
+            if update.message.text == 'hang':
+                await asyncio.sleep(60)
+            await asyncio.sleep(0.05)
+            finished.append(update.message.text)
+
+        application.add_handler(MessageHandler(filters.TEXT, handler))
+        await application.initialize()
+        await application.start()
+        for user_id, text in ((1, 'hang'), (2, 'slow'), (3, 'slow')):
+            await application.update_queue.put(Update.de_json(_update(user_id, user_id, text), application.bot))
+        await asyncio.sleep(0.01)
+
+        started = time.monotonic()
+        await stop_application(application, timeout=0.3)
+        assert 0.3 <= time.monotonic() - started < 2
+        assert finished == ['slow', 'slow']
+        assert application.update_processor.in_flight == 0
+        assert calls[0][0] == 'post_stop' and calls[0][1] < 0.1
+        assert calls[1] == ('post_shutdown', None)
+        assert not application.running
+
+    asyncio.run(scenario())
+
+
+def test_ready_notification():
+    """READY=1 уходит в NOTIFY_SOCKET systemd, файл готовности живет до остановки"""
+    with tempfile.TemporaryDirectory() as tmp:
+        address = os.path.join(tmp, 'notify')
+        ready_file = os.path.join(tmp, 'ready')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as server:
+            server.bind(address)
+            server.settimeout(1)
+            os.environ['NOTIFY_SOCKET'] = address
+            try:
+                notify_ready(ready_file)
+                assert server.recv(256).decode().split('\n')[0] == 'READY=1'
+                assert open(ready_file).read() == str(os.getpid())
+                notify_stopping(ready_file)
+                assert server.recv(256) == b'STOPPING=1'
+                assert not os.path.exists(ready_file)
+            finally:
+                del os.environ['NOTIFY_SOCKET']
+
+
+
+async def _unreachable(*args, **kwargs):
+    raise NetworkError('Bot API недоступен')
+
+
+class FailingUpdater:
+    running = False
+    start_polling = staticmethod(_unreachable)
+
+
+def test_failed_polling_start_stops_application():
+    """start_polling упал: запущенное приложение останавливается, ошибка не проглатывается"""
+    application = LifecycleApplication()
+    application.updater = FailingUpdater()
+    with pytest.raises(NetworkError):
+        asyncio.run(serve_polling(application))
+    assert application.calls == ['initialize', 'start', 'stop', 'shutdown']
+
+    # initialize упал: останавливать нечего, но shutdown (и post_shutdown) выполняется
+    application = LifecycleApplication()
+    application.updater = FailingUpdater()
+    application.initialize = _unreachable
+    with pytest.raises(NetworkError):
+        asyncio.run(serve_polling(application))
+    assert application.calls == ['shutdown']
+
+
+if __name__ == '__main__':
+    test_stop_waits_for_handlers_then_cancels_hung_ones()
+    test_ready_notification()
+    test_failed_polling_start_stops_application()
+    print("✅ Тесты остановки пройдены")
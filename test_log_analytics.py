@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import tempfile
+import time
+
+from log_analytics import analyze_file, analyze_paths
+from log_setup import JsonFormatter
+
+BOT = 'telegram_bot_current'
+
+
+def _line(time, name, level, message):
+    return f"2024-06-01 {time},123 - {name} - {level} - {message}\n"
+
+
+def _json_line(line):
+    """Та же запись в формате LOG_FORMAT=json"""
+    stamp, name, level, message = line[:-1].split(' - ', 3)
+    record = logging.LogRecord(name, getattr(logging, level), __file__, 0, message, None, None)
+    record.created = time.mktime(time.strptime(stamp[:19], '%Y-%m-%d %H:%M:%S'))
+    record.msecs = 123
+    record.context = {'update_id': 7, 'user_id': 1, 'handler': 'message'}
+    return JsonFormatter().format(record) + '\n'
+
+
+def _lead_flow(hour, user_id, phone_error=False):
+    lines = [
+        _line(f'{hour}:00:01', 'updates', 'INFO', f'🚀 Команда /start от пользователя {user_id} (@u (U)), Chat ID: {user_id}'),
+        _line(f'{hour}:00:02', 'updates', 'INFO', f"🔘 Нажата кнопка 'new_request' пользователем {user_id} (@u (U))"),
+        _line(f'{hour}:00:03', 'updates', 'INFO', f"📨 Сообщение от {user_id} (@u (U)): 'Анна...'"),
+        _line(f'{hour}:00:03', 'updates', 'INFO', f"✅ Имя получено от пользователя {user_id}: 'Анна'"),
+        _line(f'{hour}:00:04', 'updates', 'INFO', f"📨 Сообщение от {user_id} (@u (U)): '+79161234567...'"),
+        _line(f'{hour}:00:04', 'updates', 'INFO', f"📋 Новая заявка от {user_id}: Имя='Анна', Телефон='+7 (916) 123-45-67'"),
+        _line(f'{hour}:00:05', BOT, 'INFO', '✅ Заявка отправлена в чаты: [1]'),
+    ]
+    if phone_error:
+        lines.append(_line(f'{hour}:00:05', BOT, 'ERROR', '❌ Ошибка отправки подтверждения: Timed out'))
+    return lines
+
+
+def test_funnel_errors_and_hours_across_rotated_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        current = _lead_flow('12', 1) + _lead_flow('12', 2, phone_error=True) + [
+            _line('12:30:00', BOT, 'ERROR', 'Exception while handling an update: boom'),
+            _line('12:30:00', 'errors', 'ERROR', 'Exception while handling an update: boom\nUpdate: None\nTraceback: ...'),
+            _line('12:31:00', 'updates', 'INFO', '🚀 Команда /start от пользователя 3 (@u (U)), Chat ID: 3'),
+            _line('12:40:00', BOT, 'INFO', '✅ Заявок отправлено дайджестом: 12, чаты: [1, 2]'),
+        ]
+        rotated = _lead_flow('09', 4) + [_line('09:10:00', 'httpx', 'ERROR', 'something else')]
+        for name, lines in (('bot.log', current), ('bot.log.1', rotated), ('bot_errors.log', rotated)):
+            with open(os.path.join(tmp, name), 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+        open(os.path.join(tmp, 'bot.log.2'), 'w').close()
+
+        total = analyze_paths([tmp])
+        assert total['files'] == 3
+        assert dict(total['funnel']) == {
+            'start': 4, 'form': 3, 'name': 3, 'phone': 3, 'duplicate': 0, 'delivered': 3 + 12
+        }
+        assert dict(total['errors']) == {'message': 1, 'unhandled': 1, 'other': 1}
+        assert total['calls']['message'] == 6
+        assert dict(total['leads_by_hour']) == {'2024-06-01 12': 2, '2024-06-01 09': 1}
+
+        assert analyze_paths([tmp], jobs=2) == total
+
+
+def test_chunk_boundaries_do_not_split_lines():
+    """Маленький блок чтения дает тот же результат, что и файл целиком"""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.log', delete=False) as file:
+        for user_id in range(50):
+            file.writelines(_lead_flow(f'{10 + user_id % 3}', user_id, phone_error=user_id % 7 == 0))
+    try:
+        assert analyze_file(file.name, chunk_size=97) == analyze_file(file.name)
+    finally:
+        os.unlink(file.name)
+
+
+def test_json_lines_count_like_text():
+    """JSON-логи (и файл, где формат сменился посередине) дают те же счетчики, что и текстовые"""
+    lines = _lead_flow('12', 1) + _lead_flow('13', 2, phone_error=True) + [
+        _line('13:30:00', BOT, 'ERROR', 'Exception while handling an update: boom'),
+        _line('13:30:00', 'errors', 'ERROR', 'Exception while handling an update: boom\nUpdate: None'),
+        _line('13:40:00', BOT, 'INFO', '✅ Заявок отправлено дайджестом: 3, чаты: [1]'),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for kind, converted in (('text', lines), ('json', [_json_line(line) for line in lines]),
+                                ('mixed', [_json_line(line) if i % 2 else line for i, line in enumerate(lines)])):
+            paths[kind] = os.path.join(tmp, f'{kind}.log')
+            with open(paths[kind], 'w', encoding='utf-8') as file:
+                file.writelines(converted)
+        results = {kind: analyze_file(path, chunk_size=101) for kind, path in paths.items()}
+
+    for key in ('funnel', 'calls', 'errors', 'leads_by_hour'):
+        assert results['json'][key] == results['text'][key] == results['mixed'][key], key
+    assert dict(results['json']['errors']) == {'message': 1, 'unhandled': 1}
+    assert results['json']['funnel']['delivered'] == 2 + 3
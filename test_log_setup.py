@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+from log_setup import UPDATES_LOGGER, bind_context, log_context, reset_context, setup_logging
+
+
+class Probe:
+    """Аргумент лога, который считает, сколько раз его превращали в строку"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'probe'
+
+
+def _with_logging(scenario, **kwargs):
+    root, updates = logging.getLogger(), logging.getLogger(UPDATES_LOGGER)
+    saved_handlers, saved_level, saved_filters = root.handlers[:], root.level, updates.filters[:]
+    with tempfile.TemporaryDirectory() as logs_dir:
+        listener = setup_logging(logs_dir, stream=None, **kwargs)
+        try:
+            scenario()
+        finally:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+            updates.filters[:] = saved_filters
+        with open(os.path.join(logs_dir, 'bot.log'), encoding='utf-8') as file:
+            return file.read().splitlines()
+
+
+def test_json_lines_with_task_context():
+    """Каждая задача пишет со своим update_id/user_id, контекст не протекает между задачами"""
+    logger = logging.getLogger(UPDATES_LOGGER)
+    changing = {'step': 'waiting_name'}
+
+    async def handle(update_id):
+        token = bind_context(update_id=update_id, user_id=update_id * 10)
+        try:
+            bind_context(handler='message')
+            await asyncio.sleep(0)
+            logger.info("📨 Сообщение от %s: '%.5s...'", update_id * 10, 'длинный текст')
+        finally:
+            reset_context(token)
+
+    def scenario():
+        async def run():
+            await asyncio.gather(*(handle(update_id) for update_id in (1, 2, 3)))
+        asyncio.run(run())
+        assert log_context() == {}
+        logger.info("Состояние %s", changing)
+        changing['step'] = 'waiting_phone'  # в лог попадает значение на момент вызова
+
+    lines = [json.loads(line) for line in _with_logging(scenario, style='json', level='INFO')]
+    by_update = {entry['update_id']: entry for entry in lines if 'update_id' in entry}
+    assert sorted(by_update) == [1, 2, 3]
+    for update_id, entry in by_update.items():
+        assert entry['user_id'] == update_id * 10 and entry['handler'] == 'message'
+        assert entry['msg'] == f"📨 Сообщение от {update_id * 10}: 'длинн...'"
+        assert entry['level'] == 'INFO' and entry['logger'] == UPDATES_LOGGER
+    assert lines[-1]['msg'] == "Состояние {'step': 'waiting_name'}" and 'update_id' not in lines[-1]
+
+
+def test_dropped_records_are_not_formatted():
+    """Запись ниже уровня или отброшенная сэмплированием не собирает строку"""
+    probe = Probe()
+
+    def scenario():
+        logging.getLogger(UPDATES_LOGGER).info("%s", probe)
+        token = bind_context(update_id=5)
+        logging.getLogger(UPDATES_LOGGER).warning("⚠️ %s", probe)
+        reset_context(token)
+
+    lines = _with_logging(scenario, level='WARNING')
+    assert probe.calls == 1
+    assert lines == [line for line in lines if line.endswith('⚠️ probe [update_id=5]')] and len(lines) == 1
+
+    probe.calls = 0
+    assert _with_logging(lambda: logging.getLogger(UPDATES_LOGGER).info("%s", probe), sample_rate=0.0) == []
+    assert probe.calls == 0
+
+
+if __name__ == '__main__':
+    test_json_lines_with_task_context()
+    test_dropped_records_are_not_formatted()
+    print("✅ Тесты логирования пройдены")
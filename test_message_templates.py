@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from string import Formatter
+
+import pytest
+from telegram import User
+
+from message_templates import ADMIN_LEAD, LOCALES, TEMPLATE_FIELDS, TemplateRegistry, preformat
+
+
+def test_all_locales_have_all_fields():
+    for locale, texts in LOCALES.items():
+        assert set(texts) == set(TEMPLATE_FIELDS), locale
+
+
+def test_locale_selection_and_slots():
+    """Язык берется из профиля пользователя, неизвестный - язык по умолчанию"""
+    registry = TemplateRegistry(locales=('ru', 'en'), default='ru')
+    english = User(id=1, first_name='Ann', is_bot=False, language_code='en')
+    german = User(id=2, first_name='Hans', is_bot=False, language_code='de')
+
+    assert registry.for_user(english).locale == 'en'
+    assert registry.for_user(german).locale == 'ru'
+    assert registry.for_user(None) is registry.default
+    assert registry.get('en').start_markup.inline_keyboard[0][0].callback_data == 'new_request'
+
+    t = registry.get('ru')
+    assert '`42`' in t.help(chat_id=42)
+    assert 'Анна' in t.confirmation(name='Анна', phone='+7 (916) 123-45-67')
+    assert '@anna' in ADMIN_LEAD(
+        name='Анна', phone='+79161234567', user_id=1, username='anna',
+        full_name='Анна', chat_id=1, time='01.01.2025 10:00:00'
+    )
+
+
+def test_preformat_matches_str_format():
+    """Скомпилированный шаблон дает ровно то же, что str.format; текст без слотов остается строкой"""
+    for texts in LOCALES.values():
+        for text in texts.values():
+            values = {field: f'<{field}_{{x}}\\>' for _, field, _, _ in Formatter().parse(text) if field}
+            template = preformat(text)
+            assert (template(**values) if values else template) == text.format(**values)
+    assert preformat('{{literal}} {name}')(name='x') == '{literal} x'
+    for bad in ('{0}', '{name!r}', '{name:>10}', '{user.id}'):
+        with pytest.raises(ValueError):
+            preformat(bad)
+
+
+def test_only_enabled_locales_are_used():
+    registry = TemplateRegistry(locales=('ru',), default='ru')
+    assert registry.get('en').locale == 'ru'
+
+
+if __name__ == '__main__':
+    test_all_locales_have_all_fields()
+    test_locale_selection_and_slots()
+    test_preformat_matches_str_format()
+    test_only_enabled_locales_are_used()
+    print("✅ Тесты шаблонов пройдены")
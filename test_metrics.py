@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from metrics import HANDLER_ERRORS, HANDLER_REQUESTS, MetricsRegistry, instrument_handler
+
+
+def test_histogram_render_is_cumulative():
+    """Корзины гистограммы выводятся накопительно, как требует формат Prometheus"""
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Задержка', ('handler',), buckets=(0.1, 1.0))
+    requests = registry.counter('requests_total', 'Запросы', ('handler',))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, 'start')
+        requests.inc('start')
+
+    text = registry.render()
+    assert 'requests_total{handler="start"} 3' in text
+    assert 'latency_seconds_bucket{handler="start",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{handler="start",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{handler="start",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{handler="start"} 3' in text
+
+
+def test_instrument_handler_counts_errors():
+    """Исключение обработчика учитывается в счетчике ошибок и пробрасывается дальше"""
+    async def broken(update, context):
+        raise RuntimeError('сбой')
+
+    handler = instrument_handler('test_broken', broken)
+    try:
+        asyncio.run(handler(None, None))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('исключение должно пробрасываться')
+    assert HANDLER_REQUESTS.value('test_broken') == 1
+    assert HANDLER_ERRORS.value('test_broken') == 1
+
+
+if __name__ == '__main__':
+    test_histogram_render_is_cumulative()
+    test_instrument_handler_counts_errors()
+    print("✅ Тесты метрик пройдены")
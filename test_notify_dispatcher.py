@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+from notify_dispatcher import NotificationDispatcher, TokenBucket, parse_chat_ids
+
+
+class FakeBot:
+    """Бот, у которого чат 2 отвечает слишком долго, а чат 3 всегда с ошибкой"""
+
+    def __init__(self):
+        self.sent = []
+        self.active = 0
+        self.max_active = 0
+
+    async def send_message(self, chat_id, text):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(1.0 if chat_id == 2 else 0.01)
+            if chat_id == 3:
+                raise RuntimeError('chat not found')
+            self.sent.append(chat_id)
+        finally:
+            self.active -= 1
+
+
+def test_slow_chat_does_not_block_others():
+    """Медленный чат отваливается по таймауту, остальные получают сообщение параллельно"""
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(bot, max_concurrency=2, timeout=0.2, chat_rate=100)
+        started = time.perf_counter()
+        results = await dispatcher.send([1, 2, 3, 4, 5], 'заявка')
+        elapsed = time.perf_counter() - started
+
+        assert [result.chat_id for result in results] == [1, 2, 3, 4, 5]
+        assert [result.ok for result in results] == [True, False, False, True, True]
+        assert isinstance(results[1].error, TimeoutError)
+        assert sorted(bot.sent) == [1, 4, 5]
+        assert bot.max_active <= 2
+        assert elapsed < 0.5
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_spacing():
+    """После исчерпания запаса токены выдаются с интервалом 1/rate"""
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=lambda: now[0])
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    now[0] = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_parse_chat_ids():
+    assert parse_chat_ids('123', ' -100456, 123,abc,', None) == [123, -100456]
+
+
+if __name__ == '__main__':
+    test_slow_chat_does_not_block_others()
+    test_token_bucket_spacing()
+    test_parse_chat_ids()
+    print("✅ Тесты рассылки пройдены")
@@ -1,64 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import re
-
-def clean_phone(phone_str):
-    """Очистка номера телефона от лишних символов"""
-    return re.sub(r'[^\d+]', '', phone_str)
-
-def is_valid_phone(phone):
-    """Проверка корректности номера телефона"""
-    # Убираем + в начале для проверки
-    digits_only = phone.lstrip('+')
-    
-    # Проверяем что содержит только цифры
-    if not digits_only.isdigit():
-        return False
-    
-    # Минимальная длина для международных номеров - 7 цифр
-    # Максимальная длина - 15 цифр (международный стандарт E.164)
-    if len(digits_only) < 7 or len(digits_only) > 15:
-        return False
-    
-    # Российские номера - строгая проверка
-    if phone.startswith('+7'):
-        return len(digits_only) == 11
-    elif phone.startswith('8'):
-        return len(digits_only) == 11
-    elif phone.startswith('7') and not phone.startswith('+'):
-        return len(digits_only) == 11
-    elif len(digits_only) == 10 and digits_only.startswith('9'):  # российский мобильный без кода
-        return True
-    
-    # Международные номера с + в начале
-    elif phone.startswith('+') and len(digits_only) >= 7:
-        return True
-    
-    # Номера без + но с международным кодом (начинается не с 7, 8, 9)
-    elif len(digits_only) >= 10 and not digits_only.startswith(('7', '8', '9')):
-        return True
-    
-    return False
-
-def format_phone(phone):
-    """Форматирование номера телефона"""
-    digits_only = clean_phone(phone).lstrip('+')
-    
-    # Конвертируем 8 в 7
-    if digits_only.startswith('8') and len(digits_only) == 11:
-        digits_only = '7' + digits_only[1:]
-    
-    # Добавляем код страны для мобильных номеров
-    elif len(digits_only) == 10 and digits_only.startswith('9'):
-        digits_only = '7' + digits_only
-    
-    # Форматируем только если 11 цифр и начинается с 7
-    if len(digits_only) == 11 and digits_only.startswith('7'):
-        return f"+7 ({digits_only[1:4]}) {digits_only[4:7]}-{digits_only[7:9]}-{digits_only[9:11]}"
-    
-    # Возвращаем исходный номер если не удалось отформатировать
-    return phone
+from phone_utils import clean_phone, format_phone, is_valid_phone, normalize_many, normalize_phone
 
 def test_phone_validation():
     """Тестирование валидации номеров телефона"""
@@ -97,6 +40,7 @@ def test_phone_validation():
     print("Результаты тестирования:")
     print("-" * 80)
     
+    failures = []
     for phone, expected, description in test_cases:
         cleaned = clean_phone(phone)
         is_valid = is_valid_phone(cleaned)
@@ -107,6 +51,8 @@ def test_phone_validation():
             formatted = "❌ Некорректный"
         
         status = "✅" if is_valid == expected else "❌"
+        if is_valid != expected:
+            failures.append(description)
         
         print(f"{status} {description}")
         print(f"   Входной:     '{phone}'")
@@ -115,7 +61,24 @@ def test_phone_validation():
         print(f"   Ожидаемый:   {expected}")
         print(f"   Форматированный: {formatted}")
         print()
+    
+    assert not failures, f"Неверная валидация: {failures}"
+
+def test_phone_formatting():
+    """Тестирование форматирования: E.164 и отображение +7 (XXX) XXX-XX-XX"""
+    for phone in ("+7 916 123 45 67", "8 (916) 123-45-67", "79161234567", "9161234567"):
+        assert normalize_phone(phone) == ('+79161234567', '+7 (916) 123-45-67'), phone
+        assert format_phone(phone) == '+7 (916) 123-45-67'
+    
+    assert normalize_phone("+380 67 123 45 67") == ('+380671234567', '+380671234567')
+    assert normalize_phone("12345678901").e164 == '+12345678901'
+    assert normalize_phone("+7 916 386 33 0") is None
+    
+    phones = ["+44 20 7946 0958", "abc", "8 916 123 45 67"]
+    assert [n and n.e164 for n in normalize_many(phones)] == ['+442079460958', None, '+79161234567']
 
 if __name__ == '__main__':
-    test_phone_validation() 
+    test_phone_validation()
+    test_phone_formatting()
+
  
\ No newline at end of file
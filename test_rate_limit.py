@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+
+from fake_clock import FakeClock
+from metrics import RATE_LIMITED
+from rate_limit import RateLimiter, rate_limit_handler
+
+
+def test_user_burst_then_drop():
+    """Запас burst проходит сразу, дальше сообщения отбрасываются; другие пользователи не страдают"""
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1, user_burst=3, global_rate=0, clock=clock)
+    assert [limiter.check(1) for _ in range(4)] == [('user', 0.0)] * 3 + [('user', None)]
+    assert limiter.check(2) == ('user', 0.0)
+    clock.now += 1
+    assert limiter.check(1) == ('user', 0.0)
+
+
+def test_short_wait_is_delayed_instead_of_dropped():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=2, user_burst=1, global_rate=0, max_delay=0.5, clock=clock)
+    assert limiter.check(1) == ('user', 0.0)
+    assert limiter.check(1) == ('user', 0.5)
+    assert limiter.check(1) == ('user', None)
+
+
+def test_global_bucket_limits_bot_farm():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1, user_burst=5, global_rate=10, global_burst=3, clock=clock)
+    assert [limiter.check(user_id)[1] for user_id in range(4)] == [0.0, 0.0, 0.0, None]
+    assert limiter.check(99) == ('global', None)
+
+
+def test_global_drop_keeps_user_token():
+    """Отказ общего лимита не списывает токен пользователя"""
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=0.1, user_burst=1, global_rate=1, global_burst=1, clock=clock)
+    assert limiter.check(1) == ('user', 0.0)
+    assert limiter.check(2) == ('global', None)
+    clock.now += 1
+    assert limiter.check(2) == ('user', 0.0)
+
+
+def test_memory_is_bounded():
+    """Корзины простаивающих пользователей удаляются, число корзин ограничено max_users"""
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1, user_burst=5, global_rate=0, max_users=100, clock=clock)
+    for user_id in range(1000):
+        limiter.check(user_id)
+    assert len(limiter) == 100
+
+    clock.now += 5
+    limiter.check('fresh')
+    assert len(limiter) == 1
+
+
+def test_dropped_update_stops_handlers():
+    """Отброшенное обновление останавливает обработку до анкеты и увеличивает счетчик"""
+    handler = rate_limit_handler(RateLimiter(user_rate=1, user_burst=1, global_rate=0, clock=FakeClock()))
+    update = Update.de_json({
+        'update_id': 1,
+        'message': {
+            'message_id': 1, 'date': 0, 'text': 'spam',
+            'chat': {'id': 5, 'type': 'private'},
+            'from': {'id': 5, 'is_bot': False, 'first_name': 'Spammer'},
+        },
+    }, None)
+    before = RATE_LIMITED.value('user', 'dropped')
+
+    async def scenario():
+        await handler.callback(update, None)
+        with pytest.raises(ApplicationHandlerStop):
+            await handler.callback(update, None)
+
+    asyncio.run(scenario())
+    assert RATE_LIMITED.value('user', 'dropped') == before + 1
+
+
+class AnsweringBot:
+    def __init__(self):
+        self.answered = []
+
+    async def answer_callback_query(self, callback_query_id, **kwargs):
+        self.answered.append(callback_query_id)
+
+
+def test_dropped_button_press_is_silent():
+    """Флуд нажатиями не превращается в запросы к Bot API: отброшенное нажатие остается без ответа"""
+    bot = AnsweringBot()
+    handler = rate_limit_handler(RateLimiter(user_rate=1, user_burst=1, global_rate=0, clock=FakeClock()))
+    user = {'id': 5, 'is_bot': False, 'first_name': 'Spammer'}
+    updates = [Update.de_json({
+        'update_id': number,
+        'callback_query': {'id': str(number), 'from': user, 'chat_instance': '1', 'data': 'new_request'},
+    }, bot) for number in (1, 2)]
+
+    async def scenario():
+        await handler.callback(updates[0], None)
+        with pytest.raises(ApplicationHandlerStop):
+            await handler.callback(updates[1], None)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert bot.answered == []
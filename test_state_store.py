@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import tempfile
+
+from fake_clock import FakeClock
+from state_store import MemoryStateStore, SqliteStateStore
+
+
+def test_memory_store_lru_and_ttl():
+    """LRU ограничивает размер, TTL удаляет брошенные анкеты"""
+    async def scenario():
+        clock = FakeClock()
+        store = MemoryStateStore(ttl=60, max_users=2, clock=clock)
+        await store.set(1, {'step': 'waiting_name'})
+        await store.set(2, {'step': 'waiting_phone', 'name': 'Анна'})
+        assert await store.get(1) == {'step': 'waiting_name'}  # 1 становится свежее 2
+
+        await store.set(3, {'step': 'waiting_name'})
+        assert len(store) == 2
+        assert await store.get(2) is None
+
+        clock.now += 61
+        assert await store.evict_expired() == 2
+        assert len(store) == 0
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_store_survives_restart():
+    """Состояние из SQLite доступно после переоткрытия, устаревшее вытесняется"""
+    async def scenario(path):
+        clock = FakeClock()
+        store = SqliteStateStore(path, ttl=60, clock=clock)
+        await store.set(1, {'step': 'waiting_phone', 'name': 'Иван'})
+        await store.set(2, {'step': 'waiting_name'})
+        await store.close()
+
+        store = SqliteStateStore(path, ttl=60, clock=clock)
+        assert await store.get(1) == {'step': 'waiting_phone', 'name': 'Иван'}
+        await store.delete(2)
+        assert await store.get(2) is None
+
+        clock.now += 61
+        assert await store.get(1) is None
+        assert await store.evict_expired() == 1
+        await store.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'state.sqlite3')))
+
+
+def test_memory_store_snapshot_restore():
+    """Незаполненные анкеты переживают перезапуск через снимок, оставшийся TTL сохраняется"""
+    async def scenario(path):
+        clock = FakeClock()
+        store = MemoryStateStore(ttl=60, clock=clock)
+        await store.set(1, {'step': 'waiting_phone', 'name': 'Анна'})
+        clock.now += 30
+        await store.set(2, {'step': 'waiting_name'})
+        assert await store.snapshot(path) == 2
+
+        restarted = MemoryStateStore(ttl=60, clock=clock)
+        await restarted.set(2, {'step': 'waiting_phone', 'name': 'Новое'})
+        assert await restarted.restore(path) == 1  # свежее состояние не перезаписывается
+        assert await restarted.get(1) == {'step': 'waiting_phone', 'name': 'Анна'}
+        assert await restarted.get(2) == {'step': 'waiting_phone', 'name': 'Новое'}
+        assert not os.path.exists(path)
+        assert await restarted.restore(path) == 0
+
+        clock.now += 31
+        assert await restarted.get(1) is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, 'snapshot.json')))
+
+
+if __name__ == '__main__':
+    test_memory_store_lru_and_ttl()
+    test_sqlite_store_survives_restart()
+    test_memory_store_snapshot_restore()
+    print("✅ Тесты хранилища состояний пройдены")
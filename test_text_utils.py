@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import html
+import random
+import re
+import unicodedata
+
+from message_templates import LOCALES, TemplateRegistry
+from text_utils import (MARKDOWN_SPECIAL, MARKDOWN_V2_SPECIAL, MAX_NAME_LENGTH, escape, escape_markdown, escape_markdown_v2,
+                        find_markdown_error, sanitize_name)
+
+# Разметка, эмодзи со склейками, управляющие, невидимые и «стилизованные» символы
+ALPHABET = (
+    list('_*`[]()~>#+-=|{}.!\\&<> ') + list('abcXYZАнняЁё0189') +
+    ['😀', '👨', '‍', '️', '́', '\n', '\t', '\r', '\x00', '\x1b', '\x7f', '​',
+     '‮', ' ', ' ', 'Ａ', '𝓐', 'ﬁ', '퟿', '\U000e0067']
+)
+
+
+def _random_text(rng, max_length=80):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+
+def _unescape(text, special):
+    return re.sub(r'\\([' + re.escape(special) + '])', r'\1', text)
+
+
+def test_escaped_text_never_breaks_markdown():
+    """Фаззинг: подтверждение с любым экранированным именем - валидная разметка, текст не меняется"""
+    rng = random.Random(20261018)
+    registry = TemplateRegistry(locales=tuple(LOCALES), default='ru')
+    confirmations = [registry.get(locale).confirmation for locale in LOCALES]
+    unescaped_v2 = re.compile(r'(?<!\\)(?:\\\\)*[' + re.escape(MARKDOWN_V2_SPECIAL.replace('\\', '')) + ']')
+    for _ in range(3000):
+        text = _random_text(rng)
+        for confirmation in confirmations:
+            message = confirmation(name=escape_markdown(text), phone=escape_markdown(text))
+            assert find_markdown_error(message) is None, repr(text)
+        assert _unescape(escape_markdown(text), MARKDOWN_SPECIAL) == text
+
+        escaped = escape_markdown_v2(text)
+        assert _unescape(escaped, MARKDOWN_V2_SPECIAL) == text
+        # После удаления экранированных пар не остается ни одного зарезервированного символа
+        assert not unescaped_v2.search(re.sub(r'\\.', '', escaped, flags=re.DOTALL)), repr(text)
+
+        assert html.unescape(escape(text, 'HTML')) == text and '<' not in escape(text, 'HTML')
+
+
+def test_unescaped_name_breaks_confirmation():
+    """Без экранирования имя с '_' или '*' дает ошибку разбора, из-за которой падал ответ"""
+    confirmation = TemplateRegistry().get('ru').confirmation
+    assert find_markdown_error(confirmation(name='john_doe', phone='+7 (916) 123-45-67')) is not None
+    assert find_markdown_error(confirmation(name='*Звезда', phone='+7 (916) 123-45-67')) is not None
+    assert escape_markdown('Анна') == 'Анна'
+    assert escape_markdown('john_doe*') == 'john\\_doe\\*'
+    assert escape_markdown_v2('Mr. (Smith)!') == 'Mr\\. \\(Smith\\)\\!'
+
+
+def test_sanitize_name_fuzz():
+    """Фаззинг: имя печатное, NFKC, без лишних пробелов, не длиннее лимита; повторная очистка ничего не меняет"""
+    rng = random.Random(7)
+    for _ in range(5000):
+        name = sanitize_name(_random_text(rng, max_length=150))
+        assert len(name) <= MAX_NAME_LENGTH
+        assert all(char.isprintable() or char == '‍' for char in name), repr(name)
+        assert name == name.strip() and '  ' not in name
+        assert unicodedata.is_normalized('NFKC', name)
+        assert sanitize_name(name) == name
+
+
+def test_sanitize_name_examples():
+    assert sanitize_name('  Анна\n\tПетрова\x00 ') == 'Анна Петрова'
+    assert sanitize_name('Ａｎｎａ 𝓚.') == 'Anna K.'
+    assert sanitize_name('Ann‮A​') == 'AnnA'
+    assert sanitize_name('👨‍👩‍👧 Семья') == '👨‍👩‍👧 Семья'
+    assert sanitize_name('Я' * 100) == 'Я' * MAX_NAME_LENGTH
+
+
+def test_templates_have_balanced_markdown():
+    """Шаблоны (без слотов) разбираются Telegram: ни одной незакрытой сущности"""
+    for locale, texts in LOCALES.items():
+        for field, text in texts.items():
+            literal = re.sub(r'\{\w+\}', '', text)
+            assert find_markdown_error(literal) is None, (locale, field)
+
+
+if __name__ == '__main__':
+    test_escaped_text_never_breaks_markdown()
+    test_unescaped_name_breaks_confirmation()
+    test_sanitize_name_fuzz()
+    test_sanitize_name_examples()
+    test_templates_have_balanced_markdown()
+    print("✅ Тесты экранирования и очистки текста пройдены")
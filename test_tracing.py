@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import os
+import tempfile
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from lead_outbox import LeadOutbox, OutboxWorker
+from metrics import InstrumentedRequest, instrument_handler
+from trace_flame import group_traces, read_spans, report
+from tracing import (NOOP_SPAN, FileSpanExporter, Tracer, continue_trace, current_traceparent,
+                     otlp_request, set_tracer, span, start_trace)
+from update_processor import PerUserUpdateProcessor
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class OkRequest(BaseRequest):
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        await asyncio.sleep(0.01)
+        return 200, b'{"ok":true,"result":true}'
+
+
+def _update(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': '+79161234567',
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+        },
+    }, None)
+
+
+def _parse(spans):
+    """Экспортированные спаны через тот же разбор OTLP/JSON, что и у файла"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'traces.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(otlp_request(spans)) + '\n')
+        return list(read_spans([path]))
+
+
+def test_sampling_off_is_noop():
+    """Без выборки спаны не создаются и не экспортируются, traceparent не передается"""
+    exporter = ListExporter()
+    for tracer in (Tracer(0.0, exporter), Tracer(1.0, None)):
+        previous = set_tracer(tracer)
+        try:
+            with start_trace('update') as root:
+                with span('handler message') as child:
+                    assert root is NOOP_SPAN and child is NOOP_SPAN
+                    assert current_traceparent() is None
+            assert continue_trace('lead.deliver', [None]) is NOOP_SPAN
+        finally:
+            set_tracer(previous)
+    assert exporter.spans == []
+
+
+def test_update_trace_continues_into_delivery():
+    """Спаны обновления, обработчика, Bot API и доставки заявки складываются в одну трассу"""
+    async def scenario(path, outbox_path):
+        request = InstrumentedRequest(OkRequest())
+        outbox = LeadOutbox(outbox_path)
+
+        async def handle(update, context):
+            with span('form.validate', field='phone'):
+                pass
+            await request.do_request('https://api.telegram.org/bot1:x/sendMessage', 'POST')
+            if update.update_id == 3:
+                raise RuntimeError('сбой обработчика')
+            await outbox.enqueue({'text': 'заявка', 'trace': current_traceparent()})
+
+        handler = instrument_handler('message', handle)
+        processor = PerUserUpdateProcessor(4)
+        updates = [_update(1, 10), _update(2, 10), _update(3, 20)]
+        results = await asyncio.gather(
+            *(processor.process_update(update, handler(update, None)) for update in updates),
+            return_exceptions=True
+        )
+        assert isinstance(results[2], RuntimeError)
+
+        async def deliver(payload):
+            await request.do_request('https://api.telegram.org/bot1:x/sendMessage', 'POST')
+
+        assert await OutboxWorker(outbox, deliver).drain_once() == 2
+        await outbox.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'traces.jsonl')
+        exporter = FileSpanExporter(path)
+        previous = set_tracer(Tracer(1.0, exporter))
+        try:
+            asyncio.run(scenario(path, os.path.join(tmp, 'outbox.sqlite3')))
+        finally:
+            set_tracer(previous)
+            exporter.shutdown()
+
+        traces = group_traces(read_spans([path]))
+        assert len(traces) == 3
+        by_update = {}
+        for records in traces.values():
+            root = next(record for record in records if record.parent_id is None)
+            assert root.name == 'update' and root.attributes['age_ms'] > 0
+            by_update[root.attributes['update_id']] = {record.name: record for record in records}
+
+        first = by_update[1]
+        assert first['handler message'].parent_id == first['update'].span_id
+        assert first['form.validate'].parent_id == first['handler message'].span_id
+        assert first['bot_api sendMessage'].attributes['http.status_code'] == 200
+        assert first['lead.deliver'].parent_id == first['handler message'].span_id
+        assert first['lead.deliver'].start >= first['update'].end
+        # Второе обновление того же пользователя ждало первое
+        assert 'update.wait' in by_update[2] and 'update.wait' not in first
+        assert by_update[3]['handler message'].error == 'RuntimeError: сбой обработчика'
+        assert 'lead.deliver' not in by_update[3]
+
+        text = report(traces, top=2)
+        assert 'lead.deliver' in text and '🔥' in text and text.count('🧵') == 2
+
+
+def test_digest_span_links_traces():
+    """Доставка дайджеста видна в каждой трассе, заявки которой в него вошли"""
+    exporter = ListExporter()
+    previous = set_tracer(Tracer(1.0, exporter))
+    try:
+        parents = []
+        for _ in range(2):
+            with start_trace('update'):
+                parents.append(current_traceparent())
+        with continue_trace('lead.deliver', parents, leads=2):
+            with span('bot_api sendMessage'):
+                pass
+    finally:
+        set_tracer(previous)
+
+    traces = group_traces(_parse(exporter.spans))
+    for parent in parents:
+        names = sorted(record.name for record in traces[parent.split('-')[0]])
+        assert names == ['bot_api sendMessage', 'lead.deliver', 'update']
+
+
+if __name__ == '__main__':
+    test_sampling_off_is_noop()
+    test_update_trace_continues_into_delivery()
+    test_digest_span_links_traces()
+    print("✅ Тесты трассировки пройдены")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import random
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from update_processor import PerUserUpdateProcessor, update_user_key
+
+
+def _update(update_id, user_id, text):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': text,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+        },
+    }
+
+
+class FakeRequest(BaseRequest):
+    """Bot API без сети: getMe для initialize(), остальное не вызывается"""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        result = {'id': 42, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+
+def test_same_user_in_order_other_users_in_parallel():
+    """Медленный шаг одного пользователя не задерживает других и не обгоняется его следующим шагом"""
+    async def scenario():
+        processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+        events = []
+
+        async def step(name, delay):
+            events.append(('start', name))
+            await asyncio.sleep(delay)
+            events.append(('end', name))
+
+        updates = [Update.de_json(_update(i, user_id, ''), None) for i, user_id in enumerate((1, 1, 2))]
+        await asyncio.gather(
+            processor.process_update(updates[0], step('u1-name', 0.05)),
+            processor.process_update(updates[1], step('u1-phone', 0.0)),
+            processor.process_update(updates[2], step('u2-name', 0.0)),
+        )
+        assert events.index(('end', 'u2-name')) < events.index(('end', 'u1-name'))
+        assert events.index(('end', 'u1-name')) < events.index(('start', 'u1-phone'))
+        assert processor.active_users == 0
+
+    asyncio.run(scenario())
+
+
+def test_global_cap():
+    """Одновременно работает не больше max_concurrent_updates пользователей"""
+    async def scenario():
+        processor = PerUserUpdateProcessor(max_concurrent_updates=3)
+        active = [0, 0]
+
+        async def step():
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+        await asyncio.gather(*(
+            processor.process_update(Update.de_json(_update(user_id, user_id, ''), None), step())
+            for user_id in range(20)
+        ))
+        assert active[1] == 3
+        assert processor.max_concurrent_updates == 3
+
+    asyncio.run(scenario())
+
+
+def test_cancel_in_flight():
+    """Зависший обработчик отменяется, следующий шаг того же пользователя не запускается"""
+    async def scenario():
+        processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+        started = []
+
+        async def step(name):
+            started.append(name)
+            await asyncio.sleep(10)
+
+        updates = [Update.de_json(_update(i, 1, ''), None) for i in range(2)]
+        tasks = [asyncio.create_task(processor.process_update(update, step(f'step{update.update_id}')))
+                 for update in updates]
+        await asyncio.sleep(0.01)
+        assert processor.in_flight == 2  # второй шаг ждет блокировку пользователя
+        assert processor.cancel_in_flight() == 2
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert processor.in_flight == 0
+        assert started == ['step0']
+        assert processor.active_users == 0
+
+    asyncio.run(scenario())
+
+
+def test_update_user_key():
+    assert update_user_key(Update.de_json(_update(1, 77, 'hi'), None)) == 77
+    assert update_user_key('not an update') is None
+
+
+def test_stress_no_lost_or_reordered_form_steps():
+    """Стресс: 300 пользователей шлют имя и телефон вперемешку, обработчик спит случайное время"""
+    users = 300
+    rng = random.Random(11)
+
+    async def form_step(update, context):
+        # Тот же конечный автомат, что и в анкете бота: имя -> телефон
+        step = context.user_data.get('step', 'name')
+        await asyncio.sleep(rng.random() * 0.005)
+        context.user_data.setdefault('log', []).append((step, update.message.text))
+        context.user_data['step'] = 'phone' if step == 'name' else 'done'
+
+    async def scenario():
+        application = (
+            Application.builder()
+            .token('123:TEST')
+            .request(FakeRequest())
+            .updater(None)
+            .concurrent_updates(PerUserUpdateProcessor(max_concurrent_updates=32))
+            .build()
+        )
+        application.add_handler(MessageHandler(filters.TEXT, form_step))
+
+        update_id = 0
+        async with application:
+            await application.start()
+            for text in ('name', 'phone'):
+                for user_id in range(1, users + 1):
+                    update_id += 1
+                    await application.update_queue.put(
+                        Update.de_json(_update(update_id, user_id, f'{text}-{user_id}'), application.bot)
+                    )
+            await application.update_queue.join()
+            await application.stop()
+
+        for user_id in range(1, users + 1):
+            assert application.user_data[user_id]['log'] == [
+                ('name', f'name-{user_id}'), ('phone', f'phone-{user_id}')
+            ]
+            assert application.user_data[user_id]['step'] == 'done'
+        assert application.update_processor.active_users == 0
+
+    asyncio.run(scenario())
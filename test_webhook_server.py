@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import socket
+
+import pytest
+from aiohttp import ClientSession, web
+from telegram import Bot
+
+from fake_application import LifecycleApplication
+from webhook_server import SECRET_HEADER, create_webhook_app, serve_webhook
+
+
+class FakeApplication:
+    """Минимальная замена Application: бот для de_json и очередь обновлений"""
+
+    def __init__(self):
+        self.bot = Bot('123456:TEST')
+        self.update_queue = asyncio.Queue()
+
+
+async def _post(application, headers, payload):
+    runner = web.AppRunner(create_webhook_app(application, '/hook', secret_token='s3cret'))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        async with ClientSession() as session:
+            async with session.post(f'http://127.0.0.1:{port}/hook', json=payload, headers=headers) as response:
+                return response.status
+    finally:
+        await runner.cleanup()
+
+
+def test_webhook_secret_token():
+    """Webhook принимает обновления только с правильным secret token"""
+    update = {'update_id': 7, 'message': {
+        'message_id': 1, 'date': 0, 'chat': {'id': 5, 'type': 'private'}, 'text': 'привет',
+    }}
+
+    application = FakeApplication()
+    assert asyncio.run(_post(application, {SECRET_HEADER: 'wrong'}, update)) == 403
+    assert asyncio.run(_post(application, {}, update)) == 403
+    assert application.update_queue.empty()
+
+    assert asyncio.run(_post(application, {SECRET_HEADER: 's3cret'}, update)) == 200
+    assert application.update_queue.get_nowait().update_id == 7
+
+
+def test_failed_bind_stops_application():
+    """Порт занят: запущенное приложение останавливается, ошибка не проглатывается"""
+    application = LifecycleApplication()
+    with socket.socket() as busy:
+        busy.bind(('127.0.0.1', 0))
+        busy.listen()
+        with pytest.raises(OSError):
+            asyncio.run(serve_webhook(application, '127.0.0.1', busy.getsockname()[1], '/hook'))
+    assert application.calls == ['initialize', 'start', 'stop', 'shutdown']
+
+
+if __name__ == '__main__':
+    test_webhook_secret_token()
+    test_failed_bind_stops_application()
+    print("✅ Тесты webhook-сервера пройдены")
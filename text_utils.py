@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Безопасная подстановка пользовательского текста в сообщения и очистка имен.
+
+Экранирование для parse_mode Markdown, MarkdownV2 и HTML - заранее собранные таблицы
+str.translate: проверка одним скомпилированным выражением, и текст без спецсимволов
+(обычное имя) возвращается как есть. Имя с '*' или '_' без экранирования ломает разметку
+подтверждения, Telegram отвечает 400 "Can't parse entities", и пользователь получает
+сообщение об ошибке вторым запросом.
+
+В шаблонах сразу за слотом не должен идти спецсимвол Markdown: в legacy Markdown
+обратную косую черту нельзя экранировать, и '\\' в конце значения экранировал бы его.
+"""
+
+import re
+import unicodedata
+
+# Имя в Telegram (first_name) - до 64 символов; длиннее в заявке не нужно
+MAX_NAME_LENGTH = 64
+
+MARKDOWN_SPECIAL = '_*`['
+MARKDOWN_V2_SPECIAL = '\\_*[]()~`>#+-=|{}.!'
+
+_MARKDOWN_TABLE = str.maketrans({char: '\\' + char for char in MARKDOWN_SPECIAL})
+_MARKDOWN_V2_TABLE = str.maketrans({char: '\\' + char for char in MARKDOWN_V2_SPECIAL})
+_HTML_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+_MARKDOWN_CHARS = re.compile('[' + re.escape(MARKDOWN_SPECIAL) + ']')
+_MARKDOWN_V2_CHARS = re.compile('[' + re.escape(MARKDOWN_V2_SPECIAL) + ']')
+_HTML_CHARS = re.compile('[&<>]')
+
+# Склейка эмодзи (👨‍👩‍👧) - единственный невидимый символ, который остается в имени
+_ZERO_WIDTH_JOINER = '\u200d'
+
+
+def escape_markdown(text):
+    """Экранирование для parse_mode='Markdown' (legacy): _ * ` ["""
+    return text.translate(_MARKDOWN_TABLE) if _MARKDOWN_CHARS.search(text) else text
+
+
+def escape_markdown_v2(text):
+    """Экранирование для parse_mode='MarkdownV2' вне сущностей: все 18 зарезервированных символов"""
+    return text.translate(_MARKDOWN_V2_TABLE) if _MARKDOWN_V2_CHARS.search(text) else text
+
+
+def escape_html(text):
+    return text.translate(_HTML_TABLE) if _HTML_CHARS.search(text) else text
+
+
+ESCAPERS = {
+    'Markdown': escape_markdown,
+    'MarkdownV2': escape_markdown_v2,
+    'HTML': escape_html,
+    None: str,
+}
+
+
+def escape(text, parse_mode):
+    """Экранирование под parse_mode сообщения (None - без разметки)"""
+    return ESCAPERS[parse_mode](text)
+
+
+def _visible(char):
+    if char.isprintable() or char == _ZERO_WIDTH_JOINER:
+        return char
+    return ' ' if char.isspace() else ''
+
+
+def sanitize_name(text, max_length=MAX_NAME_LENGTH):
+    """
+    Имя для хранения и показа: NFKC (полноширинные и «стилизованные» буквы - обычные),
+    без управляющих и невидимых символов (переводы строк и табуляция - пробел),
+    пробелы схлопнуты, не длиннее max_length символов
+    """
+    # Сначала убираем невидимые: иначе удаленный между буквой и ударением символ оставит
+    # несоставленную пару, и имя «Á» хранилось бы в двух разных видах
+    if not text.isprintable():
+        text = ''.join(map(_visible, text))
+    text = ' '.join(unicodedata.normalize('NFKC', text).split())
+    if len(text) > max_length:
+        text = text[:max_length].rstrip(' ' + _ZERO_WIDTH_JOINER)
+    return text
+
+
+def find_markdown_error(text):
+    """
+    Позиция сущности legacy Markdown без закрывающего символа (как ее ищет Telegram) или None.
+    Для проверки шаблонов и подстановок в тестах и бенчмарке.
+    """
+    size = len(text)
+    i = 0
+    while i < size:
+        char = text[i]
+        if char == '\\' and i + 1 < size and text[i + 1] in MARKDOWN_SPECIAL:
+            i += 2
+            continue
+        if char not in MARKDOWN_SPECIAL:
+            i += 1
+            continue
+        start = i
+        if text.startswith('```', i):
+            end, i = '```', i + 3
+        else:
+            end, i = (']' if char == '[' else char), i + 1
+        found = text.find(end, i)
+        if found < 0:
+            return start
+        i = found + len(end)
+        if char == '[' and text.startswith('(', i):
+            found = text.find(')', i)
+            if found < 0:
+                return start
+            i = found + 1
+    return None
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Разбор трасс из файла tracing.FileSpanExporter (OTLP/JSON, одна строка ExportTraceServiceRequest):
+самые медленные трассы деревом спанов с полосами на общей шкале времени и сводка собственного
+времени по именам спанов (плоский flame graph) - видно, ушло время на ожидание очереди
+пользователя, проверку анкеты, ответ пользователю или доставку заявки админам.
+
+Длительность трассы - от начала первого спана до конца последнего, включая доставку заявки
+воркером outbox. Спан дайджеста со ссылками (links) показывается во всех связанных трассах.
+
+    python trace_flame.py /home/enclude/FormaContact/logs/traces.jsonl --top 5
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+BAR_WIDTH = 40
+
+
+class SpanRecord:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'end', 'attributes', 'error', 'links')
+
+    def __init__(self, trace_id, span_id, parent_id, name, start, end, attributes, error, links):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes
+        self.error = error
+        self.links = links
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def relinked(self, trace_id, parent_id):
+        return SpanRecord(trace_id, self.span_id, parent_id, self.name, self.start, self.end,
+                          self.attributes, self.error, ())
+
+
+def _attribute_value(value):
+    for kind in ('stringValue', 'boolValue', 'doubleValue'):
+        if kind in value:
+            return value[kind]
+    return int(value['intValue']) if 'intValue' in value else None
+
+
+def read_spans(paths):
+    """Спаны из файлов экспорта; поврежденные строки (оборванная запись) пропускаются"""
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                for resource in request.get('resourceSpans', ()):
+                    for scope in resource.get('scopeSpans', ()):
+                        for entry in scope.get('spans', ()):
+                            yield SpanRecord(
+                                entry['traceId'], entry['spanId'], entry.get('parentSpanId'), entry['name'],
+                                int(entry['startTimeUnixNano']), int(entry['endTimeUnixNano']),
+                                {item['key']: _attribute_value(item['value']) for item in entry.get('attributes', ())},
+                                entry.get('status', {}).get('message'),
+                                [(link['traceId'], link['spanId']) for link in entry.get('links', ())],
+                            )
+
+
+def group_traces(spans):
+    """{trace_id: [спаны]}; спан со ссылками вместе с поддеревом копируется в связанные трассы"""
+    traces = defaultdict(list)
+    linked = []
+    for record in spans:
+        traces[record.trace_id].append(record)
+        if record.links:
+            linked.append(record)
+    for record in linked:
+        children = defaultdict(list)
+        for other in traces[record.trace_id]:
+            children[other.parent_id].append(other)
+        for trace_id, parent_id in record.links:
+            copies = [record.relinked(trace_id, parent_id)]
+            stack = list(children[record.span_id])
+            while stack:
+                child = stack.pop()
+                copies.append(child.relinked(trace_id, child.parent_id))
+                stack.extend(children[child.span_id])
+            traces[trace_id].extend(copies)
+    return traces
+
+
+def trace_bounds(records):
+    return min(record.start for record in records), max(record.end for record in records)
+
+
+def slowest(traces, top):
+    """[(длительность нс, trace_id, спаны)] самых долгих трасс"""
+    ranked = []
+    for trace_id, records in traces.items():
+        start, end = trace_bounds(records)
+        ranked.append((end - start, trace_id, records))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return ranked[:top]
+
+
+def _tree(records):
+    """Обход в глубину: [(глубина, спан)], корни - спаны без родителя в этой трассе"""
+    ids = {record.span_id for record in records}
+    children = defaultdict(list)
+    for record in records:
+        children[record.parent_id if record.parent_id in ids else None].append(record)
+    order = []
+    stack = [(0, record) for record in sorted(children[None], key=lambda item: item.start, reverse=True)]
+    while stack:
+        depth, record = stack.pop()
+        order.append((depth, record))
+        stack.extend((depth + 1, child) for child in sorted(children[record.span_id], key=lambda item: item.start,
+                                                              reverse=True))
+    return order, children
+
+
+def self_times(records):
+    """{имя спана: собственное время нс}: длительность минус время детей внутри спана"""
+    _, children = _tree(records)
+    totals = defaultdict(int)
+    for record in records:
+        covered = sum(
+            max(0, min(child.end, record.end) - max(child.start, record.start))
+            for child in children[record.span_id]
+        )
+        totals[record.name] += max(0, record.duration - covered)
+    return totals
+
+
+def _bar(record, start, total, width):
+    scale = width / total if total else 0
+    left = min(width - 1, int((record.start - start) * scale))
+    length = max(1, round(record.duration * scale))
+    return (' ' * left + '█' * length)[:width].ljust(width)
+
+
+def _label(record):
+    attributes = ' '.join(f'{key}={value}' for key, value in record.attributes.items())
+    error = f'  ❌ {record.error}' if record.error else ''
+    return f"{record.name}{'  ' + attributes if attributes else ''}{error}"
+
+
+def render_trace(duration, trace_id, records, width=BAR_WIDTH):
+    start, _ = trace_bounds(records)
+    order, _ = _tree(records)
+    lines = [f"🧵 {trace_id}  {duration / 1e6:.1f} мс"]
+    for depth, record in order:
+        lines.append(f"  +{(record.start - start) / 1e6:9.1f} {record.duration / 1e6:9.1f} мс "
+                     f"|{_bar(record, start, duration, width)}| {'  ' * depth}{_label(record)}")
+    return '\n'.join(lines)
+
+
+def report(traces, top, width=BAR_WIDTH):
+    ranked = slowest(traces, top)
+    lines = [f"📂 Трасс: {len(traces)}, показаны самые медленные: {len(ranked)}", '']
+    totals = defaultdict(int)
+    for duration, trace_id, records in ranked:
+        lines += [render_trace(duration, trace_id, records, width), '']
+        for name, value in self_times(records).items():
+            totals[name] += value
+    overall = sum(totals.values()) or 1
+    lines.append('🔥 Собственное время по спанам в этих трассах:')
+    for name, value in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"  {value / 1e6:10.1f} мс {value / overall:6.1%}  {name}")
+    return '\n'.join(lines)
+
+
+def main():
+    default = os.path.join(os.getenv('LOGS_DIR', 'logs'), 'traces.jsonl')
+    parser = argparse.ArgumentParser(description='Самые медленные трассы бота и сводка по спанам')
+    parser.add_argument('paths', nargs='*', default=[os.getenv('TRACE_FILE') or default], help='файлы трасс')
+    parser.add_argument('--top', type=int, default=5, help='сколько трасс показать')
+    parser.add_argument('--width', type=int, default=BAR_WIDTH, help='ширина шкалы времени')
+    args = parser.parse_args()
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        print(f"❌ Файлы трасс не найдены: {' '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    print(report(group_traces(read_spans(args.paths)), args.top, args.width))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Легковесная трассировка: спаны вокруг обновления, обработчиков, шагов анкеты и вызовов Bot API.
+
+Решение о записи принимается один раз в корне (start_trace, доля TRACE_SAMPLE_RATE); span()
+вне записываемой трассы возвращает общий пустой объект, поэтому при выключенном сэмплировании
+стоимость - один ContextVar.get(). Текущий спан хранится в contextvars, как контекст логов.
+
+Завершенные спаны пишет в файл отдельный поток в формате OTLP/JSON (как file exporter
+OpenTelemetry Collector: одна строка ExportTraceServiceRequest), разбор - trace_flame.py.
+Доставка заявки из outbox продолжает трассу обновления через traceparent в payload.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'formacontact-bot'
+SCOPE_NAME = 'formacontact'
+
+# OTLP SpanKind и Status.code
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+# Сколько спанов поток экспорта собирает в одну строку файла
+EXPORT_BATCH = 512
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class _NoopSpan:
+    """Спан вне записываемой трассы: ничего не хранит и не экспортирует"""
+
+    __slots__ = ()
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Записываемый спан; контекстный менеджер делает его текущим для вложенных span()"""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes',
+                 'links', 'start', 'end', 'error', '_token')
+    recording = True
+
+    def __init__(self, tracer, trace_id, parent_id, name, kind, attributes, links=()):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.links = links
+        self.start = self.end = 0
+        self.error = None
+        self._token = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self):
+        return f'{self.trace_id}-{self.span_id}'
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        self.tracer.export(self)
+        return False
+
+
+class Tracer:
+    """Доля записываемых трасс и получатель завершенных спанов (exporter.export(span))"""
+
+    def __init__(self, sample_rate=0.0, exporter=None):
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.exporter = exporter
+
+    def export(self, span):
+        self.exporter.export(span)
+
+
+_tracer = Tracer()
+
+
+def set_tracer(tracer):
+    """Подмена глобального трассировщика, возвращает прежний"""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def start_trace(name, kind=KIND_SERVER, **attributes):
+    """Корневой спан новой трассы, если она попала в выборку, иначе NOOP_SPAN"""
+    tracer = _tracer
+    if not tracer.sample_rate or random.random() >= tracer.sample_rate:
+        return NOOP_SPAN
+    return Span(tracer, f'{random.getrandbits(128):032x}', None, name, kind, attributes)
+
+
+def continue_trace(name, traceparents, kind=KIND_INTERNAL, **attributes):
+    """
+    Спан, продолжающий уже записанные трассы (например, доставка заявки из outbox):
+    родитель - первый traceparent, остальные становятся ссылками (OTLP links)
+    """
+    traceparents = [value for value in traceparents if value]
+    if not traceparents or _tracer.exporter is None:
+        return NOOP_SPAN
+    trace_id, parent_id = traceparents[0].split('-')
+    links = [tuple(value.split('-')) for value in traceparents[1:]]
+    return Span(_tracer, trace_id, parent_id, name, kind, attributes, links)
+
+
+def span(name, kind=KIND_INTERNAL, **attributes):
+    """Дочерний спан текущего; без записываемой трассы - NOOP_SPAN"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.tracer, parent.trace_id, parent.span_id, name, kind, attributes)
+
+
+def current_traceparent():
+    """'trace_id-span_id' текущего спана для продолжения трассы в другой задаче или None"""
+    current = _current_span.get()
+    return current.traceparent if current is not None else None
+
+
+def trace_handler(name, handler):
+    """Обертка обработчика: спан 'handler <name>' внутри трассы обновления"""
+    span_name = f'handler {name}'
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        with span(span_name):
+            return await handler(update, context)
+
+    return wrapper
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_span(span):
+    """Спан в OTLP/JSON: id в hex, время в наносекундах строкой"""
+    entry = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': span.kind,
+        'startTimeUnixNano': str(span.start),
+        'endTimeUnixNano': str(span.end),
+        'attributes': _otlp_attributes(span.attributes),
+        'status': {'code': STATUS_ERROR, 'message': span.error} if span.error else {},
+    }
+    if span.parent_id:
+        entry['parentSpanId'] = span.parent_id
+    if span.links:
+        entry['links'] = [{'traceId': trace_id, 'spanId': span_id} for trace_id, span_id in span.links]
+    return entry
+
+
+def otlp_request(spans, service_name=SERVICE_NAME):
+    """Одна строка файла: ExportTraceServiceRequest со всеми спанами пачки"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': _otlp_attributes({'service.name': service_name})},
+        'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [otlp_span(span) for span in spans]}],
+    }]}
+
+
+class FileSpanExporter:
+    """
+    Экспорт в файл из отдельного потока: export() только кладет спан в очередь,
+    сериализация и запись - в потоке, пачками до EXPORT_BATCH спанов на строку
+    """
+
+    def __init__(self, path, service_name=SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        self._queue.put(span)
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            while True:
+                spans = [self._queue.get()]
+                while len(spans) < EXPORT_BATCH:
+                    try:
+                        spans.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(item is None for item in spans)
+                spans = [item for item in spans if item is not None]
+                if spans:
+                    try:
+                        file.write(json.dumps(otlp_request(spans, self.service_name),
+                                              ensure_ascii=False, separators=(',', ':')) + '\n')
+                        file.flush()
+                    except Exception as e:
+                        logger.error("❌ Ошибка записи трасс в %s: %s", self.path, e)
+                if stop:
+                    return
+
+    def shutdown(self):
+        """Записать оставшиеся спаны и остановить поток"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def setup_tracing(path, sample_rate):
+    """Включение трассировки процесса: доля трасс sample_rate в файл path, возвращает exporter"""
+    exporter = FileSpanExporter(path)
+    set_tracer(Tracer(sample_rate, exporter))
+    atexit.register(exporter.shutdown)
+    return exporter
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Параллельная обработка обновлений: разные пользователи - одновременно, один пользователь - строго по порядку"""
+
+import asyncio
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from log_setup import bind_context, reset_context
+from tracing import span, start_trace
+
+DEFAULT_CONCURRENCY = 64
+
+
+def update_user_key(update):
+    """Ключ сериализации: пользователь, иначе чат; None - обновление без владельца"""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+    return None
+
+
+def _update_trace(update, key):
+    """Корневой спан обновления; age_ms - сколько прошло с отправки сообщения (точность Telegram - секунда)"""
+    if not isinstance(update, Update):
+        return start_trace('update')
+    root = start_trace('update', update_id=update.update_id, user_id=key)
+    message = update.effective_message
+    if root.recording and message is not None and message.date is not None:
+        root.set('age_ms', max(0, int(time.time() * 1000 - message.date.timestamp() * 1000)))
+    return root
+
+
+class _Waiting:
+    """async with над блокировкой/семафором со спаном ожидания очереди update.wait"""
+
+    __slots__ = ('primitive',)
+
+    def __init__(self, primitive):
+        self.primitive = primitive
+
+    async def __aenter__(self):
+        if not self.primitive.locked():
+            await self.primitive.acquire()
+            return
+        with span('update.wait', queue=type(self.primitive).__name__):
+            await self.primitive.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.primitive.release()
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обновления одного пользователя выполняются под его asyncio.Lock (FIFO) в порядке поступления,
+    разные пользователи - параллельно, но не больше max_concurrent_updates одновременно.
+
+    Семафор базового класса не ограничивает: он захватывается до блокировки пользователя,
+    и его пробуждения могли бы переставить обновления одного пользователя. Ограничение
+    берется уже после блокировки, поэтому ждущие своей очереди обновления не занимают слоты.
+    """
+
+    def __init__(self, max_concurrent_updates=DEFAULT_CONCURRENCY):
+        self._limit = max_concurrent_updates
+        super().__init__(max_concurrent_updates)
+        self._semaphore = asyncio.BoundedSemaphore(sys.maxsize)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks = {}  # key -> [asyncio.Lock, число обновлений в работе и в очереди]
+        self._tasks = set()  # задачи обработки, не завершенные к моменту остановки
+
+    @property
+    def max_concurrent_updates(self):
+        return self._limit
+
+    @property
+    def active_users(self):
+        return len(self._locks)
+
+    @property
+    def in_flight(self):
+        return len(self._tasks)
+
+    def cancel_in_flight(self):
+        """Отмена незавершенных обработчиков (истек срок остановки), возвращает их число"""
+        for task in self._tasks:
+            task.cancel()
+        return len(self._tasks)
+
+    async def do_process_update(self, update, coroutine):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        key = update_user_key(update)
+        # Все записи логов этого обновления (обработчики, ошибки) получают update_id и user_id
+        token = bind_context(update_id=update.update_id, user_id=key) if isinstance(update, Update) else None
+        try:
+            with _update_trace(update, key):
+                await self._process_in_order(update, key, coroutine)
+        except asyncio.CancelledError:
+            # Отмена в очереди за блокировкой пользователя: корутина обработчика так и не запускалась
+            coroutine.close()
+            raise
+        finally:
+            self._tasks.discard(task)
+            if token is not None:
+                reset_context(token)
+
+    async def _process_in_order(self, update, key, coroutine):
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with _Waiting(entry[0]), _Waiting(self._slots):
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
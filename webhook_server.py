@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Webhook-режим бота: aiohttp-сервер принимает обновления от Telegram вместо run_polling"""
+
+import asyncio
+import hmac
+import logging
+
+from aiohttp import web
+from telegram import Update
+
+from lifecycle import DEFAULT_SHUTDOWN_TIMEOUT, run_until_signal, start_application, stop_application
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает secret_token из setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def update_handler(application, secret_token=None, dispatch=None):
+    """
+    aiohttp-обработчик webhook: проверка секрета и разбор Update.
+    dispatch(update) - куда передать обновление (по умолчанию очередь приложения PTB).
+    """
+    dispatch = dispatch or application.update_queue.put
+
+    async def handle_update(request):
+        if secret_token is not None:
+            received = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(received, secret_token):
+                logger.warning("⛔ Webhook запрос с неверным secret token от %s", request.remote)
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            logger.warning("⚠️ Некорректное тело webhook запроса: %s", e)
+            return web.Response(status=400)
+
+        # Отвечаем Telegram сразу, обработка идет в фоне через очередь приложения
+        await dispatch(update)
+        return web.Response()
+
+    return handle_update
+
+
+def create_webhook_app(application, path, secret_token=None):
+    """Создание aiohttp-приложения, которое складывает обновления в очередь PTB"""
+    web_app = web.Application()
+    web_app.router.add_post(path, update_handler(application, secret_token))
+    return web_app
+
+
+async def serve_webhook(application, listen, port, path, secret_token=None, webhook_url=None, allowed_updates=None,
+                        shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT, stop_event=None, ready_event=None):
+    """Жизненный цикл приложения в webhook-режиме (аналог run_polling)"""
+    stop_event = stop_event or asyncio.Event()
+    runner = web.AppRunner(create_webhook_app(application, path, secret_token))
+
+    await start_application(application)
+    try:
+        # Порт занят или set_webhook отклонен: приложение уже запущено и тоже останавливается
+        await runner.setup()
+        site = web.TCPSite(runner, listen, port)
+        await site.start()
+        logger.info("🌐 Webhook сервер слушает %s:%s%s", listen, port, path)
+
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                allowed_updates=allowed_updates
+            )
+            logger.info("🔗 Webhook зарегистрирован: %s", webhook_url)
+        if ready_event:
+            ready_event.set()
+
+        await stop_event.wait()
+    finally:
+        # Telegram повторит запросы, на которые не получил ответ, после перезапуска
+        await runner.cleanup()
+        await stop_application(application, shutdown_timeout)
+        logger.info("🛑 Webhook сервер остановлен")
+
+
+def run_webhook(application, listen, port, path, **kwargs):
+    """Блокирующий запуск webhook-сервера до SIGINT/SIGTERM"""
+    run_until_signal(serve_webhook, application, listen, port, path, **kwargs)